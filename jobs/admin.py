@@ -0,0 +1,19 @@
+from django.contrib import admin
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'attempts', 'max_attempts', 'run_after', 'batch_id')
+    list_filter = ('status', 'name')
+    search_fields = ('name', 'batch_id')
+    readonly_fields = ('created', 'updated', 'locked_at', 'last_error', 'result')
+    ordering = ('-id',)
+
+    actions = ['requeue']
+
+    def requeue(self, request, queryset):
+        from django.utils import timezone
+        updated = queryset.update(status=Job.STATUS_QUEUED, attempts=0, run_after=timezone.now())
+        self.message_user(request, f'{updated} jobs requeued.')
+    requeue.short_description = "Requeue selected jobs"
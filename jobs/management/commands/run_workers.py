@@ -0,0 +1,91 @@
+"""
+Run background job workers.
+
+Starts N worker processes that each claim jobs with SELECT ... FOR UPDATE SKIP LOCKED,
+so any number of workers (on any number of dynos) can share the queue safely.
+Usage: python manage.py run_workers --workers 2
+"""
+
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from jobs.queue import run_next
+
+
+class Command(BaseCommand):
+    help = "Run background job worker processes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Number of worker processes')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--max-jobs', type=int, default=None,
+                            help='Exit a worker after this many jobs (restarted by the parent)')
+
+    def handle(self, *args, **options):
+        count = max(1, options['workers'])
+        if count == 1:
+            self.stdout.write("Starting 1 worker")
+            work_loop(options['poll_interval'], options['max_jobs'])
+            return
+
+        # Children must not inherit the parent's database connection
+        connections.close_all()
+        self.stdout.write(f"Starting {count} workers")
+        processes = [self._spawn(i, options) for i in range(count)]
+
+        stopping = False
+
+        def stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        # Restart workers that exit (crash or --max-jobs) until told to stop
+        while not stopping:
+            for i, process in enumerate(processes):
+                if not process.is_alive() and not stopping:
+                    self.stdout.write(f"Worker {i} exited with {process.exitcode}, restarting")
+                    processes[i] = self._spawn(i, options)
+            time.sleep(1)
+
+        for process in processes:
+            process.join()
+
+    def _spawn(self, index, options):
+        process = multiprocessing.Process(
+            target=work_loop,
+            args=(options['poll_interval'], options['max_jobs']),
+            name=f"job-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        return process
+
+
+def work_loop(poll_interval, max_jobs=None):
+    # SIGTERM finishes the current job, then exits
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+
+    processed = 0
+    while not stopping and (max_jobs is None or processed < max_jobs):
+        close_old_connections()
+        if run_next():
+            processed += 1
+        else:
+            time.sleep(poll_interval)
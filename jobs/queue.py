@@ -0,0 +1,142 @@
+"""
+Database-backed job queue.
+
+Handlers register with @job_handler("app.name") in their app's tasks.py. Work is
+added with enqueue()/enqueue_many() (inside the caller's transaction, so a job
+only becomes visible once the rows it refers to are committed) and executed by
+`manage.py run_workers`, which claims jobs with SELECT ... FOR UPDATE SKIP LOCKED.
+Failed jobs are retried with exponential backoff until max_attempts.
+"""
+
+from datetime import timedelta
+import logging
+import traceback
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# name -> callable(payload) -> JSON-serializable result
+_handlers = {}
+
+
+def job_handler(name):
+    def register(func):
+        _handlers[name] = func
+        return func
+    return register
+
+
+def enqueue(name, payload=None, batch_id=None, owner=None, delay=0, max_attempts=None):
+    return enqueue_many(name, [payload or {}], batch_id=batch_id, owner=owner,
+                        delay=delay, max_attempts=max_attempts)[0]
+
+
+# One INSERT for a whole batch of jobs with the same handler
+def enqueue_many(name, payloads, batch_id=None, owner=None, delay=0, max_attempts=None):
+    run_after = timezone.now() + timedelta(seconds=delay)
+    return Job.objects.bulk_create([
+        Job(
+            name=name,
+            payload=payload,
+            batch_id=batch_id,
+            owner=owner,
+            run_after=run_after,
+            max_attempts=max_attempts or settings.JOB_MAX_ATTEMPTS,
+        )
+        for payload in payloads
+    ])
+
+
+# Claim the next due job, or None
+# Jobs stuck in "running" past JOB_LOCK_TIMEOUT belonged to a worker that died; they are reclaimed,
+# or marked failed if that was their last attempt (a job that kills its worker doesn't run forever)
+def claim_next():
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.JOB_LOCK_TIMEOUT)
+    while True:
+        with transaction.atomic():
+            job = (
+                Job.objects.select_for_update(skip_locked=True)
+                .filter(
+                    Q(status=Job.STATUS_QUEUED, run_after__lte=now)
+                    | Q(status=Job.STATUS_RUNNING, locked_at__lt=stale)
+                )
+                .order_by('run_after', 'id')
+                .first()
+            )
+            if job is None:
+                return None
+            if job.status == Job.STATUS_RUNNING and job.attempts >= job.max_attempts:
+                logger.warning(f"Job {job.pk} ({job.name}) failed: worker stopped during attempt {job.attempts}")
+                job.status = Job.STATUS_FAILED
+                job.locked_at = None
+                job.last_error = f"Worker stopped responding during attempt {job.attempts}"
+                job.save(update_fields=['status', 'locked_at', 'last_error', 'updated'])
+                continue
+            job.status = Job.STATUS_RUNNING
+            job.attempts += 1
+            job.locked_at = now
+            job.save(update_fields=['status', 'attempts', 'locked_at', 'updated'])
+        return job
+
+
+# Exponential backoff: JOB_RETRY_BASE_DELAY, then 2x, 4x, ... capped at one hour
+def retry_delay(attempts):
+    return min(settings.JOB_RETRY_BASE_DELAY * (2 ** max(attempts - 1, 0)), 3600)
+
+
+def run_job(job):
+    handler = _handlers.get(job.name)
+    try:
+        if handler is None:
+            raise LookupError(f"No handler registered for job '{job.name}'")
+        result = handler(job.payload)
+    except Exception as e:
+        logger.warning(f"Job {job.pk} ({job.name}) failed on attempt {job.attempts}: {e}")
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts or handler is None:
+            job.status = Job.STATUS_FAILED
+        else:
+            job.status = Job.STATUS_QUEUED
+            job.run_after = timezone.now() + timedelta(seconds=retry_delay(job.attempts))
+        job.locked_at = None
+        job.save(update_fields=['status', 'run_after', 'locked_at', 'last_error', 'updated'])
+        return False
+
+    job.status = Job.STATUS_SUCCEEDED
+    job.result = result
+    job.locked_at = None
+    job.save(update_fields=['status', 'result', 'locked_at', 'updated'])
+    return True
+
+
+# Claim and run one job; returns False when the queue had nothing due
+def run_next():
+    job = claim_next()
+    if job is None:
+        return False
+    run_job(job)
+    return True
+
+
+# Counts per status for a batch, plus a done/total summary
+def batch_progress(batch_id):
+    counts = {
+        row['status']: row['count']
+        for row in Job.objects.filter(batch_id=batch_id).values('status').annotate(count=Count('id')).order_by()
+    }
+    total = sum(counts.values())
+    done = counts.get(Job.STATUS_SUCCEEDED, 0) + counts.get(Job.STATUS_FAILED, 0)
+    return {
+        'batch_id': str(batch_id),
+        'total': total,
+        'done': done,
+        'finished': total > 0 and done == total,
+        **{status: counts.get(status, 0) for status, _ in Job.STATUS_CHOICES},
+    }
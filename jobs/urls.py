@@ -0,0 +1,11 @@
+"""
+URLs for the jobs app
+"""
+from django.urls import path
+from . import views
+
+app_name = 'jobs'
+
+urlpatterns = [
+    path('batches/<uuid:batch_id>/', views.batch_status, name='batch_status'),
+]
@@ -0,0 +1,25 @@
+# views for the jobs app
+
+from django.contrib.auth.decorators import login_required
+from django.http import Http404, JsonResponse
+
+from .models import Job
+from .queue import batch_progress
+
+
+# Progress of a batch of background jobs (e.g. the metadata jobs of one bulk upload)
+@login_required
+def batch_status(request, batch_id):
+    jobs = Job.objects.filter(batch_id=batch_id, owner=request.user).order_by('id')
+    if not jobs.exists():
+        raise Http404("No such batch.")
+
+    progress = batch_progress(batch_id)
+    progress['jobs'] = [{
+        'id': job.id,
+        'name': job.name,
+        'status': job.status,
+        'attempts': job.attempts,
+        'result': job.result,
+    } for job in jobs]
+    return JsonResponse(progress)
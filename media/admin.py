@@ -0,0 +1,21 @@
+from django.contrib import admin
+from .models import AssetDeletion
+
+
+@admin.register(AssetDeletion)
+class AssetDeletionAdmin(admin.ModelAdmin):
+    list_display = ('public_id', 'source', 'status', 'attempts', 'run_after', 'created')
+    list_filter = ('status', 'source')
+    search_fields = ('public_id',)
+    readonly_fields = ('created', 'updated', 'last_error')
+    ordering = ('-id',)
+
+    actions = ['retry']
+
+    def retry(self, request, queryset):
+        from django.utils import timezone
+        from .outbox import schedule_drain
+        updated = queryset.update(status=AssetDeletion.STATUS_PENDING, attempts=0, run_after=timezone.now())
+        schedule_drain()
+        self.message_user(request, f'{updated} deletions queued again.')
+    retry.short_description = "Retry selected deletions"
@@ -0,0 +1,20 @@
+from django.apps import AppConfig, apps
+
+
+class MediaConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'media'
+
+    def ready(self):
+        # Register the variant registry check
+        import media.checks
+        from media.variants import VariantURLMixin, eager_transformations
+
+        # Generate every declared variant at upload (CloudinaryField passes its options to the uploader)
+        for model in apps.get_models():
+            if not issubclass(model, VariantURLMixin):
+                continue
+            for field_name, variants in model.variant_fields.items():
+                field = model._meta.get_field(field_name)
+                field.options.setdefault('eager', eager_transformations(variants))
+                field.options.setdefault('eager_async', True)
@@ -0,0 +1,273 @@
+"""
+Media storage backends.
+
+The rest of the app talks to storage through get_backend(), chosen by the
+MEDIA_BACKEND setting: uploads, delivery URLs (MediaField values are MediaResources,
+whose url/build_url ask the backend), reading originals back, deletes and listing.
+
+CloudinaryBackend is the production one. LocalBackend keeps originals under
+MEDIA_LOCAL_ROOT and renders transformed variants on demand with Pillow
+(media.transform) into a disk cache, served by media.views.local_media, so the
+app, its benchmarks and load tests run with no network and no Cloudinary account.
+"""
+
+from datetime import datetime, timezone
+import hashlib
+import os
+import secrets
+import shutil
+import tempfile
+import time
+
+import requests
+from cloudinary import CloudinaryResource, api, uploader
+from cloudinary.utils import generate_transformation_string
+from django.conf import settings
+from django.utils.module_loading import import_string
+from PIL import Image
+
+from . import transform
+
+
+class MediaResource(CloudinaryResource):
+    """A stored asset whose URLs come from the configured backend"""
+
+    @classmethod
+    def from_resource(cls, resource, **overrides):
+        options = dict(
+            public_id=resource.public_id, format=resource.format, version=resource.version,
+            type=resource.type, resource_type=resource.resource_type, metadata=resource.metadata,
+        )
+        options.update(overrides)
+        return cls(**options)
+
+    @property
+    def url(self):
+        return self.build_url(**self.url_options)
+
+    def build_url(self, **options):
+        return get_backend().url(self, **options)
+
+
+class CloudinaryBackend:
+    # Most public_ids the Admin API accepts in one delete_resources call
+    max_delete_batch = 100
+
+    def upload(self, file, **options):
+        return MediaResource.from_resource(uploader.upload_resource(file, **options))
+
+    def url(self, resource, **options):
+        return CloudinaryResource.build_url(resource, **options)
+
+    # The stored original (or a derived version), downloaded into a temp file
+    # kept in memory only while small
+    def open(self, resource, **transformation):
+        spooled = tempfile.SpooledTemporaryFile(max_size=settings.PHOTO_UPLOAD_CHUNK_SIZE * 4)
+        with requests.get(self.url(resource, **transformation), stream=True, timeout=30) as response:
+            response.raise_for_status()
+            for chunk in response.iter_content(chunk_size=settings.PHOTO_UPLOAD_CHUNK_SIZE):
+                spooled.write(chunk)
+        spooled.seek(0)
+        return spooled
+
+    def destroy(self, public_id):
+        uploader.destroy(public_id)
+
+    # Destroy a batch of assets in one call; returns the public_ids that are gone
+    # ("not_found" counts as gone, the asset was already removed)
+    def delete_many(self, public_ids):
+        result = api.delete_resources(list(public_ids))
+        return {
+            public_id for public_id, outcome in result.get('deleted', {}).items()
+            if outcome in ('deleted', 'not_found')
+        }
+
+    # One page of the remote listing: ([(public_id, created_at), ...], next_cursor or None)
+    def list_page(self, cursor=None, page_size=500):
+        options = {'type': 'upload', 'resource_type': 'image', 'max_results': page_size}
+        if cursor:
+            options['next_cursor'] = cursor
+        result = api.resources(**options)
+        assets = [
+            (resource['public_id'], datetime.fromisoformat(resource['created_at']))
+            for resource in result.get('resources', [])
+        ]
+        return assets, result.get('next_cursor')
+
+
+class LocalBackend:
+    """
+    Originals live at <root>/originals/<public_id>.<format>. Derived files live at
+    <root>/derived/<asset key>/<key of version + transformation + format>.<format>,
+    so a new upload never serves a stale derivative and destroy() drops them all.
+    """
+
+    # Local deletes have no batch limit worth speaking of
+    max_delete_batch = 1000
+
+    def __init__(self, root=None, base_url=None):
+        self.root = str(root or settings.MEDIA_LOCAL_ROOT)
+        self.base_url = base_url or settings.MEDIA_LOCAL_URL
+
+    def upload(self, file, **options):
+        public_id = options.get('public_id') or secrets.token_hex(10)
+        if options.get('folder'):
+            public_id = f"{options['folder'].strip('/')}/{public_id}"
+        if '..' in public_id.split('/'):
+            raise ValueError(f"Invalid public_id: {public_id}")
+
+        if hasattr(file, 'seekable') and file.seekable():
+            file.seek(0)
+        try:
+            with Image.open(file) as img:
+                width, height = img.size
+                fmt = transform.PILLOW_EXTENSIONS.get(img.format, (img.format or 'jpg').lower())
+        except Exception as e:
+            raise ValueError(f"Invalid image file: {e}")
+        file.seek(0)
+
+        # Stored as uploaded: an incoming `transformation` would only re-encode the original here
+        path = self._original_path(public_id, fmt)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._remove_originals(public_id)
+        size = self._write(path, file.chunks() if hasattr(file, 'chunks') else iter(lambda: file.read(1 << 20), b''))
+
+        resource = MediaResource(metadata={
+            'public_id': public_id,
+            'version': int(time.time()),
+            'format': fmt,
+            'width': width,
+            'height': height,
+            'bytes': size,
+            'type': options.get('type', 'upload'),
+            'resource_type': options.get('resource_type', 'image'),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+        })
+        # eager_async work is left to the first request; otherwise render now, like Cloudinary
+        if not options.get('eager_async'):
+            for eager in options.get('eager') or []:
+                self.open(resource, **eager).close()
+        return resource
+
+    # /media-local/image/upload/<transformation>/v<version>/<public_id>.<format>, the Cloudinary URL shape
+    def url(self, resource, **options):
+        options = {
+            'format': resource.format, 'version': resource.version,
+            'type': resource.type, 'resource_type': resource.resource_type or 'image', **options,
+        }
+        transformation, options = generate_transformation_string(**options)
+        parts = [options.get('resource_type', 'image'), options.get('type', 'upload')]
+        if transformation:
+            parts.append(transformation)
+        if options.get('version'):
+            parts.append(f"v{options['version']}")
+        filename = resource.public_id + (f".{options['format']}" if options.get('format') else '')
+        return self.base_url + '/'.join(parts + [filename])
+
+    # The original, or a derived file rendered into the cache (f_auto resolves to JPEG/PNG here)
+    def open(self, resource, **transformation):
+        if not transformation:
+            return open(self._find_original(resource.public_id), 'rb')
+        transformation_string, options = generate_transformation_string(**dict(transformation))
+        fmt = options.get('format') or resource.format
+        path, _ = self.derive(resource.public_id, resource.version, transformation_string, fmt)
+        return open(path, 'rb')
+
+    # Path and content type of a derived file, rendering it on first use
+    def derive(self, public_id, version, transformation, extension, accept=''):
+        source = self._find_original(public_id)
+        steps = transform.parse_transformation(transformation)
+        fmt = transform.output_format(steps, extension, accept)
+        key = hashlib.sha256(f"{version}|{transformation}|{fmt}".encode()).hexdigest()
+        path = os.path.join(self._derived_dir(public_id), f"{key}.{fmt}")
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            try:
+                with os.fdopen(fd, 'wb') as out:
+                    transform.render(source, steps, fmt, out)
+                # Concurrent renders of the same file just replace each other atomically
+                os.replace(temp_path, path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+        return path, transform.FORMATS[fmt][1]
+
+    def original_path(self, public_id):
+        return self._find_original(public_id)
+
+    def destroy(self, public_id):
+        self._remove_originals(public_id)
+        shutil.rmtree(self._derived_dir(public_id), ignore_errors=True)
+
+    def delete_many(self, public_ids):
+        for public_id in public_ids:
+            self.destroy(public_id)
+        return set(public_ids)
+
+    # Originals in public_id order; the cursor is the last public_id returned
+    def list_page(self, cursor=None, page_size=500):
+        originals = os.path.join(self.root, 'originals')
+        found = []
+        for directory, _, files in os.walk(originals):
+            for name in files:
+                path = os.path.join(directory, name)
+                public_id = os.path.splitext(os.path.relpath(path, originals))[0].replace(os.sep, '/')
+                if cursor is None or public_id > cursor:
+                    found.append((public_id, path))
+        found.sort()
+        page = found[:page_size]
+        assets = [
+            (public_id, datetime.fromtimestamp(os.path.getmtime(path), timezone.utc))
+            for public_id, path in page
+        ]
+        return assets, (page[-1][0] if len(found) > page_size else None)
+
+    def _original_path(self, public_id, fmt):
+        return os.path.join(self.root, 'originals', *public_id.split('/')) + f'.{fmt}'
+
+    def _find_original(self, public_id):
+        if '..' in public_id.split('/'):
+            raise FileNotFoundError(public_id)
+        base = os.path.join(self.root, 'originals', *public_id.split('/'))
+        directory, name = os.path.split(base)
+        if os.path.isdir(directory):
+            for entry in os.listdir(directory):
+                if os.path.splitext(entry)[0] == name and os.path.isfile(os.path.join(directory, entry)):
+                    return os.path.join(directory, entry)
+        raise FileNotFoundError(public_id)
+
+    def _remove_originals(self, public_id):
+        try:
+            while True:
+                os.unlink(self._find_original(public_id))
+        except FileNotFoundError:
+            pass
+
+    def _derived_dir(self, public_id):
+        key = hashlib.sha256(public_id.encode()).hexdigest()
+        return os.path.join(self.root, 'derived', key[:2], key)
+
+    def _write(self, path, chunks):
+        size = 0
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                for chunk in chunks:
+                    out.write(chunk)
+                    size += len(chunk)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        return size
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = import_string(settings.MEDIA_BACKEND)()
+    return _backend
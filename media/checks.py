@@ -0,0 +1,34 @@
+"""
+System check that every CloudinaryField is covered by the variant registry.
+"""
+
+from cloudinary.models import CloudinaryField
+from django.apps import apps
+from django.core import checks
+
+from .variants import VARIANTS, VariantURLMixin
+
+
+@checks.register(checks.Tags.models)
+def check_variant_fields(app_configs=None, **kwargs):
+    errors = []
+    configs = app_configs or apps.get_app_configs()
+    for model in (model for config in configs for model in config.get_models()):
+        declared = model.variant_fields if issubclass(model, VariantURLMixin) else {}
+        for field in model._meta.local_fields:
+            if isinstance(field, CloudinaryField) and field.name not in declared:
+                errors.append(checks.Error(
+                    f"{model.__name__}.{field.name} has no image variants.",
+                    hint="Add VariantURLMixin and list the field in variant_fields (see media.variants).",
+                    obj=model,
+                    id='media.E001',
+                ))
+        for field_name, variants in declared.items():
+            unknown = [name for name in variants if name not in VARIANTS]
+            if unknown:
+                errors.append(checks.Error(
+                    f"{model.__name__}.{field_name} uses unknown variants: {', '.join(unknown)}.",
+                    obj=model,
+                    id='media.E002',
+                ))
+    return errors
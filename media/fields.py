@@ -0,0 +1,41 @@
+"""
+CloudinaryField that stores through the configured media backend.
+
+Values are MediaResources (same public_id/version/format, same database format),
+so switching MEDIA_BACKEND changes where uploads go and what URLs point at without
+touching models, forms or templates.
+"""
+
+from cloudinary import CloudinaryResource
+from cloudinary.models import CloudinaryField
+from django.core.files.uploadedfile import UploadedFile
+
+from .backends import MediaResource, get_backend
+
+
+class MediaField(CloudinaryField):
+    def parse_cloudinary_resource(self, value):
+        return MediaResource.from_resource(super().parse_cloudinary_resource(value))
+
+    def to_python(self, value):
+        if isinstance(value, CloudinaryResource) and not isinstance(value, MediaResource):
+            return MediaResource.from_resource(value)
+        return super().to_python(value)
+
+    # CloudinaryField.pre_save, with the upload going to the backend
+    def pre_save(self, model_instance, add):
+        value = getattr(model_instance, self.attname)
+        if not isinstance(value, UploadedFile):
+            return super().pre_save(model_instance, add)
+
+        options = {'type': self.type, 'resource_type': self.resource_type}
+        options.update({key: val(model_instance) if callable(val) else val for key, val in self.options.items()})
+        if hasattr(value, 'seekable') and value.seekable():
+            value.seek(0)
+        resource = get_backend().upload(value, **options)
+        setattr(model_instance, self.attname, resource)
+        if self.width_field:
+            setattr(model_instance, self.width_field, resource.metadata.get('width'))
+        if self.height_field:
+            setattr(model_instance, self.height_field, resource.metadata.get('height'))
+        return self.get_prep_value(resource)
@@ -0,0 +1,25 @@
+"""
+Send queued asset deletions now, without waiting for a worker.
+
+Usage: python manage.py drain_asset_deletions [--batch-size 100]
+"""
+
+from django.core.management.base import BaseCommand
+
+from media.models import AssetDeletion
+from media.outbox import drain_asset_deletions
+
+
+class Command(BaseCommand):
+    help = "Send pending asset deletions from the outbox to storage"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None, help='Public ids per storage call')
+
+    def handle(self, *args, **options):
+        result = drain_asset_deletions(batch_size=options['batch_size'])
+        dead = AssetDeletion.objects.filter(status=AssetDeletion.STATUS_DEAD).count()
+        self.stdout.write(
+            f"Deleted {result['deleted']}, {result['failed']} failed, {result['kept']} kept (in use again), "
+            f"{dead} dead in total"
+        )
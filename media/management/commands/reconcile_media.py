@@ -0,0 +1,112 @@
+"""
+Find remote assets that no Photo, Project or User refers to, and delete them.
+
+Streams the storage listing page by page and checks each page against an on-disk
+set of referenced public_ids, so memory stays flat however many assets there are.
+Orphans are queued in the deletion outbox (or only printed with --dry-run).
+Progress is checkpointed after every page; --resume continues an interrupted run.
+Usage: python manage.py reconcile_media --dry-run
+       python manage.py reconcile_media --max-pages 400 --resume
+"""
+
+from datetime import timedelta
+import json
+import os
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from media.backends import get_backend
+from media.outbox import queue_asset_deletions
+from media.reconcile import ReferencedAssets, referenced_public_ids, find_orphans
+
+
+class Command(BaseCommand):
+    help = "Delete (or report) remote assets that nothing in the database refers to"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Print orphans instead of deleting them')
+        parser.add_argument('--resume', action='store_true', help='Continue from the checkpoint')
+        parser.add_argument('--checkpoint', default=settings.MEDIA_RECONCILE_CHECKPOINT,
+                            help='Where progress is saved between pages')
+        parser.add_argument('--page-size', type=int, default=500, help='Assets per listing call')
+        parser.add_argument('--min-age-hours', type=int, default=24,
+                            help='Ignore assets newer than this (uploads still being committed)')
+        parser.add_argument('--max-pages', type=int, default=None,
+                            help='Stop after this many listing calls (API rate limits); resume later')
+
+    def handle(self, *args, **options):
+        path = options['checkpoint']
+        state = self._load_checkpoint(path) if options['resume'] else None
+        if state is None:
+            state = {'cursor': None, 'pages': 0, 'scanned': 0, 'orphans': 0, 'done': False,
+                     'dry_run': options['dry_run']}
+        elif state['dry_run'] != options['dry_run']:
+            # Resuming a dry run for real would skip deleting everything it already listed
+            raise CommandError("The checkpoint is from a run with a different --dry-run setting")
+        elif state['done']:
+            self.stdout.write("The checkpointed run already finished; start a new one without --resume.")
+            return
+
+        backend = get_backend()
+        created_before = timezone.now() - timedelta(hours=options['min_age_hours'])
+        pages = 0
+
+        with tempfile.TemporaryDirectory() as workdir:
+            # Rebuilt on every run, resumed or not, so it reflects the database as it is now
+            referenced = ReferencedAssets(os.path.join(workdir, 'referenced.sqlite3'))
+            try:
+                count = referenced.build(referenced_public_ids())
+                self.stdout.write(f"{count} referenced assets")
+
+                while not state['done']:
+                    if options['max_pages'] and pages >= options['max_pages']:
+                        self.stdout.write(f"Stopped after {pages} pages; continue with --resume")
+                        break
+                    assets, next_cursor = backend.list_page(state['cursor'], options['page_size'])
+                    orphans = find_orphans(referenced, assets, created_before)
+                    self._handle_orphans(orphans, options['dry_run'])
+
+                    pages += 1
+                    state.update(
+                        cursor=next_cursor,
+                        pages=state['pages'] + 1,
+                        scanned=state['scanned'] + len(assets),
+                        orphans=state['orphans'] + len(orphans),
+                        done=next_cursor is None,
+                    )
+                    self._save_checkpoint(path, state)
+            finally:
+                referenced.close()
+
+        verb = 'found' if options['dry_run'] else 'queued for deletion'
+        self.stdout.write(f"Scanned {state['scanned']} assets in {state['pages']} pages, {state['orphans']} orphans {verb}")
+
+    def _handle_orphans(self, orphans, dry_run):
+        if dry_run:
+            for public_id in orphans:
+                self.stdout.write(public_id)
+        elif orphans:
+            # The outbox sends them in batches; a resumed run skips ids already queued
+            with transaction.atomic():
+                queue_asset_deletions(orphans, source='reconcile_media')
+
+    def _load_checkpoint(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            raise CommandError(f"Checkpoint {path} is corrupt; delete it to start over")
+
+    # Written to a temp file and renamed, so a crash never leaves half a checkpoint
+    def _save_checkpoint(self, path, state):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(temp_path, path)
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 14:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assetdeletion',
+            name='content_hash',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
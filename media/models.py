@@ -0,0 +1,43 @@
+from django.db import models
+from django.utils import timezone
+
+
+class AssetDeletion(models.Model):
+    """
+    Outbox row for a remote asset that should be destroyed.
+
+    Written by the cleanup signals in the same transaction as the delete or replace
+    that orphaned the asset, then sent in batches by media.outbox.drain_asset_deletions().
+    Sent rows are removed; rows that keep failing end up dead for manual review.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_DEAD, 'Dead'),
+    ]
+
+    public_id = models.CharField(max_length=255)
+    # what dropped the asset, e.g. "projects.Photo", for the admin and logs
+    source = models.CharField(max_length=50, blank=True)
+    # set for assets deduplicated uploads share, so the drainer can check the source model
+    # again before sending (media.outbox)
+    content_hash = models.CharField(max_length=64, blank=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now, help_text="Not sent before this time")
+    last_error = models.TextField(blank=True)
+
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['run_after', 'id']
+        indexes = [
+            # The drain query: next pending deletions that are due
+            models.Index(fields=['status', 'run_after']),
+        ]
+
+    def __str__(self):
+        return f"{self.public_id} ({self.status})"
@@ -0,0 +1,204 @@
+"""
+Transactional outbox for remote asset deletions.
+
+Signals call queue_asset_deletion() instead of destroying assets inline. The row is
+written in the caller's transaction, so an asset is only deleted if the change that
+orphaned it commits, and a drain job (media.drain_asset_deletions) is queued with it.
+The drainer sends up to ASSET_DELETE_BATCH_SIZE public_ids per storage call and
+retries failures with backoff until ASSET_DELETE_MAX_ATTEMPTS, then marks them dead.
+Wrap large deletes in collect_asset_deletions() to write the whole batch with one INSERT.
+Assets other rows may share go through queue_unused_asset_deletions(); inside the
+block, which of them are still referenced is checked once for the whole batch. Those
+rows keep the asset's content hash, and the drainer checks again right before sending
+them, since a new upload can take a shared asset back after its deletion was queued.
+"""
+
+from contextlib import contextmanager
+from datetime import timedelta
+import logging
+import threading
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import enqueue, retry_delay
+from .backends import get_backend
+from .models import AssetDeletion
+
+logger = logging.getLogger(__name__)
+
+DRAIN_JOB = 'media.drain_asset_deletions'
+
+_local = threading.local()
+
+
+# Record assets to destroy once the current transaction commits
+def queue_asset_deletions(public_ids, source=''):
+    public_ids = [public_id for public_id in public_ids if public_id]
+    if not public_ids:
+        return
+
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        # Inside collect_asset_deletions(); written in one go when the block exits
+        pending.extend((public_id, source, '') for public_id in public_ids)
+        return
+
+    _write_deletions([(public_id, source, '') for public_id in public_ids])
+
+
+def queue_asset_deletion(public_id, source=''):
+    queue_asset_deletions([public_id], source=source)
+
+
+# Record assets to destroy unless other rows still reference them
+# `assets` are (content_hash, public_id) pairs and `source` the label of the model sharing them,
+# whose assets_in_use(pairs) returns the pairs still referenced (e.g. projects.Photo).
+# Inside collect_asset_deletions() that check runs once per source, when the block exits
+def queue_unused_asset_deletions(assets, source):
+    checks = getattr(_local, 'checks', None)
+    if checks is not None:
+        checks.setdefault(source, []).extend(assets)
+        return
+    _write_deletions(_unused(assets, source))
+
+
+# (public_id, source, content_hash) rows for the assets no row references any more
+def _unused(assets, source):
+    assets = [(content_hash, public_id) for content_hash, public_id in assets if public_id]
+    if not assets:
+        return []
+    used = apps.get_model(source).assets_in_use(set(assets))
+    return [(public_id, source, content_hash) for content_hash, public_id in assets
+            if (content_hash, public_id) not in used]
+
+
+# Take back queued deletions of assets that are in use again (e.g. reused by a new upload)
+# Waits for a drainer sending one of them; returns the public_ids whose deletion was cancelled
+def cancel_asset_deletions(public_ids):
+    rows = dict(
+        AssetDeletion.objects.select_for_update().filter(public_id__in=public_ids).values_list('pk', 'public_id')
+    )
+    if rows:
+        AssetDeletion.objects.filter(pk__in=rows).delete()
+    return set(rows.values())
+
+
+# Buffer deletions queued by signals (e.g. a bulk or cascading delete) and insert them together
+# Use inside the transaction doing the delete so the rows commit with it
+@contextmanager
+def collect_asset_deletions():
+    if getattr(_local, 'pending', None) is not None:
+        # Nested block; the outermost one writes
+        yield
+        return
+
+    _local.pending = []
+    _local.checks = {}
+    try:
+        yield
+        pending, checks = _local.pending, _local.checks
+    finally:
+        _local.pending = _local.checks = None
+    for source, assets in checks.items():
+        pending.extend(_unused(assets, source))
+    _write_deletions(pending)
+
+
+# One row per asset, however many deleted rows referenced it
+def _write_deletions(deletions):
+    rows = {}
+    for public_id, source, content_hash in deletions:
+        rows.setdefault(public_id, (source, content_hash))
+    if not rows:
+        return
+    AssetDeletion.objects.bulk_create([
+        AssetDeletion(public_id=public_id, source=source, content_hash=content_hash)
+        for public_id, (source, content_hash) in rows.items()
+    ])
+    schedule_drain()
+
+
+# Queue a drain job unless one is already queued to run by then
+def schedule_drain(delay=0):
+    run_by = timezone.now() + timedelta(seconds=delay)
+    if not Job.objects.filter(name=DRAIN_JOB, status=Job.STATUS_QUEUED, run_after__lte=run_by).exists():
+        enqueue(DRAIN_JOB, delay=delay)
+
+
+# Send every due deletion, batch by batch; returns counts for the job result
+def drain_asset_deletions(batch_size=None):
+    backend = get_backend()
+    batch_size = min(batch_size or settings.ASSET_DELETE_BATCH_SIZE, backend.max_delete_batch)
+    deleted = failed = kept = 0
+
+    while True:
+        # Rows stay locked while their batch is sent, so concurrent drainers skip them
+        with transaction.atomic():
+            rows = list(
+                AssetDeletion.objects.select_for_update(skip_locked=True)
+                .filter(status=AssetDeletion.STATUS_PENDING, run_after__lte=timezone.now())
+                .order_by('run_after', 'id')[:batch_size]
+            )
+            if not rows:
+                break
+
+            # Shared assets a row references again stay; their deletions are dropped unsent
+            reused = _reused(rows)
+            public_ids = sorted({row.public_id for row in rows} - reused)
+            gone, error = set(), ''
+            if public_ids:
+                try:
+                    gone = backend.delete_many(public_ids)
+                    error = "Not deleted by the storage backend"
+                except Exception as e:
+                    logger.warning(f"Failed to delete {len(public_ids)} assets: {e}")
+                    error = str(e)
+
+            AssetDeletion.objects.filter(pk__in=[row.pk for row in rows if row.public_id in gone | reused]).delete()
+            retry = [row for row in rows if row.public_id not in gone | reused]
+            for row in retry:
+                _record_failure(row, error)
+            AssetDeletion.objects.bulk_update(retry, ['status', 'attempts', 'run_after', 'last_error', 'updated'])
+
+        dropped = sum(1 for row in rows if row.public_id in reused)
+        deleted += len(rows) - len(retry) - dropped
+        failed += len(retry)
+        kept += dropped
+        logger.info(f"Deleted {len(gone)} assets from storage, {len(retry)} to retry, {len(reused)} in use again")
+
+    # Failures waiting out their backoff need another drain later
+    next_due = AssetDeletion.objects.filter(status=AssetDeletion.STATUS_PENDING).aggregate(
+        next_due=Min('run_after'))['next_due']
+    if next_due is not None:
+        schedule_drain(delay=max((next_due - timezone.now()).total_seconds(), 0))
+
+    return {'deleted': deleted, 'failed': failed, 'kept': kept}
+
+
+# public_ids of rows whose shared asset is referenced again, checked once per source model
+def _reused(rows):
+    shared = {}
+    for row in rows:
+        if row.content_hash:
+            shared.setdefault(row.source, set()).add((row.content_hash, row.public_id))
+    return {
+        public_id
+        for source, assets in shared.items()
+        for _, public_id in apps.get_model(source).assets_in_use(assets)
+    }
+
+
+def _record_failure(row, error):
+    row.attempts += 1
+    row.last_error = error
+    row.updated = timezone.now()
+    if row.attempts >= settings.ASSET_DELETE_MAX_ATTEMPTS:
+        row.status = AssetDeletion.STATUS_DEAD
+        logger.error(f"Giving up on deleting asset {row.public_id} after {row.attempts} attempts: {error}")
+    else:
+        row.run_after = timezone.now() + timedelta(seconds=retry_delay(row.attempts))
@@ -0,0 +1,189 @@
+"""
+Disk cache behind the image proxy (media.views.image_proxy).
+
+Variants are fetched from the media backend once and kept as files under
+IMAGE_PROXY_CACHE_DIR, evicted least recently used once the directory passes
+IMAGE_PROXY_CACHE_MAX_BYTES. A file's mtime is when it was cached (Last-Modified);
+its atime is set on every hit and orders the LRU, so the order survives a restart.
+
+Concurrent misses for the same key are coalesced: threads in a process queue on a
+per-key lock and other processes on a flock()ed lock file, and whoever gets it
+first fetches while the rest find the file in place when they get their turn.
+"""
+
+from collections import OrderedDict
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; coalescing is then per process only
+    fcntl = None
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ThumbnailCache:
+    def __init__(self, directory, max_bytes):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.stats = {'hits': 0, 'fills': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+        self._inflight = {}
+        # key -> (path, size), least recently used first; built from disk on first use
+        self._index = None
+        self._size = 0
+
+    def path(self, key, extension):
+        return os.path.join(self.directory, key[:2], f'{key}.{extension}')
+
+    # Path of a cached file, or None; a hit moves it to the young end of the LRU
+    def get(self, key, extension):
+        path = self.path(key, extension)
+        try:
+            stat = os.stat(path)
+            os.utime(path, (time.time(), stat.st_mtime))
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            index = self._load()
+            index[key] = (path, stat.st_size)
+            index.move_to_end(key)
+            self.stats['hits'] += 1
+        return path
+
+    # Path of the cached file, calling fetch(out) to write it on a miss; one fetch per key at a time
+    def get_or_fill(self, key, extension, fetch):
+        path = self.get(key, extension)
+        if path is not None:
+            return path
+
+        with self._lock:
+            lock = self._inflight.setdefault(key, threading.Lock())
+        try:
+            with lock, self._process_lock(key) as process_lock:
+                try:
+                    # Someone else may have filled it while we waited
+                    path = self.get(key, extension)
+                    if path is None:
+                        path = self._fill(key, extension, fetch)
+                finally:
+                    # Later arrivals find the file (or retry a failed fetch) without it,
+                    # and lock files for bad requests don't pile up
+                    process_lock.remove()
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is lock and not lock.locked():
+                    del self._inflight[key]
+        return path
+
+    def _fill(self, key, extension, fetch):
+        with self._lock:
+            # Index what's on disk before the new file lands, so it isn't counted twice
+            self._load()
+        path = self.path(key, extension)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                fetch(out)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.unlink(temp_path)
+            raise
+        size = os.path.getsize(path)
+        with self._lock:
+            replaced = self._index.pop(key, None)
+            self._index[key] = (path, size)
+            self._size += size - (replaced[1] if replaced else 0)
+            self.stats['fills'] += 1
+            self._evict()
+        return path
+
+    # Drop least recently used files until the cache fits; the newest entry always stays
+    def _evict(self):
+        while self._size > self.max_bytes and len(self._index) > 1:
+            _, (path, size) = self._index.popitem(last=False)
+            self._size -= size
+            self.stats['evictions'] += 1
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    # Index of what is on disk, oldest access first (read once per process)
+    def _load(self):
+        if self._index is None:
+            entries = []
+            for directory, _, files in os.walk(self.directory):
+                for name in files:
+                    if name.endswith(('.part', '.lock')):
+                        continue
+                    path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_atime, os.path.splitext(name)[0], path, stat.st_size))
+            entries.sort()
+            self._index = OrderedDict((key, (path, size)) for _, key, path, size in entries)
+            self._size = sum(size for _, _, _, size in entries)
+        return self._index
+
+    # flock() on a per-key lock file, so processes sharing the directory fetch once too
+    def _process_lock(self, key):
+        return _FileLock(os.path.join(self.directory, 'locks', f'{key}.lock')) if fcntl else _NoLock()
+
+
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.file = open(self.path, 'a')
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
+
+    def remove(self):
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+
+class _NoLock:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def remove(self):
+        pass
+
+
+# Stream `source` (a file object from the backend) into `out` without reading it whole
+def copy_stream(source, out):
+    with source:
+        shutil.copyfileobj(source, out, length=settings.PHOTO_UPLOAD_CHUNK_SIZE)
+
+
+_cache = None
+
+
+def get_cache():
+    global _cache
+    if _cache is None:
+        _cache = ThumbnailCache(settings.IMAGE_PROXY_CACHE_DIR, settings.IMAGE_PROXY_CACHE_MAX_BYTES)
+    return _cache
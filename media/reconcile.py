@@ -0,0 +1,91 @@
+"""
+Orphan-asset reconciliation between remote storage and the database.
+
+The public_ids the database refers to are written to an on-disk SQLite table,
+so neither side of the comparison has to fit in memory. The remote listing is
+then streamed a page at a time and checked against it.
+Used by `manage.py reconcile_media`.
+"""
+
+import sqlite3
+
+from django.apps import apps
+
+from .models import AssetDeletion
+
+# Every model field that points at a stored asset
+ASSET_FIELDS = [
+    ('projects.Photo', 'image'),
+    ('projects.Project', 'cover_photo'),
+    ('users.User', 'avatar'),
+]
+
+# SQLite's default limit on bound parameters is far above this
+LOOKUP_CHUNK = 500
+
+
+# Stream every public_id a row still refers to, plus ones already queued for deletion
+def referenced_public_ids(chunk_size=2000):
+    for label, field in ASSET_FIELDS:
+        model = apps.get_model(label)
+        # _base_manager, so rows hidden by a custom default manager still count
+        values = (
+            model._base_manager.exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+            .values_list(field, flat=True).iterator(chunk_size=chunk_size)
+        )
+        for resource in values:
+            public_id = getattr(resource, 'public_id', None)
+            if public_id:
+                yield public_id
+
+    yield from (
+        AssetDeletion.objects.filter(status=AssetDeletion.STATUS_PENDING)
+        .values_list('public_id', flat=True).iterator(chunk_size=chunk_size)
+    )
+
+
+class ReferencedAssets:
+    """Set of referenced public_ids kept in a SQLite file"""
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute('CREATE TABLE IF NOT EXISTS referenced (public_id TEXT PRIMARY KEY) WITHOUT ROWID')
+
+    def build(self, public_ids, chunk_size=10000):
+        count = 0
+        chunk = []
+        for public_id in public_ids:
+            chunk.append((public_id,))
+            if len(chunk) >= chunk_size:
+                count += self._insert(chunk)
+                chunk = []
+        count += self._insert(chunk)
+        self.db.commit()
+        return count
+
+    def _insert(self, rows):
+        before = self.db.total_changes
+        self.db.executemany('INSERT OR IGNORE INTO referenced VALUES (?)', rows)
+        return self.db.total_changes - before
+
+    # The given public_ids that aren't referenced
+    def missing(self, public_ids):
+        public_ids = list(public_ids)
+        found = set()
+        for start in range(0, len(public_ids), LOOKUP_CHUNK):
+            chunk = public_ids[start:start + LOOKUP_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            found.update(row[0] for row in self.db.execute(
+                f'SELECT public_id FROM referenced WHERE public_id IN ({placeholders})', chunk
+            ))
+        return [public_id for public_id in public_ids if public_id not in found]
+
+    def close(self):
+        self.db.close()
+
+
+# Unreferenced assets from one listing page, skipping ones newer than `created_before`
+# (a staged upload exists remotely a moment before its row is committed)
+def find_orphans(referenced, assets, created_before):
+    old_enough = [public_id for public_id, created_at in assets if created_at < created_before]
+    return referenced.missing(old_enough)
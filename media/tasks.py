@@ -0,0 +1,12 @@
+"""
+Background jobs for the media app (run by manage.py run_workers).
+"""
+
+from jobs.queue import job_handler
+from .outbox import DRAIN_JOB, drain_asset_deletions
+
+
+# Send queued asset deletions to storage in batches
+@job_handler(DRAIN_JOB)
+def drain(payload):
+    return drain_asset_deletions()
@@ -0,0 +1,57 @@
+"""
+Template tags for image variants (see media.variants).
+
+    {% load media_tags %}
+    {% variant_img project 'cover_photo' 'card' alt=project.title %}
+    <img src="{% variant_url user 'avatar' 'avatar' %}" {% variant_srcset user 'avatar' 'avatar' sizes='100px' %}>
+"""
+
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from media.variants import VARIANTS
+
+register = template.Library()
+
+
+# Delivery URL of one variant, e.g. for a CSS background
+@register.simple_tag
+def variant_url(obj, field_name, variant):
+    return obj.variant_url(field_name, variant) or ''
+
+
+# srcset="..." sizes="..." attributes for an existing <img>
+@register.simple_tag
+def variant_srcset(obj, field_name, variant, sizes=None):
+    srcset = obj.variant_srcset(field_name, variant)
+    if not srcset:
+        return ''
+    return format_html('srcset="{}" sizes="{}"', srcset, sizes or VARIANTS[variant]['sizes'])
+
+
+# A complete responsive <img>; other keyword arguments become attributes (loading="lazy" unless given)
+@register.simple_tag
+def variant_img(obj, field_name, variant, sizes=None, **attrs):
+    src = obj.variant_url(field_name, variant)
+    if not src:
+        return ''
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    return format_html(
+        '<img src="{}" {}{}>',
+        src,
+        variant_srcset(obj, field_name, variant, sizes),
+        format_html_join('', ' {}="{}"', ((name.replace('_', '-'), value) for name, value in attrs.items())),
+    )
+
+
+# Inline CSS painting an object's placeholder (its tiny image over the dominant colour)
+# for a container while its image loads; '' when there is none
+@register.simple_tag
+def placeholder_style(obj):
+    layers = []
+    if getattr(obj, 'dominant_color', ''):
+        layers.append(obj.dominant_color)
+    if getattr(obj, 'placeholder_uri', ''):
+        layers.append(f"url('{obj.placeholder_uri}') center / cover no-repeat")
+    return format_html('background: {};', ' '.join(layers)) if layers else ''
@@ -0,0 +1,199 @@
+from datetime import timedelta
+from io import StringIO
+import json
+import os
+import tempfile
+from unittest import mock
+
+from cloudinary import CloudinaryResource
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from projects.models import Photo, Project
+from .models import AssetDeletion
+from .outbox import drain_asset_deletions
+
+
+def _resource(public_id):
+    return CloudinaryResource(public_id, format='jpg', type='upload', resource_type='image')
+
+
+class FakeListingBackend:
+    """
+    A storage listing of `count` assets named fake/0000000, fake/0000001, ..., built a page
+    at a time so a million of them cost no memory. Assets `is_new(i)` picks were just
+    uploaded; the rest are a week old. The cursor is the offset of the next page.
+    """
+
+    def __init__(self, count, is_new=None):
+        self.count = count
+        self.is_new = is_new or (lambda i: False)
+        self.cursors = []
+        now = timezone.now()
+        self.old, self.new = now - timedelta(days=7), now
+
+    def public_id(self, i):
+        return f'fake/{i:07d}'
+
+    def list_page(self, cursor=None, page_size=500):
+        self.cursors.append(cursor)
+        start = int(cursor or 0)
+        end = min(start + page_size, self.count)
+        assets = [(self.public_id(i), self.new if self.is_new(i) else self.old) for i in range(start, end)]
+        return assets, (str(end) if end < self.count else None)
+
+
+class ReconcileMediaTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # fake/0000001-0000003 are referenced by each kind of asset field
+        cls.user = get_user_model().objects.create_user('reconcile', avatar=_resource('fake/0000001'))
+        project = Project.objects.create(owner=cls.user, title='Reconcile', cover_photo=_resource('fake/0000002'))
+        Photo.objects.create(project=project, image=_resource('fake/0000003'))
+
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.checkpoint = os.path.join(workdir.name, 'reconcile.json')
+
+    def reconcile(self, backend, *args):
+        with mock.patch('media.management.commands.reconcile_media.get_backend', return_value=backend):
+            call_command('reconcile_media', '--checkpoint', self.checkpoint, *args, stdout=StringIO())
+
+    def queued(self):
+        return set(AssetDeletion.objects.values_list('public_id', flat=True))
+
+    def test_queues_only_old_unreferenced_assets(self):
+        # fake/0000000 and fake/0000005 are too new to judge, fake/0000001-0000003 are in use
+        backend = FakeListingBackend(8, is_new=lambda i: i % 5 == 0)
+        self.reconcile(backend, '--page-size', '3')
+        self.assertEqual(self.queued(), {'fake/0000004', 'fake/0000006', 'fake/0000007'})
+
+    def test_min_age_hours_decides_what_is_new(self):
+        backend = FakeListingBackend(8)
+        # Every asset is a week old, so a 30-day threshold leaves nothing to delete
+        self.reconcile(backend, '--min-age-hours', str(24 * 30))
+        self.assertEqual(self.queued(), set())
+
+    def test_already_queued_assets_are_not_queued_again(self):
+        AssetDeletion.objects.create(public_id='fake/0000004')
+        self.reconcile(FakeListingBackend(5))
+        self.assertEqual(AssetDeletion.objects.filter(public_id='fake/0000004').count(), 1)
+        self.assertEqual(self.queued(), {'fake/0000000', 'fake/0000004'})
+
+    def test_dry_run_queues_nothing(self):
+        backend = FakeListingBackend(8)
+        out = StringIO()
+        with mock.patch('media.management.commands.reconcile_media.get_backend', return_value=backend):
+            call_command('reconcile_media', '--checkpoint', self.checkpoint, '--dry-run', stdout=out)
+        self.assertEqual(self.queued(), set())
+        self.assertIn('fake/0000004', out.getvalue().split())
+        self.assertNotIn('fake/0000001', out.getvalue().split())
+
+    def test_resume_continues_from_checkpoint(self):
+        backend = FakeListingBackend(10)
+        self.reconcile(backend, '--page-size', '4', '--max-pages', '1')
+        self.assertEqual(self.queued(), {'fake/0000000'})
+        with open(self.checkpoint) as f:
+            self.assertEqual(json.load(f)['cursor'], '4')
+
+        self.reconcile(backend, '--page-size', '4', '--resume')
+        # The first page is not listed again
+        self.assertEqual(backend.cursors, [None, '4', '8'])
+        self.assertEqual(self.queued(), {'fake/0000000'} | {f'fake/{i:07d}' for i in range(4, 10)})
+        with open(self.checkpoint) as f:
+            state = json.load(f)
+        self.assertEqual((state['pages'], state['scanned'], state['orphans'], state['done']), (3, 10, 7, True))
+
+    def test_resume_refuses_a_checkpoint_with_another_dry_run_setting(self):
+        backend = FakeListingBackend(10)
+        self.reconcile(backend, '--page-size', '4', '--max-pages', '1', '--dry-run')
+        with self.assertRaisesMessage(CommandError, '--dry-run'):
+            self.reconcile(backend, '--page-size', '4', '--resume')
+        self.assertEqual(self.queued(), set())
+
+    def test_million_asset_listing(self):
+        # Only every 1000th asset is old enough: 1000 candidates, two of them in use
+        backend = FakeListingBackend(1_000_000, is_new=lambda i: i % 1000 != 1)
+        Photo.objects.create(project=Project.objects.get(), image=_resource('fake/0005001'))
+        self.reconcile(backend, '--page-size', '10000')
+
+        self.assertEqual(len(backend.cursors), 100)
+        queued = self.queued()
+        self.assertEqual(len(queued), 998)
+        self.assertNotIn('fake/0000001', queued)
+        self.assertNotIn('fake/0005001', queued)
+        self.assertIn('fake/0999001', queued)
+        with open(self.checkpoint) as f:
+            state = json.load(f)
+        self.assertEqual((state['scanned'], state['orphans'], state['done']), (1_000_000, 998, True))
+
+
+class RecordingBackend:
+    """Deletes everything it is asked to, and remembers what that was"""
+    max_delete_batch = 100
+
+    def __init__(self):
+        self.deleted = []
+
+    def delete_many(self, public_ids):
+        self.deleted.extend(public_ids)
+        return set(public_ids)
+
+
+# Deletions of shared assets are checked again by the drainer before anything is sent
+class AssetDeletionDrainTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user('drain')
+        cls.project = Project.objects.create(owner=user, title='Drain')
+
+    def drain(self):
+        backend = RecordingBackend()
+        with mock.patch('media.outbox.get_backend', return_value=backend):
+            result = drain_asset_deletions()
+        return backend.deleted, result
+
+    def test_deleting_last_sharer_queues_asset_with_its_hash(self):
+        photos = [
+            Photo.objects.create(project=self.project, image=_resource('shared/a'), content_hash='a' * 64)
+            for _ in range(2)
+        ]
+        photos[0].delete()
+        self.assertFalse(AssetDeletion.objects.exists())
+        photos[1].delete()
+        self.assertEqual(list(AssetDeletion.objects.values_list('public_id', 'content_hash')), [('shared/a', 'a' * 64)])
+
+    def test_bulk_delete_of_sharers_queues_one_row(self):
+        for _ in range(3):
+            Photo.objects.create(project=self.project, image=_resource('shared/a'), content_hash='a' * 64)
+        Photo.objects.filter(project=self.project).delete()
+        self.assertEqual(AssetDeletion.objects.filter(public_id='shared/a').count(), 1)
+
+    def test_drain_sends_unreferenced_assets(self):
+        Photo.objects.create(project=self.project, image=_resource('shared/a'), content_hash='a' * 64).delete()
+        Photo.objects.create(project=self.project, image=_resource('single/b')).delete()
+        deleted, result = self.drain()
+        self.assertEqual(sorted(deleted), ['shared/a', 'single/b'])
+        self.assertEqual(result, {'deleted': 2, 'failed': 0, 'kept': 0})
+        self.assertFalse(AssetDeletion.objects.exists())
+
+    def test_drain_keeps_an_asset_reused_after_it_was_queued(self):
+        Photo.objects.create(project=self.project, image=_resource('shared/a'), content_hash='a' * 64).delete()
+        Photo.objects.create(project=self.project, image=_resource('single/b')).delete()
+        # A deduplicated upload took the asset back before the drain ran
+        Photo.objects.create(project=self.project, image=_resource('shared/a'), content_hash='a' * 64)
+
+        deleted, result = self.drain()
+        self.assertEqual(deleted, ['single/b'])
+        self.assertEqual(result, {'deleted': 1, 'failed': 0, 'kept': 1})
+        self.assertFalse(AssetDeletion.objects.exists())
+
+    def test_drain_with_only_reused_assets_sends_nothing(self):
+        Photo.objects.create(project=self.project, image=_resource('shared/a'), content_hash='a' * 64).delete()
+        Photo.objects.create(project=self.project, image=_resource('shared/a'), content_hash='a' * 64)
+        deleted, result = self.drain()
+        self.assertEqual(deleted, [])
+        self.assertEqual(result['kept'], 1)
@@ -0,0 +1,65 @@
+"""
+Change tracking for model fields, snapshotted when an instance is loaded.
+
+Models list the fields to watch in `tracked_fields`. from_db() keeps the loaded
+values, so a save can tell whether a field changed (and what it held before)
+without reading the row again. The Cloudinary cleanup signals use it to spot a
+replaced image.
+"""
+
+
+class FieldTrackingMixin:
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_loaded_values()
+        return instance
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # post_save receivers have seen the old values; from here on the saved ones are "loaded"
+        self._remember_loaded_values(kwargs.get('update_fields'))
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        self._remember_loaded_values(fields)
+
+    # Keep references to the current values; deferred fields are skipped (not in __dict__)
+    def _remember_loaded_values(self, fields=None):
+        loaded = self.__dict__.setdefault('_loaded_values', {})
+        for name in self.tracked_fields:
+            if fields is not None and name not in fields:
+                continue
+            attname = self._meta.get_field(name).attname
+            if attname in self.__dict__:
+                loaded[name] = self.__dict__[attname]
+
+    def has_loaded_value(self, name):
+        return name in self.__dict__.get('_loaded_values', {})
+
+    # Value the field had when the instance was loaded or last saved
+    def loaded_value(self, name, default=None):
+        return self.__dict__.get('_loaded_values', {}).get(name, default)
+
+    # True/False, or None if the loaded value isn't known (new or unsaved instance, deferred field)
+    def field_changed(self, name):
+        if not self.has_loaded_value(name):
+            return None
+        field = self._meta.get_field(name)
+        old, new = self.loaded_value(name), getattr(self, field.attname)
+        if old is new:
+            return False
+        # Compare what would be stored; CloudinaryResource has no __eq__ of its own
+        return field.get_prep_value(old) != field.get_prep_value(new)
+
+    # One query for loaded values the snapshot lacks, e.g. an instance built with a pk
+    # instead of fetched (such a save is still an UPDATE); instances without a pk are skipped
+    def load_missing_values(self, *names):
+        missing = [name for name in names if not self.has_loaded_value(name)]
+        if not missing or self.pk is None:
+            return
+        row = type(self)._base_manager.filter(pk=self.pk).values(*missing).first()
+        if row is not None:
+            self.__dict__.setdefault('_loaded_values', {}).update(row)
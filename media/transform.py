@@ -0,0 +1,110 @@
+"""
+Pillow implementation of the Cloudinary transformations the app uses, for LocalBackend.
+
+Handles the URL form Cloudinary produces (`c_fill,h_300,q_auto:good,w_300`, one
+component per path segment, applied in order): width, height, crop (fill, thumb,
+limit, fit, scale, pad, crop), quality (a number or auto[:best|good|eco|low]),
+fetch format (including f_auto, resolved against the Accept header), gravity
+(face/auto fall back to centre) and the progressive flag. Anything else is ignored.
+"""
+
+from PIL import Image, ImageOps
+
+QUALITY_AUTO = {'auto': 80, 'auto:best': 90, 'auto:good': 80, 'auto:eco': 70, 'auto:low': 60}
+
+FORMATS = {
+    'jpg': ('JPEG', 'image/jpeg'),
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'png': ('PNG', 'image/png'),
+    'webp': ('WEBP', 'image/webp'),
+    'gif': ('GIF', 'image/gif'),
+    'tiff': ('TIFF', 'image/tiff'),
+    'tif': ('TIFF', 'image/tiff'),
+}
+
+# Pillow format name -> the extension Cloudinary reports
+PILLOW_EXTENSIONS = {'JPEG': 'jpg', 'PNG': 'png', 'WEBP': 'webp', 'GIF': 'gif', 'TIFF': 'tiff', 'MPO': 'jpg'}
+
+PARAMETERS = {'w': 'width', 'h': 'height', 'c': 'crop', 'q': 'quality', 'f': 'fetch_format', 'g': 'gravity', 'fl': 'flags'}
+
+
+# "c_fill,w_300/q_auto" -> [{'crop': 'fill', 'width': '300'}, {'quality': 'auto'}]
+def parse_transformation(transformation):
+    steps = []
+    for segment in filter(None, transformation.split('/')):
+        step = {}
+        for part in segment.split(','):
+            key, _, value = part.partition('_')
+            if key in PARAMETERS and value:
+                step[PARAMETERS[key]] = value
+        steps.append(step)
+    return steps
+
+
+# True if every comma-separated part of a path segment is a transformation parameter
+def is_transformation(segment):
+    return all(part.partition('_')[0] in PARAMETERS and '_' in part for part in segment.split(','))
+
+
+# Output format for a request: f_<fmt> wins, f_auto picks WebP for browsers that take it
+def output_format(steps, extension, accept=''):
+    fetch_format = next((s['fetch_format'] for s in reversed(steps) if 'fetch_format' in s), None)
+    if fetch_format == 'auto':
+        return 'webp' if 'image/webp' in accept else ('png' if extension == 'png' else 'jpg')
+    fmt = (fetch_format or extension or 'jpg').lower()
+    return fmt if fmt in FORMATS else 'jpg'
+
+
+def _size(value):
+    return int(float(value)) if value else None
+
+
+def _apply(img, step):
+    width, height = _size(step.get('width')), _size(step.get('height'))
+    if not width and not height:
+        return img
+    crop = step.get('crop', 'scale')
+    # Missing side keeps the aspect ratio
+    if not width:
+        width = max(1, round(img.width * height / img.height))
+    if not height:
+        height = max(1, round(img.height * width / img.width))
+
+    if crop in ('fill', 'thumb', 'lfill'):
+        if crop == 'lfill' and img.width <= width and img.height <= height:
+            return img
+        return ImageOps.fit(img, (width, height), Image.Resampling.LANCZOS)
+    if crop == 'limit':
+        img = img.copy()
+        img.thumbnail((width, height), Image.Resampling.LANCZOS)
+        return img
+    if crop == 'fit':
+        return ImageOps.contain(img, (width, height), Image.Resampling.LANCZOS)
+    if crop == 'pad':
+        return ImageOps.pad(img, (width, height), Image.Resampling.LANCZOS, color='white')
+    if crop == 'crop':
+        left, top = max(0, (img.width - width) // 2), max(0, (img.height - height) // 2)
+        return img.crop((left, top, left + min(width, img.width), top + min(height, img.height)))
+    return img.resize((width, height), Image.Resampling.LANCZOS)
+
+
+# Render `steps` of the image at source_path into `out` (a path or file) in format `fmt`
+def render(source_path, steps, fmt, out):
+    with Image.open(source_path) as img:
+        # Cloudinary applies the EXIF orientation before anything else
+        img = ImageOps.exif_transpose(img)
+        for step in steps:
+            img = _apply(img, step)
+
+        pillow_format = FORMATS[fmt][0]
+        quality = next((s['quality'] for s in reversed(steps) if 'quality' in s), 'auto')
+        options = {}
+        if pillow_format in ('JPEG', 'WEBP'):
+            options['quality'] = QUALITY_AUTO.get(quality) or _size(quality) or QUALITY_AUTO['auto']
+        if pillow_format == 'JPEG':
+            options['progressive'] = any('progressive' in s.get('flags', '') for s in steps)
+            if img.mode not in ('RGB', 'L'):
+                img = img.convert('RGB')
+        elif pillow_format == 'GIF' and img.mode not in ('P', 'L'):
+            img = img.convert('P')
+        img.save(out, pillow_format, **options)
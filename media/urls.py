@@ -0,0 +1,16 @@
+"""
+URLs for the media app
+"""
+from django.conf import settings
+from django.urls import path
+from . import views
+
+app_name = 'media'
+
+urlpatterns = [
+    # LocalBackend assets (MEDIA_BACKEND = 'media.backends.LocalBackend')
+    path(settings.MEDIA_LOCAL_URL.lstrip('/') + '<str:resource_type>/<str:type>/<path:path>',
+         views.local_media, name='local_media'),
+    # Variants through our own disk cache (IMAGE_PROXY)
+    path('img/<str:variant>/<int:width>/<path:asset>', views.image_proxy, name='image_proxy'),
+]
@@ -0,0 +1,219 @@
+"""
+Named image variants, memoized delivery URLs and srcsets.
+
+VARIANTS is the one registry of image sizes: Cloudinary transformation options for
+the base size, the widths offered in a srcset (heights scale with them) and the
+default `sizes` hint. Models list which variants each CloudinaryField uses in
+`variant_fields`; MediaConfig.ready() turns that into eager transformations on the
+field, so every variant is generated at upload instead of on the first view, and a
+system check (media.E001) keeps every CloudinaryField in the registry.
+
+A variant URL for a given asset never changes, so build_url() results are kept in a
+process-wide LRU (IMAGE_URL_CACHE_SIZE entries) keyed on the asset (public_id,
+version, format, delivery type), the variant name and the width. A new upload has
+a new public_id/version, so replaced images never hit a stale entry. Models add a
+per-instance memo on top with VariantURLMixin.
+
+With IMAGE_PROXY on, variant URLs point at media.views.image_proxy (/img/<variant>/
+<width>/<asset>), which serves them from a local disk cache (media.proxy).
+"""
+
+from functools import lru_cache
+
+from django.conf import settings
+from django.urls import reverse
+
+from .backends import MediaResource
+
+VARIANTS = {
+    # square crop for admin previews and small pickers
+    'thumbnail': {
+        'transformation': {
+            'width': 300,
+            'height': 300,
+            'crop': 'fill',
+            'quality': 'auto:good',
+            'fetch_format': 'auto',
+        },
+        'widths': (150, 300, 600),
+        'sizes': '300px',
+    },
+    # natural aspect ratio for the project photo grid
+    'natural_thumbnail': {
+        'transformation': {
+            'width': 180,
+            'crop': 'limit',
+            'quality': 100,  # Very high quality (0-100 scale)
+            'format': 'jpg',  # Force JPEG for consistent quality
+            'flags': 'progressive',  # Progressive JPEG loading
+        },
+        'widths': (180, 360, 540),
+        'sizes': '180px',
+    },
+    # project cards: fills the 180px-high cover of a grid column (280px and up)
+    'card': {
+        'transformation': {
+            'width': 480,
+            'height': 300,
+            'crop': 'fill',
+            'quality': 'auto:good',
+            'fetch_format': 'auto',
+        },
+        'widths': (320, 480, 640, 960),
+        'sizes': '(max-width: 640px) 100vw, (max-width: 992px) 50vw, 400px',
+    },
+    # project hero banner, full width and 300px high
+    'hero': {
+        'transformation': {
+            'width': 1600,
+            'height': 400,
+            'crop': 'fill',
+            'quality': 'auto:good',
+            'fetch_format': 'auto',
+        },
+        'widths': (800, 1200, 1600, 2400),
+        'sizes': '100vw',
+    },
+    # galleries and the photo edit page
+    'medium': {
+        'transformation': {
+            'width': 800,
+            'height': 600,
+            'crop': 'limit',
+            'quality': 'auto:good',
+            'fetch_format': 'auto',
+        },
+        'widths': (400, 800, 1200),
+        'sizes': '(max-width: 800px) 100vw, 800px',
+    },
+    # single photo page
+    'large': {
+        'transformation': {
+            'width': 1600,
+            'height': 1600,
+            'crop': 'limit',
+            'quality': 'auto:good',
+            'fetch_format': 'auto',
+        },
+        'widths': (800, 1200, 1600, 2400),
+        'sizes': '(max-width: 1200px) 100vw, 1000px',
+    },
+    # navigation bar avatar
+    'avatar_sm': {
+        'transformation': {
+            'width': 32,
+            'height': 32,
+            'crop': 'fill',
+            'gravity': 'face',
+            'quality': 'auto:good',
+            'fetch_format': 'auto',
+        },
+        'widths': (32, 64, 96),
+        'sizes': '32px',
+    },
+    # profile pages
+    'avatar': {
+        'transformation': {
+            'width': 120,
+            'height': 120,
+            'crop': 'fill',
+            'gravity': 'face',
+            'quality': 'auto:good',
+            'fetch_format': 'auto',
+        },
+        'widths': (120, 240, 360),
+        'sizes': '120px',
+    },
+}
+
+# f_auto picks the format per request and can't be generated ahead of time;
+# eager derivatives are made in the format it serves to current browsers
+EAGER_AUTO_FORMAT = 'webp'
+
+
+# Transformation options for a variant, scaled to `width` (height keeps the aspect ratio)
+def variant_options(variant, width=None):
+    options = dict(VARIANTS[variant]['transformation'])
+    if width is not None and width != options['width']:
+        if 'height' in options:
+            options['height'] = round(options['height'] * width / options['width'])
+        options['width'] = width
+    return options
+
+
+def _build_url(public_id, version, format, type, resource_type, variant, width=None):
+    resource = MediaResource(
+        public_id, format=format, version=version, type=type, resource_type=resource_type
+    )
+    if settings.IMAGE_PROXY and version:
+        width = width or VARIANTS[variant]['transformation']['width']
+        return reverse('media:image_proxy', args=[variant, width, resource.get_prep_value()])
+    return resource.build_url(**variant_options(variant, width))
+
+
+_cached_build_url = lru_cache(maxsize=settings.IMAGE_URL_CACHE_SIZE)(_build_url)
+
+
+# Delivery URL of `variant` for a CloudinaryResource, or None without an image
+def variant_url(resource, variant, width=None):
+    if not resource or not getattr(resource, 'public_id', None):
+        return None
+    return _cached_build_url(
+        resource.public_id, resource.version, resource.format,
+        resource.type, resource.resource_type, variant, width,
+    )
+
+
+# "url 320w, url 480w, ..." over the variant's widths, or '' without an image
+def variant_srcset(resource, variant):
+    if not resource or not getattr(resource, 'public_id', None):
+        return ''
+    return ', '.join(
+        f"{variant_url(resource, variant, width)} {width}w"
+        for width in VARIANTS[variant]['widths']
+    )
+
+
+def clear_url_cache():
+    _cached_build_url.cache_clear()
+
+
+# Eager upload transformations for every width of the given variants
+def eager_transformations(variants):
+    eager = []
+    for variant in variants:
+        for width in VARIANTS[variant]['widths']:
+            options = variant_options(variant, width)
+            if options.pop('fetch_format', None) == 'auto':
+                options['format'] = EAGER_AUTO_FORMAT
+            eager.append(options)
+    return eager
+
+
+class VariantURLMixin:
+    """
+    Per-instance memo of variant URLs, dropped as soon as the field holds a different object.
+    Models map each CloudinaryField to the variants it is shown in with `variant_fields`.
+    """
+
+    variant_fields = {}
+
+    def variant_url(self, field_name, variant, width=None):
+        return self._variant_memo(field_name, ('url', variant, width), variant_url, variant, width)
+
+    def variant_srcset(self, field_name, variant):
+        return self._variant_memo(field_name, ('srcset', variant), variant_srcset, variant)
+
+    def _variant_memo(self, field_name, key, build, variant, *args):
+        if variant not in self.variant_fields.get(field_name, ()):
+            raise ValueError(f"{type(self).__name__}.{field_name} has no '{variant}' variant")
+        resource = getattr(self, field_name)
+        memo = self.__dict__.setdefault('_variant_urls', {})
+        cached = memo.get(field_name)
+        # Holding the resource keeps the identity check sound (its id can't be reused)
+        if cached is None or cached[0] is not resource:
+            cached = memo[field_name] = (resource, {})
+        values = cached[1]
+        if key not in values:
+            values[key] = build(resource, variant, *args)
+        return values[key]
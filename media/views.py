@@ -0,0 +1,129 @@
+"""
+Media views: LocalBackend assets at the Cloudinary URL shape (rendered on first
+request), and the image proxy that serves variants from our own disk cache.
+"""
+
+import hashlib
+import logging
+import os
+import re
+
+from cloudinary.models import CLOUDINARY_FIELD_DB_RE
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from .backends import LocalBackend, MediaResource, get_backend
+from .proxy import copy_stream, get_cache
+from .transform import FORMATS, is_transformation, output_format, parse_transformation
+from .variants import VARIANTS, variant_options
+
+logger = logging.getLogger(__name__)
+
+VERSION_RE = re.compile(r'^v\d+$')
+
+
+# Split "<transformation>/v<version>/<public_id>.<ext>" (transformation and version optional)
+def split_asset_path(path):
+    segments = path.split('/')
+    transformations, version = [], None
+    while len(segments) > 1:
+        if VERSION_RE.match(segments[0]):
+            version = segments.pop(0)[1:]
+            break
+        if not is_transformation(segments[0]):
+            break
+        transformations.append(segments.pop(0))
+    public_id, dot, extension = '/'.join(segments).rpartition('.')
+    if not dot:
+        public_id, extension = extension, ''
+    return '/'.join(transformations), version, public_id, extension.lower()
+
+
+@require_safe
+def local_media(request, resource_type, type, path):
+    backend = get_backend()
+    if not isinstance(backend, LocalBackend):
+        raise Http404("Local media is not enabled")
+
+    transformation, version, public_id, extension = split_asset_path(path)
+    accept = request.headers.get('Accept', '')
+    try:
+        original = backend.original_path(public_id)
+        if not transformation and original.lower().endswith(f'.{extension}'):
+            path, content_type = original, FORMATS.get(extension, ('', 'application/octet-stream'))[1]
+        else:
+            path, content_type = backend.derive(public_id, version, transformation, extension, accept)
+    except (FileNotFoundError, KeyError):
+        raise Http404("No such asset")
+
+    response = FileResponse(open(path, 'rb'), content_type=content_type)
+    # Versioned URLs never change content; f_auto depends on what the browser accepts
+    patch_cache_control(response, public=True, max_age=31536000, immutable=True)
+    if any(step.get('fetch_format') == 'auto' for step in parse_transformation(transformation)):
+        patch_vary_headers(response, ['Accept'])
+    return response
+
+
+# Variant `width` of a stored asset (its database value, "image/upload/v<version>/<public_id>.<ext>"),
+# fetched from the backend once and then served from the proxy's disk cache
+@require_safe
+def image_proxy(request, variant, width, asset):
+    if variant not in VARIANTS or width not in VARIANTS[variant]['widths']:
+        raise Http404("No such variant")
+    match = re.match(CLOUDINARY_FIELD_DB_RE, asset)
+    if not match.group('version') or '..' in match.group('public_id').split('/'):
+        raise Http404("No such asset")
+    resource = MediaResource(
+        match.group('public_id'), format=match.group('format'), version=match.group('version'),
+        type=match.group('type') or 'upload', resource_type=match.group('resource_type') or 'image',
+    )
+
+    # f_auto is negotiated here, so the origin is asked for one concrete format per cache entry
+    options = variant_options(variant, width)
+    accept = request.headers.get('Accept', '')
+    auto_format = options.get('fetch_format') == 'auto'
+    if auto_format:
+        options.pop('fetch_format')
+        options['format'] = output_format([{'fetch_format': 'auto'}], resource.format, accept)
+    extension = output_format([], options.get('format') or resource.format)
+    options['format'] = extension
+    key = hashlib.sha256(f"{asset}|{variant}|{width}|{extension}".encode()).hexdigest()
+
+    def fetch(out):
+        copy_stream(get_backend().open(resource, **options), out)
+
+    cache = get_cache()
+    try:
+        # Retried once in case the file is evicted between the lookup and the open
+        for attempt in range(2):
+            try:
+                path = cache.get_or_fill(key, extension, fetch)
+                image_file = open(path, 'rb')
+                break
+            except FileNotFoundError:
+                if attempt:
+                    raise
+    except FileNotFoundError:
+        raise Http404("No such asset")
+    except Exception as e:
+        if getattr(getattr(e, 'response', None), 'status_code', None) == 404:
+            raise Http404("No such asset")
+        logger.warning("Image proxy fetch failed for %s: %s", asset, e)
+        return HttpResponse("Image origin unavailable", status=502, content_type='text/plain')
+
+    etag = quote_etag(key)
+    last_modified = int(os.fstat(image_file.fileno()).st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        image_file.close()
+    else:
+        # Streamed from disk in FileResponse's blocks, never read whole
+        response = FileResponse(image_file, content_type=FORMATS[extension][1])
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, max_age=31536000, immutable=True)
+    if auto_format:
+        patch_vary_headers(response, ['Accept'])
+    return response
@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from .models import Project, Photo
+from .search import search_photos, search_projects
 
 
 class PhotoInline(admin.TabularInline):
@@ -9,7 +10,7 @@ class PhotoInline(admin.TabularInline):
     extra = 0  # Don't show extra empty forms
     fields = ('image_thumbnail', 'title', 'caption', 'is_featured', 'needs_attention', 'uploaded_at')
     readonly_fields = ('image_thumbnail', 'uploaded_at')
-    ordering = ('order_index', 'uploaded_at')
+    ordering = ('order_index', 'id')
     
     def image_thumbnail(self, obj):
         """Show a small thumbnail of the photo"""
@@ -25,8 +26,9 @@ class PhotoInline(admin.TabularInline):
 class ProjectAdmin(admin.ModelAdmin):
     list_display = ('title', 'owner', 'created', 'target_end', 'is_overdue', 'photo_count')
     list_filter = ('owner', 'created', 'target_end')
+    # get_search_results searches the title/description index; these turn the search box on
     search_fields = ('title', 'description', 'owner__username')
-    readonly_fields = ('created', 'updated')
+    readonly_fields = ('created', 'updated', 'photo_count', 'featured_count', 'attention_count', 'total_bytes')
     inlines = [PhotoInline]  # Add photos inline
     
     fieldsets = (
@@ -39,11 +41,15 @@ class ProjectAdmin(admin.ModelAdmin):
         ('Media', {
             'fields': ('cover_photo',)
         }),
+        ('Photos', {
+            'fields': ('photo_count', 'featured_count', 'attention_count', 'total_bytes'),
+            'classes': ('collapse',)
+        }),
     )
     
     def photo_count(self, obj):
-        """Show number of photos in this project"""
-        count = obj.photos.count()
+        """Show number of photos in this project (the denormalized counter, no query per row)"""
+        count = obj.photo_count
         if count > 0:
             return format_html(
                 '<a href="/admin/projects/photo/?project__id__exact={}">{} photo{}</a>',
@@ -51,6 +57,13 @@ class ProjectAdmin(admin.ModelAdmin):
             )
         return "0 photos"
     photo_count.short_description = 'Photos'
+
+    # Indexed search (see projects.search) instead of icontains on every column
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        matches = search_projects(queryset, search_term) | queryset.filter(owner__username__iexact=search_term.strip())
+        return matches, False
     
     # checks if the project is overdue and displays a boolean icon in the admin list view
     def is_overdue(self, obj):
@@ -63,6 +76,7 @@ class ProjectAdmin(admin.ModelAdmin):
 class PhotoAdmin(admin.ModelAdmin):
     list_display = ('title', 'project_title', 'uploaded_at', 'is_featured', 'needs_attention', 'file_size_display')
     list_filter = ('project', 'is_featured', 'needs_attention', 'uploaded_at', 'mime_type')
+    # get_search_results searches the title/caption index; these turn the search box on
     search_fields = ('title', 'caption', 'project__title')
     list_select_related = ('project',)  # Optimize database queries
     readonly_fields = ('uploaded_at', 'updated_at', 'file_size', 'mime_type', 'width', 'height')
@@ -95,6 +109,13 @@ class PhotoAdmin(admin.ModelAdmin):
         """Display file size in human readable format"""
         return obj.file_size_human
     file_size_display.short_description = 'File Size'
+
+    # Indexed search (see projects.search): the photo's own title/caption, or its project's
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        projects = search_projects(Project.all_objects.all(), search_term).values('pk')
+        return search_photos(queryset, search_term) | queryset.filter(project__in=projects), False
     
     # Add actions for bulk operations
     actions = ['mark_featured', 'unmark_featured', 'mark_attention', 'unmark_attention']
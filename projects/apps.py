@@ -8,3 +8,6 @@ class ProjectsConfig(AppConfig):
     def ready(self):
         # Import signals to ensure they are registered
         import projects.signals
+        # HEIC support for every Image.open in the process (uploads, metadata jobs, transcodes)
+        from projects.transcode import register_image_openers
+        register_image_openers()
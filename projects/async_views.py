@@ -0,0 +1,190 @@
+"""
+Async versions of the upload, reorder, move and bulk action endpoints for ASGI deployments.
+
+Under an ASGI server a slow Cloudinary round-trip only suspends the request that is
+waiting on it instead of holding a whole worker. Storage uploads are awaited through
+aupload_photos() with at most PHOTO_UPLOAD_CONCURRENCY in flight per request; reads and
+single-statement writes use the async ORM, and anything that needs a transaction runs
+in a sync thread via sync_to_async. Form parsing, validation and responses are shared
+with the sync views in projects.views.
+"""
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.db import transaction
+from django.http import Http404, JsonResponse, HttpResponseForbidden
+from django.middleware.csrf import CsrfViewMiddleware
+from django.shortcuts import redirect
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import require_POST
+
+from media.outbox import collect_asset_deletions
+from .forms import PhotoBulkActionForm
+from .models import Project, Photo
+from .similarity import find_near_duplicate_groups
+from .upload_handlers import use_spooled_upload_handler
+from .uploads import aupload_photos
+from .views import (
+    _collect_upload_files, _upload_response,
+    _parse_photo_order, _check_photo_order, _apply_photo_order,
+    _parse_photo_move, _move_response,
+)
+
+# The check csrf_protect runs, for calling from a worker thread (see _read_upload)
+_csrf_check = CsrfViewMiddleware(lambda request: None)
+
+# Column updates for the bulk actions that are a single UPDATE
+BULK_UPDATE_ACTIONS = {
+    'flag': ({'needs_attention': True}, "Flagged {count} photo{s} for attention."),
+    'unflag': ({'needs_attention': False}, "Removed attention flag from {count} photo{s}."),
+    'feature': ({'is_featured': True}, "Marked {count} photo{s} as featured."),
+    'unfeature': ({'is_featured': False}, "Removed featured status from {count} photo{s}."),
+}
+
+
+# Project by id for an async view, or 404
+async def _aget_project(project_id):
+    try:
+        return await Project.objects.aget(id=project_id)
+    except Project.DoesNotExist:
+        raise Http404("No Project matches the given query.")
+
+
+# Delete photos and queue their assets in one transaction (sync, signals touch the ORM)
+def _delete_photos(photos):
+    with transaction.atomic(), collect_asset_deletions():
+        return photos.delete()
+
+
+# Flag every photo after the first in each near-duplicate cluster (sync, touches the ORM)
+def _flag_duplicates(photos):
+    groups = find_near_duplicate_groups(photos.order_by('order_index', 'id'))
+    duplicate_ids = [photo.id for group in groups for photo in group[1:]]
+    return Photo.objects.filter(id__in=duplicate_ids).update(needs_attention=True)
+
+
+# CSRF check and body parse for an upload, run together in a worker thread
+# The check reads request.POST, which parses the multipart body: spooling every file to
+# disk and hashing it. Under csrf_protect that would happen on the event loop
+def _read_upload(request, project):
+    rejection = _csrf_check.process_view(request, None, (), {})
+    if rejection is not None:
+        return None, None, rejection
+    return _collect_upload_files(request, project)
+
+
+# handle photo uploads for a project (POST only; the form page stays on the sync view)
+# csrf_exempt for the same reason as the sync view: the upload handler is swapped before parsing,
+# and the CSRF check itself runs in _read_upload, off the event loop
+@login_required
+@csrf_exempt
+@require_POST
+async def photo_upload(request, project_id):
+    use_spooled_upload_handler(request)
+    project = await _aget_project(project_id)
+    user = await request.auser()
+    if project.owner_id != user.id:
+        messages.error(request, "You do not have permission to upload photos for this project.")
+        return redirect('projects:detail', pk=project_id)
+
+    files_to_process, caption, error_response = await sync_to_async(_read_upload)(request, project)
+    if error_response:
+        return error_response
+
+    staged_uploads = await aupload_photos(files_to_process, project, caption=caption)
+    return await sync_to_async(_upload_response)(request, project, staged_uploads)
+
+
+@login_required
+@csrf_protect
+@require_POST
+async def photo_reorder(request, project_id):
+    """Handle AJAX requests to reorder photos within a project"""
+    project = await _aget_project(project_id)
+    user = await request.auser()
+    if project.owner_id != user.id:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'You do not have permission to reorder photos in this project.'
+        }, status=403)
+
+    photo_ids, error_response = _parse_photo_order(request)
+    if error_response:
+        return error_response
+
+    project_photo_ids = {
+        pid async for pid in Photo.objects.filter(project=project).values_list('id', flat=True)
+    }
+    error_response = _check_photo_order(photo_ids, project_photo_ids)
+    if error_response:
+        return error_response
+
+    await sync_to_async(_apply_photo_order)(project, photo_ids)
+
+    return JsonResponse({
+        'status': 'success',
+        'message': f'Successfully reordered {len(photo_ids)} photos.',
+        'reordered_count': len(photo_ids)
+    })
+
+
+@login_required
+@csrf_protect
+@require_POST
+async def photo_move(request, project_id, photo_id):
+    """Move one photo between two others (drag & drop); writes only that photo's row"""
+    project = await _aget_project(project_id)
+    user = await request.auser()
+    if project.owner_id != user.id:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'You do not have permission to reorder photos in this project.'
+        }, status=403)
+
+    neighbours, error_response = _parse_photo_move(request)
+    if error_response:
+        return error_response
+
+    return await sync_to_async(_move_response)(project, photo_id, *neighbours)
+
+
+# Bulk actions for photos in a project
+@login_required
+@csrf_protect
+@require_POST
+async def photos_bulk_action(request, project_id):
+    project = await _aget_project(project_id)
+    user = await request.auser()
+    if project.owner_id != user.id:
+        return HttpResponseForbidden("You do not have permission to modify photos in this project.")
+
+    form = PhotoBulkActionForm(request.POST)
+    if not form.is_valid():
+        for field, errors in form.errors.items():
+            for error in errors:
+                messages.error(request, f"{field}: {error}")
+        return redirect('projects:detail', pk=project_id)
+
+    action = form.cleaned_data['action']
+    photos = Photo.objects.filter(id__in=form.cleaned_data['photo_ids'], project=project)
+
+    if not await photos.aexists():
+        messages.error(request, "No valid photos selected.")
+        return redirect('projects:detail', pk=project_id)
+
+    if action in BULK_UPDATE_ACTIONS:
+        updates, message = BULK_UPDATE_ACTIONS[action]
+        count = await photos.aupdate(**updates)
+        messages.success(request, message.format(count=count, s='s' if count != 1 else ''))
+
+    elif action == 'delete':
+        count = await photos.acount()
+        await sync_to_async(_delete_photos)(photos)
+        messages.success(request, f"Permanently deleted {count} photo{'s' if count != 1 else ''}.")
+
+    elif action == 'flag_duplicates':
+        count = await sync_to_async(_flag_duplicates)(photos)
+        messages.success(request, f"Flagged {count} near-duplicate photo{'s' if count != 1 else ''} for attention.")
+
+    return redirect('projects:detail', pk=project.id)
@@ -0,0 +1,187 @@
+"""
+Denormalized photo counters on Project.
+
+photo_count, featured_count, attention_count and total_bytes cover a project's live
+(not tombstoned) photos, so project lists show them without a COUNT per card. They
+change in the same transaction as the photos:
+
+- PhotoQuerySet.bulk_create/update/delete: uploads, bulk actions, admin actions, jobs
+- the Photo save/delete signals: single edits and deletes, moves to another project
+
+Changes are applied as F() increments, so concurrent writers never overwrite each
+other, and one UPDATE per project touched. Photo.all_objects (tombstoning, the
+reaper) bypasses them: a tombstoned project is never listed again.
+`python manage.py recount_projects` rebuilds them from the photos.
+"""
+
+from contextlib import contextmanager
+import threading
+
+from django.db import models, transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from media.outbox import collect_asset_deletions
+from .facets import FACET_FIELDS, add_facets, adjust_facets, collect_facet_changes, facet_totals, photo_facets
+
+COUNTERS = ('photo_count', 'featured_count', 'attention_count', 'total_bytes')
+
+# Photo fields the counters are computed from
+COUNTED_FIELDS = ('project', 'is_featured', 'needs_attention', 'file_size', 'deleted_at')
+
+_local = threading.local()
+
+
+# (photos, featured, needing attention, bytes) one photo adds to its project
+def contribution(is_featured, needs_attention, file_size, deleted_at):
+    if deleted_at is not None:
+        return (0, 0, 0, 0)
+    return (1, int(bool(is_featured)), int(bool(needs_attention)), file_size or 0)
+
+
+def photo_contribution(photo):
+    return contribution(photo.is_featured, photo.needs_attention, photo.file_size, photo.deleted_at)
+
+
+# The same, from the values the photo was loaded with (see media.tracking)
+def loaded_contribution(photo):
+    return contribution(*(photo.loaded_value(name) for name in COUNTED_FIELDS[1:]))
+
+
+# Aggregates matching contribution(), for values('project').annotate(...)
+def counter_aggregates():
+    live = Q(deleted_at__isnull=True)
+    return {
+        'photo_count': Count('pk', filter=live),
+        'featured_count': Count('pk', filter=live & Q(is_featured=True)),
+        'attention_count': Count('pk', filter=live & Q(needs_attention=True)),
+        'total_bytes': Coalesce(Sum('file_size', filter=live), 0),
+    }
+
+
+# {project_id: (photos, featured, attention, bytes)} for a queryset of photos
+def project_totals(photos):
+    rows = photos.order_by().values('project').annotate(**counter_aggregates())
+    return {row['project']: tuple(row[name] for name in COUNTERS) for row in rows}
+
+
+# Add one project's change to a {project_id: deltas} dict
+def add_delta(deltas, project_id, values, sign=1):
+    current = deltas.get(project_id, (0, 0, 0, 0))
+    deltas[project_id] = tuple(a + sign * b for a, b in zip(current, values))
+
+
+# Apply {project_id: deltas} now, or when the enclosing collect_counter_changes() exits
+def adjust_counters(deltas):
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        for project_id, values in deltas.items():
+            add_delta(pending, project_id, values)
+        return
+    _write(deltas)
+
+
+# Sum counter changes made by signals (e.g. a bulk or cascading delete), one UPDATE per project
+@contextmanager
+def collect_counter_changes():
+    if getattr(_local, 'pending', None) is not None:
+        # Nested block; the outermost one writes
+        yield
+        return
+
+    _local.pending = {}
+    try:
+        yield
+        pending = _local.pending
+    finally:
+        _local.pending = None
+    _write(pending)
+
+
+def _write(deltas):
+    from .models import Project
+
+    # Project id order, so writers touching the same projects lock them in the same order
+    for project_id in sorted(deltas):
+        changes = {
+            name: F(name) + value for name, value in zip(COUNTERS, deltas[project_id]) if value
+        }
+        if changes:
+            Project.all_objects.filter(pk=project_id).update(**changes)
+
+
+# Rebuild the counters of some projects from their photos, one UPDATE
+# (`photos` is the Photo manager to read, e.g. a historical model's in a migration)
+def recount_projects(projects, photos=None):
+    if photos is None:
+        from .models import Photo
+        photos = Photo.all_objects
+
+    photos = photos.filter(project=OuterRef('pk')).order_by().values('project')
+    return projects.update(**{
+        name: Coalesce(Subquery(photos.annotate(total=aggregate).values('total')), Value(0))
+        for name, aggregate in counter_aggregates().items()
+    })
+
+
+# True if an update() sets any of these fields
+def _touches(kwargs, fields):
+    return any(name in kwargs or f'{name}_id' in kwargs for name in fields)
+
+
+class PhotoQuerySet(models.QuerySet):
+    """Photo queries that write keep the project counters (and facet counts, projects.facets) in step"""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            deltas = {}
+            facets = {}
+            for photo in objs:
+                add_delta(deltas, photo.project_id, photo_contribution(photo))
+                add_facets(facets, photo.project_id, photo_facets(photo))
+            adjust_counters(deltas)
+            adjust_facets(facets)
+        return objs
+
+    def update(self, **kwargs):
+        counted = _touches(kwargs, COUNTED_FIELDS)
+        faceted = _touches(kwargs, FACET_FIELDS)
+        if not counted and not faceted:
+            return super().update(**kwargs)
+
+        # Lock the rows first so the totals before and after describe exactly this update
+        # (values can be expressions, e.g. bulk_update's CASE, so they're read back rather than predicted)
+        with transaction.atomic(using=self.db):
+            pks = list(self.select_for_update().values_list('pk', flat=True))
+            rows = self.model._base_manager.using(self.db).filter(pk__in=pks)
+            before = project_totals(rows) if counted else {}
+            facets_before = facet_totals(rows) if faceted else {}
+            count = rows.update(**kwargs)
+            if counted:
+                deltas = {}
+                for project_id, values in project_totals(rows).items():
+                    add_delta(deltas, project_id, values)
+                for project_id, values in before.items():
+                    add_delta(deltas, project_id, values, sign=-1)
+                adjust_counters(deltas)
+            if faceted:
+                facets = facet_totals(rows)
+                for key, photos in facets_before.items():
+                    facets[key] = facets.get(key, 0) - photos
+                adjust_facets(facets)
+        return count
+
+    update.alters_data = True
+
+    # Photos' post_delete signals report each removal; they're written together here,
+    # and the assets they leave unused are queued with one shared-asset check (media.outbox)
+    def delete(self):
+        with (
+            transaction.atomic(using=self.db), collect_counter_changes(), collect_facet_changes(),
+            collect_asset_deletions(),
+        ):
+            return super().delete()
+
+    delete.alters_data = True
+    delete.queryset_only = True
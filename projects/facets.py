@@ -0,0 +1,299 @@
+"""
+EXIF facets for browsing a library: camera body, lens, ISO band and capture year.
+
+Each user has a FacetCount row per facet value saying how many of their live photos
+have it, so the facet sidebar reads a few dozen rows however big the library is.
+The counts change in the same transaction as the photos, through the same hooks as
+the project counters (projects.counters):
+
+- PhotoQuerySet.bulk_create/update/delete: uploads, the metadata job, bulk actions
+- the Photo save/delete signals: single edits and deletes, moves to another project
+- tombstone_project/tombstone_user, which hide photos through Photo.all_objects
+
+Changes are summed per (user, facet, value) and applied with one
+INSERT ... ON CONFLICT DO UPDATE SET count = count + delta, so concurrent writers
+add up instead of overwriting each other.
+`python manage.py recount_facets` rebuilds them from the photos.
+
+Filtering goes to the typed Photo columns, not exif_data. Values of one facet are
+OR'ed and different facets are AND'ed, and each one is a range or equality on an
+indexed column (camera_make/camera_model, lens_model, iso, taken_at).
+"""
+
+from bisect import bisect_right
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timezone as dt_timezone
+import threading
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Q
+from django.db.models.functions import ExtractYear
+
+FACETS = ('camera', 'lens', 'iso', 'year')
+
+# Photo fields the facet values are computed from
+FACET_FIELDS = ('project', 'camera_make', 'camera_model', 'lens_model', 'iso', 'taken_at', 'deleted_at')
+
+# camera values are "make|model", so a filter can use the (camera_make, camera_model) index
+CAMERA_SEPARATOR = '|'
+
+FacetValue = namedtuple('FacetValue', 'facet value label count')
+
+_local = threading.local()
+
+
+# (facet, value) pairs a live photo with these fields is counted under
+def facet_values(camera_make, camera_model, lens_model, iso, year):
+    values = []
+    if camera_make or camera_model:
+        values.append(('camera', f'{camera_make}{CAMERA_SEPARATOR}{camera_model}'))
+    if lens_model:
+        values.append(('lens', lens_model))
+    if iso is not None:
+        values.append(('iso', str(iso_band(iso))))
+    if year is not None:
+        values.append(('year', str(year)))
+    return values
+
+
+def photo_facets(photo):
+    return _field_facets(*(getattr(photo, name) for name in FACET_FIELDS[1:]))
+
+
+# The same, from the values the photo was loaded with (see media.tracking)
+def loaded_facets(photo):
+    return _field_facets(*(photo.loaded_value(name) for name in FACET_FIELDS[1:]))
+
+
+# The same, for what a save wrote: fields left out of update_fields kept their loaded values
+def saved_facets(photo, update_fields=None):
+    return _field_facets(*(
+        getattr(photo, name) if update_fields is None or name in update_fields else photo.loaded_value(name)
+        for name in FACET_FIELDS[1:]
+    ))
+
+
+# EXIF capture times are stored as UTC wall-clock times, so the year is taken in UTC too
+def _field_facets(camera_make, camera_model, lens_model, iso, taken_at, deleted_at):
+    if deleted_at is not None:
+        return []
+    year = taken_at.astimezone(dt_timezone.utc).year if taken_at is not None else None
+    return facet_values(camera_make, camera_model, lens_model, iso, year)
+
+
+# Lower bound of the FACET_ISO_BANDS band an ISO falls in (0 below the first one)
+def iso_band(iso):
+    bands = settings.FACET_ISO_BANDS
+    position = bisect_right(bands, iso)
+    return bands[position - 1] if position else 0
+
+
+# [low, high) of a band; high is None for the last one
+def iso_range(band):
+    higher = [bound for bound in settings.FACET_ISO_BANDS if bound > band]
+    return band, (higher[0] if higher else None)
+
+
+def facet_label(facet, value):
+    if facet == 'camera':
+        make, model = value.split(CAMERA_SEPARATOR, 1)
+        # Most models already start with the brand ("Canon EOS R5", "NIKON Z 6" by NIKON CORPORATION)
+        brand = make.split()[0].lower() if make.strip() else ''
+        return model if model.lower().startswith(brand) else f'{make} {model}'.strip()
+    if facet == 'iso':
+        low, high = iso_range(int(value))
+        if low == 0:
+            return f'ISO <{high}'
+        return f'ISO {low}+' if high is None else f'ISO {low}–{high - 1}'
+    return value
+
+
+# Add one project's facet values to a {(project_id, facet, value): change} dict
+def add_facets(deltas, project_id, values, sign=1):
+    for facet, value in values:
+        key = (project_id, facet, value)
+        deltas[key] = deltas.get(key, 0) + sign
+    return deltas
+
+
+# {(project_id, facet, value): photos} for the live photos of a queryset
+def facet_totals(photos):
+    rows = (
+        photos.order_by().filter(deleted_at__isnull=True)
+        .values('project', 'camera_make', 'camera_model', 'lens_model', 'iso',
+                year=ExtractYear('taken_at', tzinfo=dt_timezone.utc))
+        .annotate(photos=Count('pk'))
+    )
+    totals = {}
+    for row in rows:
+        values = facet_values(row['camera_make'], row['camera_model'], row['lens_model'], row['iso'], row['year'])
+        for facet, value in values:
+            key = (row['project'], facet, value)
+            totals[key] = totals.get(key, 0) + row['photos']
+    return totals
+
+
+# Apply {(project_id, facet, value): change} now, or when the enclosing collect_facet_changes() exits
+def adjust_facets(deltas):
+    pending = getattr(_local, 'pending', None)
+    if pending is not None:
+        for key, change in deltas.items():
+            pending[key] = pending.get(key, 0) + change
+        return
+    _write(deltas)
+
+
+# Sum facet changes made by signals (e.g. a bulk delete) into one statement
+@contextmanager
+def collect_facet_changes():
+    if getattr(_local, 'pending', None) is not None:
+        yield
+        return
+
+    _local.pending = {}
+    try:
+        yield
+        pending = _local.pending
+    finally:
+        _local.pending = None
+    _write(pending)
+
+
+# Move a project's photos from one owner's facets to another's
+def move_project_facets(project_id, old_owner_id, new_owner_id):
+    from .models import Photo
+
+    changes = {}
+    for (_, facet, value), photos in facet_totals(Photo.objects.filter(project_id=project_id)).items():
+        for user_id, sign in ((old_owner_id, -1), (new_owner_id, 1)):
+            key = (user_id, facet, value)
+            changes[key] = changes.get(key, 0) + sign * photos
+    _upsert(changes)
+
+
+# {(project_id, ...): change} -> {(owner_id, ...): change}, one query for the owners
+def _write(deltas):
+    from .models import Project
+
+    deltas = {key: change for key, change in deltas.items() if change}
+    if not deltas:
+        return
+    owners = dict(
+        Project.all_objects.filter(pk__in={project_id for project_id, _, _ in deltas}).values_list('pk', 'owner_id')
+    )
+    changes = {}
+    for (project_id, facet, value), change in deltas.items():
+        if project_id in owners:
+            key = (owners[project_id], facet, value)
+            changes[key] = changes.get(key, 0) + change
+    _upsert(changes)
+
+
+# count = count + change for each (user_id, facet, value), creating missing rows
+# Keys go in sorted order, so writers touching the same rows lock them in the same order
+def _upsert(changes):
+    from .models import FacetCount
+
+    rows = [(*key, change) for key, change in sorted(changes.items()) if change]
+    if not rows:
+        return
+    table = connection.ops.quote_name(FacetCount._meta.db_table)
+    max_params = connection.features.max_query_params
+    batch_size = max_params // 4 if max_params else len(rows)
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, facet, value, count) '
+                f'VALUES {", ".join(["(%s, %s, %s, %s)"] * len(batch))} '
+                f'ON CONFLICT (user_id, facet, value) DO UPDATE SET count = {table}.count + EXCLUDED.count',
+                [param for row in batch for param in row],
+            )
+
+
+# Rebuild the facet counts of some users from their photos
+# (`photos`/`facet_counts` are the managers to use, e.g. a historical model's in a migration)
+def recount_facets(user_ids, photos=None, facet_counts=None):
+    if photos is None:
+        from .models import Photo
+        photos = Photo.all_objects
+    if facet_counts is None:
+        from .models import FacetCount
+        facet_counts = FacetCount.objects
+
+    owners = dict(photos.filter(project__owner__in=user_ids).values_list('project', 'project__owner').distinct())
+    totals = {}
+    for (project_id, facet, value), count in facet_totals(photos.filter(project__owner__in=user_ids)).items():
+        key = (owners[project_id], facet, value)
+        totals[key] = totals.get(key, 0) + count
+
+    facet_counts.filter(user__in=user_ids).delete()
+    facet_counts.bulk_create([
+        facet_counts.model(user_id=user_id, facet=facet, value=value, count=count)
+        for (user_id, facet, value), count in sorted(totals.items())
+    ])
+    return len(totals)
+
+
+# {facet: [FacetValue, ...]} of a user's library, for the sidebar (one query)
+# Cameras and lenses by how often they were used, ISO bands ascending, years newest first
+def facet_counts(user):
+    from .models import FacetCount
+
+    grouped = {facet: [] for facet in FACETS}
+    for facet, value, count in FacetCount.objects.filter(user=user, count__gt=0).values_list('facet', 'value', 'count'):
+        grouped[facet].append(FacetValue(facet, value, facet_label(facet, value), count))
+
+    grouped['camera'].sort(key=lambda item: (-item.count, item.label))
+    grouped['lens'].sort(key=lambda item: (-item.count, item.label))
+    grouped['iso'].sort(key=lambda item: int(item.value))
+    grouped['year'].sort(key=lambda item: -int(item.value))
+    return grouped
+
+
+# {facet: [values]} chosen in query parameters (?camera=...&iso=400&iso=800); malformed values are dropped
+def selected_facets(params):
+    selected = {}
+    for facet in FACETS:
+        values = [value for value in dict.fromkeys(params.getlist(facet)) if _valid(facet, value)]
+        if values:
+            selected[facet] = values
+    return selected
+
+
+# Photos having any of the chosen values of every chosen facet
+def filter_by_facets(photos, selected):
+    for facet, values in selected.items():
+        condition = Q()
+        for value in values:
+            condition |= _facet_condition(facet, value)
+        photos = photos.filter(condition)
+    return photos
+
+
+def _facet_condition(facet, value):
+    if facet == 'camera':
+        make, model = value.split(CAMERA_SEPARATOR, 1)
+        return Q(camera_make=make, camera_model=model)
+    if facet == 'lens':
+        return Q(lens_model=value)
+    if facet == 'iso':
+        low, high = iso_range(int(value))
+        return Q(iso__gte=low, iso__lt=high) if high is not None else Q(iso__gte=low)
+    year = int(value)
+    return Q(taken_at__gte=datetime(year, 1, 1, tzinfo=dt_timezone.utc),
+             taken_at__lt=datetime(year + 1, 1, 1, tzinfo=dt_timezone.utc))
+
+
+def _valid(facet, value):
+    if facet == 'camera':
+        return CAMERA_SEPARATOR in value
+    if facet == 'lens':
+        return bool(value)
+    if not value.isdigit():
+        return False
+    if facet == 'iso':
+        return int(value) == 0 or int(value) in settings.FACET_ISO_BANDS
+    return 1 <= int(value) <= 9998
@@ -8,7 +8,7 @@ from cloudinary.models import CloudinaryResource
 class ProjectForm(forms.ModelForm):
     class Meta:
         model = Project
-        fields = ['title', 'description', 'target_end', 'cover_photo']
+        fields = ['title', 'description', 'target_end', 'cover_photo', 'upload_mode']
         widgets = {
             'title': forms.TextInput(attrs={
                 'class': 'form-control',
@@ -26,6 +26,9 @@ class ProjectForm(forms.ModelForm):
             'cover_photo': forms.FileInput(attrs={
                 'class': 'form-control',
                 'accept': 'image/*' 
+            }),
+            'upload_mode': forms.Select(attrs={
+                'class': 'form-control'
             })
         }
     
@@ -150,6 +153,7 @@ class PhotoBulkActionForm(forms.Form):
         ('unfeature', 'Remove featured status'),
         ('flag', 'Mark needs attention'),
         ('unflag', 'Remove attention flag'),
+        ('flag_duplicates', 'Flag near-duplicates'),
     ]
     
     action = forms.ChoiceField(
@@ -191,7 +195,7 @@ class PhotoBulkActionForm(forms.Form):
         except ValueError:
             raise forms.ValidationError("Invalid photo ID format.")
 
-# Form for photo search and filtering (for future use - did not get to fully flesh this out yet)
+# Form for photo search and filtering (the search page, see projects.search)
 class PhotoFilterForm(forms.Form):
     search = forms.CharField(
         max_length=100,
@@ -0,0 +1,58 @@
+"""
+Windows of a project's photo grid.
+
+The detail page renders the first GALLERY_PAGE_SIZE photos and the browser fetches
+the rest from projects:gallery_photos as the grid scrolls. Both read one keyset page
+on (order_index, id), served by the (project, order_index) index, with only the
+columns a card shows, and each photo goes over the wire as a small dict with its
+variant URLs already built (memoized, see media.variants).
+"""
+
+from django.conf import settings
+
+from media.variants import VARIANTS
+from .models import Photo
+from .pagination import KeysetPaginator
+
+# Variant the grid shows
+GALLERY_VARIANT = 'natural_thumbnail'
+
+GALLERY_ORDERING = ('order_index', 'id')
+
+# Columns a card needs (image for its URLs, the rest for the card itself)
+GALLERY_FIELDS = (
+    'id', 'project', 'order_index', 'title', 'caption', 'image', 'width', 'height',
+    'is_featured', 'needs_attention', 'placeholder', 'dominant_color',
+)
+
+
+# One window of the project's photos in display order
+def gallery_page(project, after=None, limit=None):
+    limit = min(limit or settings.GALLERY_PAGE_SIZE, settings.GALLERY_MAX_PAGE_SIZE)
+    photos = Photo.objects.filter(project=project).only(*GALLERY_FIELDS)
+    return KeysetPaginator(photos, GALLERY_ORDERING, limit).page(after=after)
+
+
+# What a grid card shows; `sizes` is the same for every card and sent once per window
+def serialize_photo(photo):
+    return {
+        'id': photo.id,
+        'title': photo.title,
+        'caption': photo.caption,
+        'src': photo.variant_url('image', GALLERY_VARIANT),
+        'srcset': photo.variant_srcset('image', GALLERY_VARIANT),
+        'width': photo.width,
+        'height': photo.height,
+        'placeholder': photo.placeholder_uri,
+        'color': photo.dominant_color,
+        'featured': photo.is_featured,
+        'attention': photo.needs_attention,
+    }
+
+
+def serialize_page(page):
+    return {
+        'photos': [serialize_photo(photo) for photo in page.object_list],
+        'sizes': VARIANTS[GALLERY_VARIANT]['sizes'],
+        'next_cursor': page.next_cursor,
+    }
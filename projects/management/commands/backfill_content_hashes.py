@@ -0,0 +1,69 @@
+"""
+Fill Photo.content_hash for photos uploaded before deduplication existed.
+
+Reads each stored original back from the media backend and hashes it. Note that Cloudinary
+stores the asset after its incoming transformation, so a backfilled hash only
+matches re-uploads of that stored file, not necessarily of the camera original.
+Usage: python manage.py backfill_content_hashes --batch-size 100 --workers 4
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+
+from django.core.management.base import BaseCommand
+
+from media.backends import get_backend
+from projects.models import Photo
+
+
+class Command(BaseCommand):
+    help = "Compute content hashes for existing photos that don't have one"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Photos saved per query')
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent downloads')
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many photos')
+
+    def handle(self, *args, **options):
+        pending = Photo.objects.filter(content_hash='').only('id', 'image').order_by('id')
+        limit = options['limit']
+
+        done = failed = 0
+        last_id = 0
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            # Walk the table in id order, one batch in memory at a time
+            while limit is None or done + failed < limit:
+                size = options['batch_size'] if limit is None else min(options['batch_size'], limit - done - failed)
+                photos = list(pending.filter(id__gt=last_id)[:size])
+                if not photos:
+                    break
+                last_id = photos[-1].id
+
+                batch = []
+                for photo, content_hash in zip(photos, pool.map(self._hash_photo, photos)):
+                    if not content_hash:
+                        failed += 1
+                        continue
+                    photo.content_hash = content_hash
+                    batch.append(photo)
+                done += self._save(batch)
+
+        self.stdout.write(f"Hashed {done} photos, {failed} failed.")
+
+    def _save(self, batch):
+        # bulk_update skips the pre_save signals, which have nothing to do here
+        Photo.objects.bulk_update(batch, ['content_hash'])
+        return len(batch)
+
+    def _hash_photo(self, photo):
+        if not photo.image:
+            return None
+        try:
+            hasher = hashlib.sha256()
+            with get_backend().open(photo.image) as image_file:
+                for chunk in iter(lambda: image_file.read(256 * 1024), b''):
+                    hasher.update(chunk)
+            return hasher.hexdigest()
+        except Exception as e:
+            self.stderr.write(f"Photo {photo.id}: {e}")
+            return None
@@ -0,0 +1,73 @@
+"""
+Fill the placeholder and dominant colour of photos and project covers stored before
+placeholders were computed at ingest.
+
+Each image is fetched as a 64px derivative rather than the original (the placeholder
+is only 16px across), downloads run on --workers threads and results are saved in
+batches. Usage: python manage.py backfill_placeholders --batch-size 200 --workers 8
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from media.backends import get_backend
+from projects.models import Project, Photo
+from projects.utils import compute_placeholder
+
+# Small enough to download quickly, large enough for a good dominant colour
+SOURCE_TRANSFORMATION = {'width': 64, 'height': 64, 'crop': 'limit', 'format': 'png'}
+
+
+class Command(BaseCommand):
+    help = "Compute placeholders for existing photos and project covers that don't have one"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Images saved per query')
+        parser.add_argument('--workers', type=int, default=8, help='Concurrent downloads')
+        parser.add_argument('--limit', type=int, default=None, help='Stop after this many images (per model)')
+
+    def handle(self, *args, **options):
+        targets = (
+            (Photo, 'image', Photo.objects.filter(placeholder='').exclude(image='')),
+            (Project, 'cover_photo', Project.objects.filter(placeholder='').exclude(cover_photo='')
+             .exclude(cover_photo__isnull=True)),
+        )
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for model, field_name, pending in targets:
+                done, failed = self._backfill(pool, model, field_name, pending, options)
+                self.stdout.write(f"{model._meta.verbose_name_plural}: {done} filled, {failed} failed.")
+
+    def _backfill(self, pool, model, field_name, pending, options):
+        pending = pending.only('id', field_name).order_by('id')
+        limit = options['limit']
+        done = failed = 0
+        last_id = 0
+        # Walk the table in id order, one batch in memory at a time
+        while limit is None or done + failed < limit:
+            size = options['batch_size'] if limit is None else min(options['batch_size'], limit - done - failed)
+            objs = list(pending.filter(id__gt=last_id)[:size])
+            if not objs:
+                break
+            last_id = objs[-1].id
+
+            batch = []
+            resources = [getattr(obj, field_name) for obj in objs]
+            for obj, (placeholder, dominant_color) in zip(objs, pool.map(self._placeholder, resources)):
+                if not dominant_color:
+                    failed += 1
+                    continue
+                obj.placeholder, obj.dominant_color = placeholder, dominant_color
+                batch.append(obj)
+            # bulk_update skips the pre_save signals, which have nothing to do here
+            model.all_objects.bulk_update(batch, ['placeholder', 'dominant_color'])
+            done += len(batch)
+        return done, failed
+
+    def _placeholder(self, resource):
+        try:
+            with get_backend().open(resource, **SOURCE_TRANSFORMATION) as image_file:
+                return compute_placeholder(image_file)
+        except Exception as e:
+            self.stderr.write(f"{resource.public_id}: {e}")
+            return '', ''
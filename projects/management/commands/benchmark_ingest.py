@@ -0,0 +1,97 @@
+"""
+Compare the single-pass ingest against the old three-pass path.
+
+Generates a corpus of JPEG/PNG/TIFF images in memory (with EXIF) and times the
+separate helpers (validate_image_file, extract_exif_data, get_image_dimensions, then the
+content hash, perceptual hash and placeholder) against ingest_photo(), which does all of it.
+Usage: python manage.py benchmark_ingest --count 20 --size 4000x3000
+"""
+
+import io
+import time
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+from PIL.TiffImagePlugin import IFDRational
+
+from projects.utils import (
+    validate_image_file, extract_exif_data, get_image_dimensions, ingest_photo,
+    compute_content_hash, compute_perceptual_hash, compute_placeholder,
+)
+
+FORMATS = {
+    'jpeg': ('JPEG', 'image/jpeg'),
+    'png': ('PNG', 'image/png'),
+    'tiff': ('TIFF', 'image/tiff'),
+}
+
+
+class Command(BaseCommand):
+    help = "Benchmark single-pass photo ingest against the legacy three-pass path"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=20, help='Images per format')
+        parser.add_argument('--size', default='4000x3000', help='Image size as WIDTHxHEIGHT')
+        parser.add_argument('--formats', default='jpeg,png,tiff', help='Comma-separated formats')
+        parser.add_argument('--repeat', type=int, default=3, help='Timing rounds (best is reported)')
+
+    def handle(self, *args, **options):
+        try:
+            width, height = (int(n) for n in options['size'].lower().split('x'))
+        except ValueError:
+            raise CommandError("--size must look like 4000x3000")
+
+        for key in options['formats'].split(','):
+            if key not in FORMATS:
+                raise CommandError(f"Unknown format: {key}")
+            corpus = self._build_corpus(key, options['count'], width, height)
+            total_mb = sum(f.size for f in corpus) / (1024 * 1024)
+
+            legacy = self._best_of(options['repeat'], corpus, self._legacy)
+            single = self._best_of(options['repeat'], corpus, ingest_photo)
+
+            self.stdout.write(
+                f"{key:5} {len(corpus)} files, {total_mb:.1f}MB: "
+                f"three-pass {legacy * 1000:.1f}ms, single-pass {single * 1000:.1f}ms "
+                f"({legacy / single if single else 0:.1f}x)"
+            )
+
+    def _legacy(self, uploaded_file):
+        validate_image_file(uploaded_file)
+        extract_exif_data(uploaded_file)
+        get_image_dimensions(uploaded_file)
+        compute_content_hash(uploaded_file)
+        compute_perceptual_hash(uploaded_file)
+        compute_placeholder(uploaded_file)
+
+    def _best_of(self, rounds, corpus, func):
+        best = None
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for uploaded_file in corpus:
+                # The content hash is cached on the file; every round hashes again
+                uploaded_file.sha256 = None
+                uploaded_file.seek(0)
+                func(uploaded_file)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def _build_corpus(self, key, count, width, height):
+        pil_format, content_type = FORMATS[key]
+        corpus = []
+        for i in range(count):
+            # Noise compresses badly, which keeps file sizes close to real photos
+            img = Image.effect_noise((width, height), 64).convert('RGB')
+            exif = Image.Exif()
+            exif[0x010f] = 'Benchmark'
+            exif[0x0110] = f'Camera {i}'
+            exif_ifd = exif.get_ifd(0x8769)
+            exif_ifd[0x829a] = IFDRational(1, 250)
+            exif_ifd[0x829d] = IFDRational(28, 10)
+            exif_ifd[0x8827] = 400
+            buffer = io.BytesIO()
+            img.save(buffer, pil_format, exif=exif)
+            corpus.append(SimpleUploadedFile(f'bench_{i}.{key}', buffer.getvalue(), content_type))
+        return corpus
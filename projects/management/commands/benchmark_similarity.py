@@ -0,0 +1,123 @@
+"""
+Benchmark the similar-photos request: the indexed hash pieces against rebuilding a
+HashIndex from the whole scope on every request.
+
+Each lookup is a GET through projects.views.photo_similar (permission check, the
+hash_chunk probes, loading the matches, the JSON response). The rebuild side runs the
+same request with the old lookup: every hash in the scope read from the database and
+indexed in memory before the search.
+
+Rows go to the configured database under a throwaway user with --projects projects and
+--count photos between them, deleted afterwards with everything it owns.
+Usage: python manage.py benchmark_similarity --count 100000 --queries 200 --distance 6
+"""
+
+import random
+import time
+import uuid
+
+from cloudinary import CloudinaryResource
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+from django.urls import reverse
+
+from media.models import AssetDeletion
+from projects import similarity, views
+from projects.models import Photo, Project
+
+STAND_IN_PREFIX = 'benchmark_similarity/'
+
+
+# similar_photos() as it was: the scope's hashes loaded and indexed on every request
+def rebuilt_similar_photos(photo, scope='project', max_distance=None):
+    candidates = Photo.objects.exclude(perceptual_hash=None)
+    if scope == 'library':
+        candidates = candidates.filter(project__owner_id=photo.project.owner_id)
+    else:
+        candidates = candidates.filter(project_id=photo.project_id)
+
+    index = similarity.HashIndex(candidates.values_list('perceptual_hash', 'id'))
+    matches = [(d, pk) for d, pk in index.search(photo.perceptual_hash, max_distance) if pk != photo.pk]
+    photos = Photo.objects.select_related('project').in_bulk([pk for _, pk in matches])
+    return [(d, photos[pk]) for d, pk in matches if pk in photos]
+
+
+class Command(BaseCommand):
+    help = "Benchmark the similar-photos request with indexed hash pieces against a per-request index rebuild"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=100000, help='Photos in the library')
+        parser.add_argument('--projects', type=int, default=20, help='Projects the photos are spread over')
+        parser.add_argument('--queries', type=int, default=200, help='Requests to time')
+        parser.add_argument('--distance', type=int, default=6, help='Max Hamming distance')
+        parser.add_argument('--scope', choices=('project', 'library'), default='library')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        user = get_user_model().objects.create_user(f'benchmark-{uuid.uuid4().hex[:12]}')
+        try:
+            photo_ids = self._build_library(user, rng, options['count'], options['projects'])
+            factory = RequestFactory()
+            queries = [rng.choice(photo_ids) for _ in range(options['queries'])]
+            params = {'scope': options['scope'], 'distance': options['distance']}
+
+            indexed_time, indexed_hits = self._time(factory, user, queries, params)
+            original = views.similar_photos
+            views.similar_photos = rebuilt_similar_photos
+            try:
+                rebuilt_time, rebuilt_hits = self._time(factory, user, queries, params)
+            finally:
+                views.similar_photos = original
+
+            self.stdout.write(
+                f"{options['count']} photos in {options['projects']} projects, scope={options['scope']}, "
+                f"distance <= {options['distance']}"
+            )
+            self.stdout.write(f"Indexed pieces: {indexed_time / len(queries) * 1000:.2f}ms/request ({indexed_hits} matches)")
+            self.stdout.write(f"Rebuilt index:  {rebuilt_time / len(queries) * 1000:.2f}ms/request ({rebuilt_hits} matches)")
+        finally:
+            self._clean_up(user)
+
+    # Half random photos, half "bursts" of near-copies, like a real library
+    def _build_library(self, user, rng, count, project_count):
+        hashes = []
+        while len(hashes) < count:
+            base = rng.getrandbits(64)
+            hashes.append(base)
+            for _ in range(rng.randint(0, 4)):
+                hashes.append(base ^ (1 << rng.randrange(64)) ^ (1 << rng.randrange(64)))
+        hashes = [h - (1 << 64) if h >= (1 << 63) else h for h in hashes[:count]]
+
+        projects = Project.objects.bulk_create([
+            Project(owner=user, title=f'Similarity benchmark {i}') for i in range(project_count)
+        ])
+        photos = [
+            Photo(
+                project=projects[i * project_count // count],
+                image=CloudinaryResource(f'{STAND_IN_PREFIX}{i}', format='jpg', type='upload', resource_type='image'),
+                perceptual_hash=hash_value,
+                order_index=i,
+            )
+            for i, hash_value in enumerate(hashes)
+        ]
+        Photo.objects.bulk_create(photos, batch_size=5000)
+        return [photo.pk for photo in photos]
+
+    def _time(self, factory, user, queries, params):
+        hits = 0
+        start = time.perf_counter()
+        for photo_id in queries:
+            request = factory.get(reverse('projects:photo_similar', args=[photo_id]), params)
+            request.user = user
+            response = views.photo_similar(request, photo_id)
+            hits += response.content.count(b'"distance"')
+        return time.perf_counter() - start, hits
+
+    def _clean_up(self, user):
+        with transaction.atomic():
+            # Cascades to the projects and their photos
+            user.delete()
+            AssetDeletion.objects.filter(public_id__startswith=STAND_IN_PREFIX).delete()
@@ -0,0 +1,197 @@
+"""
+Compare how many concurrent upload requests the sync and async views sustain.
+
+Each request is a real multipart POST, with a CSRF token, run through the upload views
+(projects.views.photo_upload and projects.async_views.photo_upload): body parsing and
+spooling, the CSRF check, staging, the Photo rows and metadata jobs, the response.
+Cloudinary is replaced by a local stand-in that sleeps for --latency seconds (blocking,
+like the real SDK) and writes the file to a temp directory. The sync view gets a fixed
+pool of --sync-workers request workers, as gunicorn sync workers would; the async view
+runs every request on one event loop, each in its own thread-sensitive context as
+under an ASGI server.
+
+Rows go to the configured database under a throwaway user, deleted afterwards with
+everything it owns (and the outbox entries for the stand-in's assets).
+Usage: python manage.py benchmark_uploads --latency 0.5 --concurrency 8,32,128
+"""
+
+import asyncio
+import io
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import ThreadSensitiveContext
+from cloudinary import CloudinaryResource
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, transaction
+from django.test import AsyncRequestFactory, RequestFactory
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+from PIL import Image
+
+from media.models import AssetDeletion
+from projects import async_views, uploads, views
+from projects.models import Photo, Project
+
+STAND_IN_PREFIX = 'benchmark_uploads/'
+
+
+# Stands in for upload_to_storage(): fixed latency, then a write to local disk
+class LocalStorageStandIn:
+    def __init__(self, directory, latency):
+        self.directory = directory
+        self.latency = latency
+        self.count = 0
+
+    def __call__(self, uploaded_file, field):
+        time.sleep(self.latency)
+        self.count += 1
+        name = os.path.splitext(os.path.basename(uploaded_file.name))[0]
+        public_id = f'{STAND_IN_PREFIX}{self.count}_{name}'
+        path = os.path.join(self.directory, public_id.replace('/', '_'))
+        with open(path, 'wb') as out:
+            uploaded_file.seek(0)
+            for chunk in uploaded_file.chunks():
+                out.write(chunk)
+        return CloudinaryResource(public_id, format='jpg', type='upload', resource_type='image')
+
+
+class Command(BaseCommand):
+    help = "Benchmark concurrent uploads through the sync and async views against a local storage stand-in"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', default='8,32,128', help='Comma-separated concurrent request counts')
+        parser.add_argument('--files', type=int, default=4, help='Files per request')
+        parser.add_argument('--latency', type=float, default=0.5, help='Simulated storage round-trip in seconds')
+        parser.add_argument('--sync-workers', type=int, default=8, help='Request workers for the sync view')
+        parser.add_argument('--size', default='1200x800', help='Image size as WIDTHxHEIGHT')
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(n) for n in options['concurrency'].split(',')]
+            width, height = (int(n) for n in options['size'].lower().split('x'))
+        except ValueError:
+            raise CommandError("--concurrency must be integers and --size must look like 1200x800")
+
+        self.image_bytes = self._build_image(width, height)
+        self.csrf_token = get_random_string(32)
+        user = get_user_model().objects.create_user(f'benchmark-{uuid.uuid4().hex[:12]}')
+        project = Project.objects.create(owner=user, title='Upload benchmark', upload_mode=Project.UPLOAD_ORIGINAL)
+        self.url = reverse('projects:photo_upload', kwargs={'project_id': project.id})
+
+        directory = tempfile.mkdtemp(prefix='benchmark_uploads_')
+        original = uploads.upload_to_storage
+        uploads.upload_to_storage = LocalStorageStandIn(directory, options['latency'])
+        # Uploads kept for the metadata jobs go with the temp directory too
+        staging = override_settings(PHOTO_METADATA_STAGING_DIR=os.path.join(directory, 'metadata'))
+        staging.enable()
+        try:
+            self.stdout.write(
+                f"{options['files']} files/request, {options['latency'] * 1000:.0f}ms storage latency, "
+                f"{options['sync_workers']} sync workers"
+            )
+            for level in levels:
+                requests = [self._sync_request(user, options['files']) for _ in range(level)]
+                sync = self._run_sync(requests, project, options['sync_workers'])
+                self._check_photos(project, level * options['files'])
+                requests = [self._async_request(user, options['files']) for _ in range(level)]
+                async_ = asyncio.run(self._run_async(requests, project))
+                self._check_photos(project, level * options['files'])
+                self.stdout.write(f"{level:4} concurrent requests: sync {self._format(sync)} | async {self._format(async_)}")
+        finally:
+            uploads.upload_to_storage = original
+            staging.disable()
+            shutil.rmtree(directory, ignore_errors=True)
+            self._clean_up(user)
+
+    def _run_sync(self, requests, project, workers):
+        start = time.perf_counter()
+
+        def handle(request):
+            try:
+                self._check(views.photo_upload(request, project.id), project)
+                return time.perf_counter() - start
+            finally:
+                close_old_connections()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            latencies = list(pool.map(handle, requests))
+        return time.perf_counter() - start, latencies, requests
+
+    async def _run_async(self, requests, project):
+        start = time.perf_counter()
+
+        async def handle(request):
+            async with ThreadSensitiveContext():
+                self._check(await async_views.photo_upload(request, project.id), project)
+            return time.perf_counter() - start
+
+        latencies = await asyncio.gather(*(handle(request) for request in requests))
+        return time.perf_counter() - start, latencies, requests
+
+    # Uploads end in a redirect to the project page; anything else is a failed request
+    def _check(self, response, project):
+        if response.status_code != 302 or response.url != project.get_absolute_url():
+            raise CommandError(f"Upload request failed: {response.status_code} {getattr(response, 'url', '')}")
+
+    # Every file became a photo (failed files are only reported as messages); starts each run empty
+    def _check_photos(self, project, expected):
+        photos = Photo.objects.filter(project=project)
+        created = photos.count()
+        if created != expected:
+            raise CommandError(f"Expected {expected} photos, the views created {created}")
+        photos.delete()
+
+    def _sync_request(self, user, count):
+        return self._prepare(RequestFactory(), user, count)
+
+    def _async_request(self, user, count):
+        return self._prepare(AsyncRequestFactory(), user, count)
+
+    # A logged-in multipart POST with a valid CSRF cookie and header, as the upload page sends it
+    def _prepare(self, factory, user, count):
+        factory.cookies[settings.CSRF_COOKIE_NAME] = self.csrf_token
+        request = factory.post(self.url, {'photos': self._files(count)}, headers={'X-CSRFToken': self.csrf_token})
+        request.user = user
+
+        async def auser():
+            return user
+
+        request.auser = auser
+        request._messages = CookieStorage(request)
+        return request
+
+    # Distinct bytes per file (trailing data after the JPEG end marker), so no upload is
+    # answered by content-hash reuse of an earlier one
+    def _files(self, count):
+        return [
+            SimpleUploadedFile(f'bench_{i}.jpg', self.image_bytes + uuid.uuid4().bytes, 'image/jpeg')
+            for i in range(count)
+        ]
+
+    def _clean_up(self, user):
+        with transaction.atomic():
+            # Cascades to the project, its photos and the user's jobs
+            user.delete()
+            AssetDeletion.objects.filter(public_id__startswith=STAND_IN_PREFIX).delete()
+
+    def _format(self, result):
+        elapsed, latencies, requests = result
+        total_files = sum(len(request.FILES.getlist('photos')) for request in requests)
+        p95 = statistics.quantiles(latencies, n=20)[-1] if len(latencies) > 1 else latencies[0]
+        return f"{elapsed:.2f}s, {total_files / elapsed:.1f} uploads/s, p95 {p95:.2f}s"
+
+    def _build_image(self, width, height):
+        buffer = io.BytesIO()
+        Image.effect_noise((width, height), 64).convert('RGB').save(buffer, 'JPEG', quality=90)
+        return buffer.getvalue()
@@ -0,0 +1,97 @@
+"""
+Time rendering the project detail grid with and without memoized variant URLs.
+
+Renders templates/projects/detail.html for an unsaved project with --count photos
+(no database needed). "uncached" calls build_url() for every URL like the old
+properties did; "cold" starts with an empty process-wide LRU; "warm" is a later
+request for the same photos, where every URL comes from the LRU.
+Usage: python manage.py benchmark_urls --count 500
+"""
+
+import time
+
+from cloudinary import CloudinaryResource
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import RequestFactory
+
+from media import variants
+from media.backends import get_backend
+from projects.models import Project, Photo
+
+
+class Command(BaseCommand):
+    help = "Benchmark detail grid rendering with and without the variant URL cache"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=500, help='Photos in the grid')
+        parser.add_argument('--repeat', type=int, default=5, help='Timing rounds (best is reported)')
+
+    def handle(self, *args, **options):
+        user = get_user_model()(pk=1, username='benchmark')
+        request = RequestFactory().get('/projects/1/')
+        request.user = user
+
+        # A variant URL for one photo must come out the same either way
+        sample = self._build_project(user, 1).photos.all()[0]
+        cached = sample.thumbnail_url
+        uncached = variants._build_url(
+            sample.image.public_id, sample.image.version, sample.image.format,
+            sample.image.type, sample.image.resource_type, 'thumbnail'
+        )
+        assert cached == uncached == get_backend().url(sample.image, **variants.variant_options('thumbnail'))
+
+        count, repeat = options['count'], options['repeat']
+        original = variants._cached_build_url
+        try:
+            variants._cached_build_url = variants._build_url
+            uncached = self._best_of(repeat, lambda: self._render(request, user, count))
+        finally:
+            variants._cached_build_url = original
+
+        cold = self._best_of(repeat, lambda: self._render(request, user, count), clear=True)
+        warm = self._best_of(repeat, lambda: self._render(request, user, count))
+
+        self.stdout.write(
+            f"{count} photos: uncached {uncached * 1000:.1f}ms, cold cache {cold * 1000:.1f}ms, "
+            f"warm cache {warm * 1000:.1f}ms ({uncached / warm if warm else 0:.1f}x)"
+        )
+
+    # Fresh instances every render, as a new request would have
+    def _render(self, request, user, count):
+        project = self._build_project(user, count)
+        start = time.perf_counter()
+        render_to_string('projects/detail.html', {'project': project, 'object': project}, request=request)
+        return time.perf_counter() - start
+
+    def _best_of(self, rounds, func, clear=False):
+        best = None
+        for _ in range(rounds):
+            if clear:
+                variants.clear_url_cache()
+            elapsed = func()
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def _build_project(self, user, count):
+        project = Project(pk=1, owner=user, title='Benchmark')
+        photos = [
+            Photo(
+                pk=i + 1,
+                project=project,
+                title=f'Photo {i}',
+                order_index=i,
+                image=CloudinaryResource(
+                    f'benchmark/photo_{i}', format='jpg', version='1700000000',
+                    type='upload', resource_type='image',
+                ),
+            )
+            for i in range(count)
+        ]
+        # Stand in for prefetch_related so project.photos.all() needs no query
+        queryset = Photo.objects.none()
+        queryset._result_cache = photos
+        queryset._prefetch_done = True
+        project._prefetched_objects_cache = {'photos': queryset}
+        return project
@@ -0,0 +1,46 @@
+"""
+Delete abandoned chunked upload sessions and their partial files on disk, and uploads
+kept for metadata jobs that never read them (failed, or ran on another machine).
+
+Usage: python manage.py purge_upload_sessions --hours 24
+"""
+
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from projects.models import UploadSession
+
+
+class Command(BaseCommand):
+    help = "Remove chunked upload sessions that haven't received data recently"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hours', type=int, default=24, help='Idle time before a session is purged')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        stale = UploadSession.objects.filter(updated__lt=cutoff).exclude(
+            status=UploadSession.STATUS_COMPLETE
+        )
+
+        count = 0
+        for session in stale.iterator():
+            session.chunk_path.unlink(missing_ok=True)
+            # Chunks left by requests that died between receiving and appending them
+            for chunk_path in session.chunk_path.parent.glob(f'{session.id}.*.chunk'):
+                chunk_path.unlink(missing_ok=True)
+            count += 1
+        stale.delete()
+
+        self.stdout.write(f"Purged {count} upload session{'s' if count != 1 else ''}.")
+
+        kept = 0
+        for path in Path(settings.PHOTO_METADATA_STAGING_DIR).glob('*.upload'):
+            if path.stat().st_mtime < cutoff.timestamp():
+                path.unlink(missing_ok=True)
+                kept += 1
+        self.stdout.write(f"Removed {kept} kept upload{'s' if kept != 1 else ''}.")
@@ -0,0 +1,40 @@
+"""
+Show deleted projects and accounts that are still being reaped, and restart any
+whose reaper job is gone (e.g. it failed for good or the queue was cleared).
+
+Usage: python manage.py reap_tombstones [--requeue]
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from jobs.models import Job
+from projects.models import Project
+from projects.tombstones import REAP_JOB, remaining, enqueue_reaper
+
+
+class Command(BaseCommand):
+    help = "Report on tombstoned projects and accounts, optionally requeueing stalled reapers"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requeue', action='store_true', help='Queue a reaper for tombstones without one')
+
+    def handle(self, *args, **options):
+        pending = Job.objects.filter(name=REAP_JOB, status__in=[Job.STATUS_QUEUED, Job.STATUS_RUNNING])
+        users = get_user_model().objects.filter(deleted_at__isnull=False).values_list('pk', flat=True)
+        # Projects of a deleted account are reaped with the account
+        projects = Project.all_objects.filter(deleted_at__isnull=False).exclude(
+            owner_id__in=users
+        ).values_list('pk', flat=True)
+
+        targets = [('user_id', pk) for pk in users] + [('project_id', pk) for pk in projects]
+        requeued = 0
+        for key, pk in targets:
+            active = pending.filter(**{f'payload__{key}': pk}).exists()
+            left = ', '.join(f'{count} {name}' for name, count in remaining(**{key: pk}).items())
+            self.stdout.write(f"{key.split('_')[0]} {pk}: {left} left{'' if active else ' (no reaper queued)'}")
+            if not active and options['requeue']:
+                enqueue_reaper({key: pk})
+                requeued += 1
+
+        self.stdout.write(f"{len(targets)} tombstones, {requeued} requeued")
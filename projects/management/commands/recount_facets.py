@@ -0,0 +1,39 @@
+"""
+Rebuild the EXIF facet counts of users from their photos, e.g. after editing rows by
+hand or through Photo.all_objects, or after changing FACET_ISO_BANDS.
+
+Usage: python manage.py recount_facets [--user ID ...] [--batch-size 100]
+"""
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from projects.facets import recount_facets
+
+
+class Command(BaseCommand):
+    help = "Recompute the per-user camera, lens, ISO and year facet counts"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', help='Only this user (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=100, help='Users recounted per transaction')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.order_by('id')
+        if options['user']:
+            users = users.filter(pk__in=options['user'])
+
+        values = 0
+        recounted = 0
+        last_id = 0
+        # Users in id order, each batch replaced in its own transaction
+        while True:
+            ids = list(users.filter(id__gt=last_id).values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            with transaction.atomic():
+                values += recount_facets(ids)
+            recounted += len(ids)
+            last_id = ids[-1]
+        self.stdout.write(f"Recounted {values} facet values for {recounted} users.")
@@ -0,0 +1,35 @@
+"""
+Rebuild the denormalized photo counters of projects from their photos, e.g. after
+editing rows by hand or through Photo.all_objects.
+
+Usage: python manage.py recount_projects [--project ID ...] [--batch-size 500]
+"""
+
+from django.core.management.base import BaseCommand
+
+from projects.counters import recount_projects
+from projects.models import Project
+
+
+class Command(BaseCommand):
+    help = "Recompute photo_count, featured_count, attention_count and total_bytes of projects"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, action='append', help='Only this project (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=500, help='Projects updated per query')
+
+    def handle(self, *args, **options):
+        projects = Project.all_objects.order_by('id')
+        if options['project']:
+            projects = projects.filter(pk__in=options['project'])
+
+        updated = 0
+        last_id = 0
+        # Short UPDATEs in id order rather than one that locks every project at once
+        while True:
+            ids = list(projects.filter(id__gt=last_id).values_list('id', flat=True)[:options['batch_size']])
+            if not ids:
+                break
+            updated += recount_projects(Project.all_objects.filter(pk__in=ids))
+            last_id = ids[-1]
+        self.stdout.write(f"Recounted {updated} projects.")
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:02
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0003_alter_photo_is_featured_alter_photo_needs_attention'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('content_type', models.CharField(max_length=50)),
+                ('total_size', models.PositiveBigIntegerField(help_text='Expected file size in bytes')),
+                ('received_bytes', models.PositiveBigIntegerField(default=0, help_text='Bytes persisted so far')),
+                ('status', models.CharField(choices=[('active', 'Receiving chunks'), ('complete', 'Complete'), ('failed', 'Failed')], default='active', max_length=10)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL)),
+                ('photo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='projects.photo')),
+                ('project', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to='projects.project')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', 'status'], name='projects_up_owner_i_cfc6c7_idx'), models.Index(fields=['status', 'updated'], name='projects_up_status_3ebd8e_idx')],
+            },
+        ),
+    ]
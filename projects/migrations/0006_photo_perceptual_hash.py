@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0005_photo_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='perceptual_hash',
+            field=models.BigIntegerField(blank=True, help_text='64-bit dHash for finding near-duplicate photos', null=True),
+        ),
+    ]
@@ -0,0 +1,139 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:07
+
+from datetime import datetime, timezone as dt_timezone
+from fractions import Fraction
+import math
+
+from django.db import migrations, models
+
+
+BATCH_SIZE = 500
+
+# The EXIF parsing of projects.utils as it was when this migration was written, frozen
+# here so later changes to the live parser don't change what this backfill does
+
+EXIF_FIELD_TAGS = {
+    'camera_make': ['Image Make'],
+    'camera_model': ['Image Model'],
+    'focal_length': ['EXIF FocalLength'],
+    'f_number': ['EXIF FNumber'],
+    'exposure_time': ['EXIF ExposureTime'],
+    'iso': ['EXIF ISOSpeedRatings', 'EXIF PhotographicSensitivity'],
+    'taken_at': ['EXIF DateTimeOriginal', 'Image DateTime'],
+}
+
+
+def _parse_exif_number(value):
+    if value is None:
+        return None
+    text = str(value).strip().strip('[]').split(',')[0].strip()
+    try:
+        number = float(Fraction(text))
+    except (ValueError, ZeroDivisionError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _parse_exif_datetime(value):
+    try:
+        naive = datetime.strptime(str(value).strip()[:19], '%Y:%m:%d %H:%M:%S')
+    except (ValueError, TypeError):
+        return None
+    return naive.replace(tzinfo=dt_timezone.utc)
+
+
+def parse_exif_fields(exif):
+    exif = exif or {}
+
+    def first(field):
+        for tag in EXIF_FIELD_TAGS[field]:
+            if exif.get(tag):
+                return exif[tag]
+        return None
+
+    iso = _parse_exif_number(first('iso'))
+    return {
+        'camera_make': str(first('camera_make') or '').strip()[:100],
+        'camera_model': str(first('camera_model') or '').strip()[:100],
+        'focal_length': _parse_exif_number(first('focal_length')),
+        'f_number': _parse_exif_number(first('f_number')),
+        'exposure_time': _parse_exif_number(first('exposure_time')),
+        'iso': int(iso) if iso and iso > 0 else None,
+        'taken_at': _parse_exif_datetime(first('taken_at')),
+    }
+
+
+def backfill_exif_columns(apps, schema_editor):
+    # Parse the typed columns out of the stringified exif_data of existing photos
+    Photo = apps.get_model('projects', 'Photo')
+    pending = Photo.objects.exclude(exif_data=None).only('id', 'exif_data').order_by('id')
+    fields = ['camera_make', 'camera_model', 'focal_length', 'f_number', 'exposure_time', 'iso', 'taken_at']
+
+    last_id = 0
+    while True:
+        batch = list(pending.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        for photo in batch:
+            for field, value in parse_exif_fields(photo.exif_data).items():
+                setattr(photo, field, value)
+        Photo.objects.bulk_update(batch, fields)
+        last_id = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0006_photo_perceptual_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='camera_make',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='camera_model',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='exposure_time',
+            field=models.FloatField(blank=True, help_text='Shutter speed in seconds', null=True),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='f_number',
+            field=models.FloatField(blank=True, help_text='Aperture f-number', null=True),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='focal_length',
+            field=models.FloatField(blank=True, help_text='Focal length in mm', null=True),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='iso',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='taken_at',
+            field=models.DateTimeField(blank=True, help_text='EXIF DateTimeOriginal', null=True),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['camera_make', 'camera_model'], name='projects_ph_camera__9c784b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['iso'], name='projects_ph_iso_cc4d28_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['taken_at'], name='projects_ph_taken_a_e4a4f0_idx'),
+        ),
+        migrations.RunPython(backfill_exif_columns, migrations.RunPython.noop),
+    ]
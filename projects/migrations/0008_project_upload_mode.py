@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0007_photo_exif_columns'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='upload_mode',
+            field=models.CharField(choices=[('original', 'Keep originals'), ('optimized', 'Optimized (downscaled high-quality JPEG)')], default='original', help_text='Keep uploaded originals, or downscale and re-encode them before storing', max_length=10),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0009_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='dominant_color',
+            field=models.CharField(blank=True, help_text='#rrggbb', max_length=7),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='placeholder',
+            field=models.CharField(blank=True, help_text='Base64 WebP, 16px on the long side', max_length=400),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='dominant_color',
+            field=models.CharField(blank=True, help_text='#rrggbb', max_length=7),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='placeholder',
+            field=models.CharField(blank=True, help_text='Base64 WebP, 16px on the long side', max_length=400),
+        ),
+    ]
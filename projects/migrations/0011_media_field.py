@@ -0,0 +1,24 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:36
+
+import media.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0010_placeholders'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='photo',
+            name='image',
+            field=media.fields.MediaField(max_length=255, verbose_name='image'),
+        ),
+        migrations.AlterField(
+            model_name='project',
+            name='cover_photo',
+            field=media.fields.MediaField(blank=True, help_text='Cover photo for the project', max_length=255, null=True, verbose_name='image'),
+        ),
+    ]
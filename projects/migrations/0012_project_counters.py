@@ -0,0 +1,43 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:47
+
+from django.db import migrations, models
+
+from projects.counters import recount_projects
+
+
+def fill_counters(apps, schema_editor):
+    # Counters of existing projects, straight from their photos
+    Project = apps.get_model('projects', 'Project')
+    Photo = apps.get_model('projects', 'Photo')
+    recount_projects(Project.objects.all(), Photo.objects)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0011_media_field'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='attention_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='featured_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='photo_count',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='total_bytes',
+            field=models.BigIntegerField(default=0, editable=False, help_text='Sum of photo file sizes'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:54
+
+from django.db import migrations
+
+# Space existing photos 1024 apart (PHOTO_ORDER_GAP) in their current display order,
+# so moves have room between neighbours from the start
+SPACE_PHOTO_ORDER = """
+UPDATE projects_photo SET order_index = ranked.position * 1024
+FROM (
+    SELECT id, ROW_NUMBER() OVER (PARTITION BY project_id ORDER BY order_index, id) AS position
+    FROM projects_photo
+) AS ranked
+WHERE projects_photo.id = ranked.id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0012_project_counters'),
+    ]
+
+    operations = [
+        # id breaks ties between equal ranks (see projects.ordering)
+        migrations.AlterModelOptions(
+            name='photo',
+            options={'ordering': ['order_index', 'id']},
+        ),
+        migrations.RunSQL(SPACE_PHOTO_ORDER, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+from projects.facets import recount_facets
+
+
+BATCH_SIZE = 500
+
+# Frozen copy of how projects.utils.parse_exif_fields read the lens when this was written
+LENS_MODEL_TAGS = ['EXIF LensModel']
+
+
+def parse_lens_model(exif):
+    for tag in LENS_MODEL_TAGS:
+        if exif.get(tag):
+            return str(exif[tag]).strip()[:100]
+    return ''
+
+
+def backfill_lens_model(apps, schema_editor):
+    # Lens model of existing photos, from the raw tags kept in exif_data
+    Photo = apps.get_model('projects', 'Photo')
+    pending = Photo.objects.filter(exif_data__has_key='EXIF LensModel').only('id', 'exif_data').order_by('id')
+
+    last_id = 0
+    while True:
+        batch = list(pending.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not batch:
+            break
+        for photo in batch:
+            photo.lens_model = parse_lens_model(photo.exif_data)
+        Photo.objects.bulk_update(batch, ['lens_model'])
+        last_id = batch[-1].id
+
+
+def fill_facet_counts(apps, schema_editor):
+    # Facet counts of every user with projects, straight from their photos
+    Project = apps.get_model('projects', 'Project')
+    Photo = apps.get_model('projects', 'Photo')
+    FacetCount = apps.get_model('projects', 'FacetCount')
+    owners = sorted(set(Project.objects.values_list('owner', flat=True)))
+    for start in range(0, len(owners), BATCH_SIZE):
+        recount_facets(owners[start:start + BATCH_SIZE], Photo.objects, FacetCount.objects)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0014_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FacetCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(choices=[('camera', 'Camera'), ('lens', 'Lens'), ('iso', 'ISO'), ('year', 'Year taken')], max_length=10)),
+                ('value', models.CharField(max_length=201)),
+                ('count', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='lens_model',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['lens_model'], name='projects_ph_lens_mo_1fad43_idx'),
+        ),
+        migrations.AddField(
+            model_name='facetcount',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='facet_counts', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='facetcount',
+            constraint=models.UniqueConstraint(fields=('user', 'facet', 'value'), name='unique_facet_value'),
+        ),
+        migrations.RunPython(backfill_lens_model, migrations.RunPython.noop),
+        migrations.RunPython(fill_facet_counts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:31
+
+import django.db.models.expressions
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0015_exif_facets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='hash_chunk_0',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('perceptual_hash'), '>>', models.Value(0)), '&', models.Value(65535)), output_field=models.IntegerField()),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='hash_chunk_1',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('perceptual_hash'), '>>', models.Value(16)), '&', models.Value(65535)), output_field=models.IntegerField()),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='hash_chunk_2',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('perceptual_hash'), '>>', models.Value(32)), '&', models.Value(65535)), output_field=models.IntegerField()),
+        ),
+        migrations.AddField(
+            model_name='photo',
+            name='hash_chunk_3',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.F('perceptual_hash'), '>>', models.Value(48)), '&', models.Value(65535)), output_field=models.IntegerField()),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['project', 'hash_chunk_0'], name='photo_hash_chunk_0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['project', 'hash_chunk_1'], name='photo_hash_chunk_1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['project', 'hash_chunk_2'], name='photo_hash_chunk_2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='photo',
+            index=models.Index(fields=['project', 'hash_chunk_3'], name='photo_hash_chunk_3_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:38
+
+from django.db import migrations, models
+
+
+def fill_upload_modes(apps, schema_editor):
+    # Photos weren't tagged before; the project's current mode is the best guess at how they were stored
+    Photo = apps.get_model('projects', 'Photo')
+    Photo.objects.filter(project__upload_mode='optimized').update(upload_mode='optimized')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0016_photo_hash_chunks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='photo',
+            name='upload_mode',
+            field=models.CharField(choices=[('original', 'Keep originals'), ('optimized', 'Optimized (downscaled high-quality JPEG)')], default='original', editable=False, max_length=10),
+        ),
+        migrations.RunPython(fill_upload_modes, migrations.RunPython.noop),
+    ]
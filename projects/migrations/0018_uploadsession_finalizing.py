@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0017_photo_upload_mode'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadsession',
+            name='status',
+            field=models.CharField(choices=[('active', 'Receiving chunks'), ('finalizing', 'Finalizing'), ('complete', 'Complete'), ('failed', 'Failed')], default='active', max_length=10),
+        ),
+    ]
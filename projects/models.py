@@ -1,14 +1,51 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
 from django.conf import settings
 from django.urls import reverse
 from django.utils import timezone
 import os
+import uuid
+from pathlib import Path
 from django.db.models.signals import post_delete, pre_save
 from django.dispatch import receiver
-from cloudinary.models import CloudinaryField
 
+from media.fields import MediaField
+from media.tracking import FieldTrackingMixin
+from media.variants import VariantURLMixin
+from .counters import PhotoQuerySet
+
+
+# One 16-bit piece of Photo.perceptual_hash, kept by the database (see projects.similarity)
+def _hash_chunk(position):
+    return models.GeneratedField(
+        expression=models.F('perceptual_hash').bitrightshift(16 * position).bitand(0xFFFF),
+        output_field=models.IntegerField(),
+        db_persist=True,
+    )
+
+
+# Default manager: hides rows tombstoned for background deletion (use all_objects to see them)
+class ActiveManager(models.Manager):
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class Project(FieldTrackingMixin, VariantURLMixin, models.Model):
+    # loaded values kept so the cleanup signals can see a replaced cover (and the facet
+    # signal a new owner) without a query
+    tracked_fields = ('cover_photo', 'owner')
+    # image sizes the cover is shown in (see media.variants)
+    variant_fields = {'cover_photo': ('thumbnail', 'card', 'hero')}
+
+    # how photo uploads are stored
+    UPLOAD_ORIGINAL = 'original'
+    UPLOAD_OPTIMIZED = 'optimized'
+    UPLOAD_MODE_CHOICES = [
+        (UPLOAD_ORIGINAL, 'Keep originals'),
+        (UPLOAD_OPTIMIZED, 'Optimized (downscaled high-quality JPEG)'),
+    ]
 
-class Project(models.Model):
     # relationships (connects to user model)
     owner = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -35,7 +72,7 @@ class Project(models.Model):
         help_text="Target end date for the project (optional)"
     )
     # media
-    cover_photo = CloudinaryField(
+    cover_photo = MediaField(
     'image',
     blank=True,
     null=True,
@@ -45,9 +82,34 @@ class Project(models.Model):
         'fetch_format': 'auto',
     }
 )
+    # painted behind the cover while it loads (see compute_placeholder)
+    placeholder = models.CharField(max_length=400, blank=True, help_text="Base64 WebP, 16px on the long side")
+    dominant_color = models.CharField(max_length=7, blank=True, help_text="#rrggbb")
+    upload_mode = models.CharField(
+        max_length=10,
+        choices=UPLOAD_MODE_CHOICES,
+        default=UPLOAD_ORIGINAL,
+        help_text="Keep uploaded originals, or downscale and re-encode them before storing"
+    )
+    # kept in step with the photos (see projects.counters), so lists don't count per row
+    photo_count = models.IntegerField(default=0, editable=False)
+    featured_count = models.IntegerField(default=0, editable=False)
+    attention_count = models.IntegerField(default=0, editable=False)
+    total_bytes = models.BigIntegerField(default=0, editable=False, help_text="Sum of photo file sizes")
+    # full-text search document (see projects.search); computed by the database on every write
+    search_vector = models.GeneratedField(
+        expression=SearchVector('title', 'description', config=settings.SEARCH_CONFIG),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
     # timestamps
     created = models.DateTimeField(auto_now_add=True)
     updated = models.DateTimeField(auto_now=True)
+    # set when the project is deleted; the reaper removes the rows and assets later
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = ActiveManager()
+    all_objects = models.Manager()
 
     class Meta:
         db_table = 'projects_project'
@@ -59,6 +121,9 @@ class Project(models.Model):
             models.Index(fields=['owner', '-created']),
             # Fast lookup of all projects by creation date
             models.Index(fields=['-created']),
+            # Search: words in the title/description, and fuzzy title matches (pg_trgm)
+            GinIndex(fields=['search_vector'], name='project_search_vector_idx'),
+            GinIndex(fields=['title'], name='project_title_trgm_idx', opclasses=['gin_trgm_ops']),
         ]
 
     def __str__(self):
@@ -67,6 +132,11 @@ class Project(models.Model):
     def get_absolute_url(self):
         return reverse('projects:detail', kwargs={'pk': self.pk})
 
+    @property
+    def placeholder_uri(self):
+        # Inline data URI of the cover placeholder, or '' when there is none
+        return f"data:image/webp;base64,{self.placeholder}" if self.placeholder else ''
+
     def is_overdue(self):
         # Check if project is past target end date
         if self.target_end:
@@ -88,14 +158,22 @@ class Project(models.Model):
         return None
 
 
-class Photo(models.Model):
+class Photo(FieldTrackingMixin, VariantURLMixin, models.Model):
+    # loaded values kept so the cleanup, counter and facet signals can see what a save changed without a query
+    tracked_fields = (
+        'image', 'content_hash', 'project', 'is_featured', 'needs_attention', 'file_size', 'deleted_at',
+        'camera_make', 'camera_model', 'lens_model', 'iso', 'taken_at',
+    )
+    # image sizes the photo is shown in (see media.variants)
+    variant_fields = {'image': ('thumbnail', 'natural_thumbnail', 'medium', 'large')}
+
     project = models.ForeignKey(
         Project, 
         on_delete=models.CASCADE, 
         related_name='photos'
     )
     title = models.CharField(max_length=200, blank=True)
-    image = CloudinaryField(
+    image = MediaField(
         'image',
         # Cloudinary transformation options
         transformation={
@@ -110,8 +188,45 @@ class Photo(models.Model):
     mime_type = models.CharField(max_length=50, blank=True)
     width = models.PositiveIntegerField(null=True, blank=True)
     height = models.PositiveIntegerField(null=True, blank=True)
+    content_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        db_index=True,
+        help_text="SHA-256 of the uploaded file, used to reuse identical assets"
+    )
+    # The project's upload mode when the asset was stored: reuse by content_hash only
+    # matches assets stored the same way (an optimized copy is not the original)
+    upload_mode = models.CharField(
+        max_length=10,
+        choices=Project.UPLOAD_MODE_CHOICES,
+        default=Project.UPLOAD_ORIGINAL,
+        editable=False,
+    )
+    perceptual_hash = models.BigIntegerField(
+        null=True,
+        blank=True,
+        help_text="64-bit dHash for finding near-duplicate photos"
+    )
+    # The hash's four 16-bit pieces, indexed per project so similar_photos() can probe nearby values
+    hash_chunk_0 = _hash_chunk(0)
+    hash_chunk_1 = _hash_chunk(1)
+    hash_chunk_2 = _hash_chunk(2)
+    hash_chunk_3 = _hash_chunk(3)
+    # Painted in the grid while the thumbnail loads (see compute_placeholder)
+    placeholder = models.CharField(max_length=400, blank=True, help_text="Base64 WebP, 16px on the long side")
+    dominant_color = models.CharField(max_length=7, blank=True, help_text="#rrggbb")
     
-    # EXIF data stored as JSON
+    # Camera settings parsed from EXIF at ingest (typed so they can be filtered and indexed)
+    camera_make = models.CharField(max_length=100, blank=True)
+    camera_model = models.CharField(max_length=100, blank=True)
+    lens_model = models.CharField(max_length=100, blank=True)
+    focal_length = models.FloatField(null=True, blank=True, help_text="Focal length in mm")
+    f_number = models.FloatField(null=True, blank=True, help_text="Aperture f-number")
+    exposure_time = models.FloatField(null=True, blank=True, help_text="Shutter speed in seconds")
+    iso = models.PositiveIntegerField(null=True, blank=True)
+    taken_at = models.DateTimeField(null=True, blank=True, help_text="EXIF DateTimeOriginal")
+
+    # Whitelisted raw EXIF tags (optional, see EXIF_RAW_TAGS)
     exif_data = models.JSONField(blank=True, null=True, help_text="Camera EXIF data")
     
     # Workflow fields
@@ -120,49 +235,73 @@ class Photo(models.Model):
     
     # Ordering
     order_index = models.PositiveIntegerField(default=0, help_text="Display order")
+
+    # Full-text search document (see projects.search); computed by the database on every write
+    search_vector = models.GeneratedField(
+        expression=SearchVector('title', 'caption', config=settings.SEARCH_CONFIG),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
     
     # Timestamps
     uploaded_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # copied from the project (or owner) tombstone so photo queries don't need a join
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    # writes through `objects` keep the project counters and facet counts current; all_objects skips them
+    objects = ActiveManager.from_queryset(PhotoQuerySet)()
+    all_objects = models.Manager()
     
     class Meta:
-        ordering = ['order_index', 'uploaded_at']
+        # id breaks ties the same way the grid and the order writes do (see projects.ordering)
+        ordering = ['order_index', 'id']
         indexes = [
             models.Index(fields=['project', 'order_index']),
             models.Index(fields=['uploaded_at']),
             models.Index(fields=['needs_attention']),
             models.Index(fields=['is_featured']),
+            models.Index(fields=['camera_make', 'camera_model']),
+            models.Index(fields=['lens_model']),
+            models.Index(fields=['iso']),
+            models.Index(fields=['taken_at']),
+            # Near-duplicate lookup: one probe per hash piece (see projects.similarity)
+            models.Index(fields=['project', 'hash_chunk_0'], name='photo_hash_chunk_0_idx'),
+            models.Index(fields=['project', 'hash_chunk_1'], name='photo_hash_chunk_1_idx'),
+            models.Index(fields=['project', 'hash_chunk_2'], name='photo_hash_chunk_2_idx'),
+            models.Index(fields=['project', 'hash_chunk_3'], name='photo_hash_chunk_3_idx'),
+            # Search: words in the title/caption, and fuzzy title matches (pg_trgm)
+            GinIndex(fields=['search_vector'], name='photo_search_vector_idx'),
+            GinIndex(fields=['title'], name='photo_title_trgm_idx', opclasses=['gin_trgm_ops']),
         ]
     
     def __str__(self):
         return self.title or f"Photo {self.id}"
     
+    @classmethod
+    def assets_in_use(cls, keys, for_update=False):
+        # Of (content_hash, public_id) pairs, the ones a Photo row still points at (deduplicated uploads)
+        # Shared assets always have a content hash, so this stays on the indexed column
+        # for_update locks those rows until the transaction ends, so they can't be deleted meanwhile
+        hashes = {content_hash for content_hash, _ in keys if content_hash}
+        if not hashes:
+            return set()
+        # Tombstoned rows still hold the asset until they are reaped
+        rows = cls.all_objects.filter(content_hash__in=hashes)
+        if for_update:
+            rows = rows.select_for_update()
+        rows = rows.values_list('content_hash', 'image')
+        return {(content_hash, image.public_id) for content_hash, image in rows if image} & set(keys)
+
     @property
     def thumbnail_url(self):
-        """Generate thumbnail URL using Cloudinary transformations"""
-        if self.image:
-            # Cloudinary URL transformation for thumbnails
-            return self.image.build_url(
-                width=300,
-                height=300,
-                crop='fill',
-                quality='auto:good',
-                fetch_format='auto'
-            )
-        return None
+        """Thumbnail URL using Cloudinary transformations (memoized, see media.variants)"""
+        return self.variant_url('image', 'thumbnail')
     
     @property
     def natural_thumbnail_url(self):
-        """Generate thumbnail URL that preserves aspect ratio using Cloudinary transformations"""
-        if self.image:
-            return self.image.build_url(
-                width=180,
-                crop='limit',
-                quality=100,  # Very high quality (0-100 scale)
-                format='jpg',  # Force JPEG for consistent quality
-                flags='progressive'  # Progressive JPEG loading
-            )
-        return None
+        """Thumbnail URL that preserves aspect ratio using Cloudinary transformations"""
+        return self.variant_url('image', 'natural_thumbnail')
 
     
     # Properties - computed attributes that act like fields but generate values dynamically
@@ -173,39 +312,37 @@ class Photo(models.Model):
     @property
     def medium_url(self):
         # Generate medium-sized URL for galleries
-        if self.image:
-            return self.image.build_url(
-                width=800,
-                height=600,
-                crop='limit',
-                quality='auto:good',
-                fetch_format='auto'
-            )
-        return None
+        return self.variant_url('image', 'medium')
+
+    @property
+    def placeholder_uri(self):
+        # Inline data URI of the placeholder, or '' when there is none
+        return f"data:image/webp;base64,{self.placeholder}" if self.placeholder else ''
     
     @property
     def camera_info(self):
-        # Extract camera information from EXIF data
-        if not self.exif_data:
-            return None
-        
+        # Display strings for the camera settings, built from the typed EXIF columns
         info = {}
-        exif = self.exif_data
-        
-        # Common EXIF fields
-        if 'Image Make' in exif:
-            info['make'] = exif['Image Make']
-        if 'Image Model' in exif:
-            info['model'] = exif['Image Model']
-        if 'EXIF FocalLength' in exif:
-            info['focal_length'] = exif['EXIF FocalLength']
-        if 'EXIF FNumber' in exif:
-            info['aperture'] = exif['EXIF FNumber']
-        if 'EXIF ExposureTime' in exif:
-            info['shutter_speed'] = exif['EXIF ExposureTime']
-        if 'EXIF ISOSpeedRatings' in exif:
-            info['iso'] = exif['EXIF ISOSpeedRatings']
-        
+
+        if self.camera_make:
+            info['make'] = self.camera_make
+        if self.camera_model:
+            info['model'] = self.camera_model
+        if self.lens_model:
+            info['lens'] = self.lens_model
+        if self.focal_length:
+            info['focal_length'] = f"{self.focal_length:g}mm"
+        if self.f_number:
+            info['aperture'] = f"{self.f_number:g}"
+        if self.exposure_time:
+            # Fast shutter speeds read as fractions: 0.004 -> "1/250"
+            if self.exposure_time < 1:
+                info['shutter_speed'] = f"1/{round(1 / self.exposure_time)}"
+            else:
+                info['shutter_speed'] = f"{self.exposure_time:g}s"
+        if self.iso:
+            info['iso'] = self.iso
+
         return info if info else None
     
     @property
@@ -225,4 +362,97 @@ class Photo(models.Model):
             bytes_size /= 1024.0  # Convert to next larger unit
         
         # For very large files (unlikely for photos but covers edge cases)
-        return f"{bytes_size:.1f} TB"
\ No newline at end of file
+        return f"{bytes_size:.1f} TB"
+
+
+class FacetCount(models.Model):
+    """How many of a user's live photos have one facet value (see projects.facets)"""
+    FACET_CAMERA = 'camera'
+    FACET_LENS = 'lens'
+    FACET_ISO = 'iso'
+    FACET_YEAR = 'year'
+    FACET_CHOICES = [
+        (FACET_CAMERA, 'Camera'),
+        (FACET_LENS, 'Lens'),
+        (FACET_ISO, 'ISO'),
+        (FACET_YEAR, 'Year taken'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='facet_counts'
+    )
+    facet = models.CharField(max_length=10, choices=FACET_CHOICES)
+    # "make|model" for cameras, the ISO band's lower bound, the year
+    value = models.CharField(max_length=201)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also the index the sidebar reads by, and the ON CONFLICT target of the upsert
+            models.UniqueConstraint(fields=['user', 'facet', 'value'], name='unique_facet_value'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_facet_display()} {self.value}: {self.count}"
+
+
+class UploadSession(models.Model):
+    """A resumable, chunked upload of one large original"""
+    STATUS_ACTIVE = 'active'
+    STATUS_FINALIZING = 'finalizing'
+    STATUS_COMPLETE = 'complete'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_ACTIVE, 'Receiving chunks'),
+        (STATUS_FINALIZING, 'Finalizing'),
+        (STATUS_COMPLETE, 'Complete'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    # UUID so session ids can't be guessed from the URL
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='upload_sessions'
+    )
+    project = models.ForeignKey(
+        Project,
+        on_delete=models.CASCADE,
+        related_name='upload_sessions'
+    )
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=50)
+    total_size = models.PositiveBigIntegerField(help_text="Expected file size in bytes")
+    received_bytes = models.PositiveBigIntegerField(default=0, help_text="Bytes persisted so far")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_ACTIVE)
+    photo = models.ForeignKey(
+        Photo,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+'
+    )
+
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['owner', 'status']),
+            models.Index(fields=['status', 'updated']),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.received_bytes}/{self.total_size})"
+
+    @property
+    def chunk_path(self):
+        # Chunks are appended to one file on local disk
+        return Path(settings.CHUNKED_UPLOAD_DIR) / f"{self.id}.part"
+
+    @property
+    def is_complete(self):
+        return self.received_bytes >= self.total_size
@@ -0,0 +1,185 @@
+"""
+Sparse photo ordering within a project.
+
+order_index values are spaced PHOTO_ORDER_GAP apart, so moving a photo between two
+neighbours gives it a rank between theirs and writes that one row. When two
+neighbours have no room left the project is re-spaced on the spot. When a move leaves
+a gap narrower than PHOTO_ORDER_MIN_GAP, a projects.rebalance_order job re-spaces the
+project in the background first, so that rarely happens in a request. A full reorder
+(the drag & drop list endpoint) is one UPDATE ... FROM (VALUES ...) for the rows whose
+rank changes. New uploads go to the end, one gap apart (append_ranks).
+Ties are broken by id everywhere, as in Photo.Meta.ordering.
+
+Order writes for a project are serialized on its row lock, so a move never takes a
+midpoint of ranks that a rebalance is rewriting.
+"""
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Max
+
+from jobs.models import Job
+from jobs.queue import enqueue
+from .models import Project, Photo
+
+REBALANCE_JOB = 'projects.rebalance_order'
+
+# order_index is a PositiveIntegerField
+MAX_RANK = 2 ** 31 - 1
+
+
+class StaleOrder(ValueError):
+    """The neighbours given for a move are no longer next to each other in that order"""
+
+
+# Move a photo between two others (either may be None for the start/end of the project)
+# A missing neighbour is looked up, so "after the last loaded photo" works on a partial grid
+# Returns the photo's new order_index
+def move_photo(project_id, photo_id, after_id=None, before_id=None):
+    if photo_id in (after_id, before_id):
+        raise ValueError("A photo can't be moved next to itself.")
+
+    with transaction.atomic():
+        _lock_project(project_id)
+        photos = _project_photos(project_id)
+        requested = {pk for pk in (photo_id, after_id, before_id) if pk is not None}
+        ranks = dict(photos.filter(pk__in=requested).values_list('pk', 'order_index'))
+        if set(ranks) != requested:
+            raise Photo.DoesNotExist(f"Photos not in this project: {sorted(requested - set(ranks))}")
+        after = (ranks[after_id], after_id) if after_id is not None else None
+        before = (ranks[before_id], before_id) if before_id is not None else None
+
+        others = photos.exclude(pk=photo_id)
+        if before is None and after is not None:
+            before = _neighbour(others, after, following=True)
+        elif after is None and before is not None:
+            after = _neighbour(others, before, following=False)
+        if after is not None and before is not None and after >= before:
+            raise StaleOrder("The photos around the new position have moved; reload the page.")
+
+        rank = _rank_between(after and after[0], before and before[0])
+        if rank is None:
+            # No room between them: re-space the project, which opens a full gap everywhere
+            ranks = rebalance(project_id)
+            after = after and (ranks[after[1]], after[1])
+            before = before and (ranks[before[1]], before[1])
+            rank = _rank_between(after and after[0], before and before[0])
+
+        photos.filter(pk=photo_id).update(order_index=rank)
+
+        gaps = (rank - after[0] if after else None, before[0] - rank if before else None)
+        if any(gap is not None and gap < settings.PHOTO_ORDER_MIN_GAP for gap in gaps):
+            enqueue_rebalance(project_id)
+    return rank
+
+
+# Put the project's photos in this order (ids not listed keep their order, after the list)
+# One UPDATE, for the rows whose order_index changes; returns how many that was
+def write_photo_order(project_id, photo_ids):
+    with transaction.atomic():
+        _lock_project(project_id)
+        _, changed = _respace(project_id, photo_ids)
+    return changed
+
+
+# Re-space a project's photos PHOTO_ORDER_GAP apart in their current order
+# Returns {photo_id: order_index}
+def rebalance(project_id):
+    with transaction.atomic():
+        _lock_project(project_id)
+        ranks, _ = _respace(project_id, [])
+    return ranks
+
+
+# Number photo_ids, then the rest of the project in its current order, one gap apart
+# Returns ({photo_id: order_index}, rows changed)
+def _respace(project_id, photo_ids):
+    current = list(_project_photos(project_id).order_by('order_index', 'id').values_list('pk', 'order_index'))
+    old_ranks = dict(current)
+    listed = {pk: None for pk in photo_ids if pk in old_ranks}
+    order = list(listed) + [pk for pk, _ in current if pk not in listed]
+
+    gap = min(settings.PHOTO_ORDER_GAP, MAX_RANK // (len(order) + 1))
+    ranks = {pk: (position + 1) * gap for position, pk in enumerate(order)}
+    changes = [(pk, rank) for pk, rank in ranks.items() if old_ranks[pk] != rank]
+    _update_ranks(project_id, changes)
+    return ranks, len(changes)
+
+
+# order_index for `count` photos added after the project's last one, PHOTO_ORDER_GAP apart
+# Call in the transaction that inserts them: the project row stays locked until it commits
+def append_ranks(project_id, count):
+    with transaction.atomic():
+        _lock_project(project_id)
+        last = _project_photos(project_id).aggregate(last=Max('order_index'))['last'] or 0
+        if last + count * settings.PHOTO_ORDER_GAP > MAX_RANK:
+            # Near the top of the range: re-space, then use what room is left
+            last = max(rebalance(project_id).values(), default=0)
+        gap = max(1, min(settings.PHOTO_ORDER_GAP, (MAX_RANK - last) // (count + 1)))
+    return [last + gap * position for position in range(1, count + 1)]
+
+
+# Queue a background rebalance, unless one is already waiting for this project
+def enqueue_rebalance(project_id):
+    waiting = Job.objects.filter(
+        name=REBALANCE_JOB, status=Job.STATUS_QUEUED, payload__project_id=project_id
+    ).first()
+    return waiting or enqueue(REBALANCE_JOB, {'project_id': project_id})
+
+
+# A rank strictly between two others (None for an open end), or None if there is no room
+def _rank_between(low, high):
+    if low is None and high is None:
+        return settings.PHOTO_ORDER_GAP
+    if low is None:
+        # At the front: a full gap if there is one, else halfway down to zero
+        if high == 0:
+            return None
+        return high - settings.PHOTO_ORDER_GAP if high > settings.PHOTO_ORDER_GAP else high // 2
+    if high is None:
+        if low >= MAX_RANK:
+            return None
+        return min(low + settings.PHOTO_ORDER_GAP, low + (MAX_RANK - low + 1) // 2)
+    if high - low < 2:
+        return None
+    return (low + high) // 2
+
+
+# (order_index, id) of the photo right after/before a position, or None at the end
+def _neighbour(photos, position, following):
+    rank, pk = position
+    if following:
+        candidates = photos.filter(order_index__gte=rank).exclude(order_index=rank, pk__lte=pk)
+        ordering = ('order_index', 'id')
+    else:
+        candidates = photos.filter(order_index__lte=rank).exclude(order_index=rank, pk__gte=pk)
+        ordering = ('-order_index', '-id')
+    return candidates.order_by(*ordering).values_list('order_index', 'pk').first()
+
+
+# Set order_index from (photo_id, order_index) pairs with one UPDATE joined to a VALUES list
+# (split only where the backend caps the number of query parameters, i.e. SQLite)
+def _update_ranks(project_id, changes):
+    if not changes:
+        return
+    table = connection.ops.quote_name(Photo._meta.db_table)
+    max_params = connection.features.max_query_params
+    batch_size = (max_params - 1) // 2 if max_params else len(changes)
+    with connection.cursor() as cursor:
+        for start in range(0, len(changes), batch_size):
+            batch = changes[start:start + batch_size]
+            values = ', '.join(['(%s, %s)'] * len(batch))
+            cursor.execute(
+                f'WITH new_order (id, order_index) AS (VALUES {values}) '
+                f'UPDATE {table} SET order_index = new_order.order_index FROM new_order '
+                f'WHERE {table}.id = new_order.id AND {table}.project_id = %s',
+                [value for pair in batch for value in pair] + [project_id],
+            )
+
+
+def _lock_project(project_id):
+    list(Project.all_objects.select_for_update().filter(pk=project_id).values_list('pk', flat=True))
+
+
+def _project_photos(project_id):
+    return Photo.objects.filter(project_id=project_id)
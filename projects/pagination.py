@@ -0,0 +1,113 @@
+"""
+Keyset (cursor) pagination.
+
+Pages are read with `WHERE (ordering columns) past the cursor ... LIMIT n+1` instead
+of OFFSET, so page 50 costs the same index range scan as page 1 and no COUNT(*) is
+needed. The ordering must be unique (end it with the primary key) and should match
+an index. Cursors are the ordering values of the last row shown, as opaque URL-safe
+strings; a cursor that doesn't decode is treated as the first page.
+"""
+
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class KeysetPage:
+    """One page of rows, with cursors for the pages either side (None at the ends)"""
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    def __init__(self, queryset, ordering, per_page):
+        # ordering like ('-created', '-id'); the last field must make rows unique
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = per_page
+        self.fields = [name.lstrip('-') for name in self.ordering]
+
+    # The page after `after`, or before `before`, or the first page
+    def page(self, after=None, before=None):
+        after, before = self.decode(after), self.decode(before)
+        if before is not None:
+            # Walk backwards from the cursor, then put the rows back in display order
+            rows = list(self.queryset.filter(self._past(before, backwards=True))
+                        .order_by(*self._reversed())[:self.per_page + 1])
+            more = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            previous_cursor = self.encode(rows[0]) if more else None
+            next_cursor = self.encode(rows[-1]) if rows else None
+            return KeysetPage(rows, next_cursor, previous_cursor)
+
+        queryset = self.queryset.order_by(*self.ordering)
+        if after is not None:
+            queryset = queryset.filter(self._past(after))
+        rows = list(queryset[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        next_cursor = self.encode(rows[-1]) if more else None
+        previous_cursor = self.encode(rows[0]) if after is not None and rows else None
+        return KeysetPage(rows, next_cursor, previous_cursor)
+
+    # Opaque cursor for a row (a model instance or a values() dict)
+    def encode(self, row):
+        values = [
+            row[name] if isinstance(row, dict) else getattr(row, self._field(name).attname)
+            for name in self.fields
+        ]
+        # isoformat keeps microseconds, which the cursor needs to match the row exactly
+        values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]
+        return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode().rstrip('=')
+
+    # Ordering values from a cursor, or None if there is none or it doesn't decode
+    def decode(self, cursor):
+        if not cursor:
+            return None
+        try:
+            raw = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            if not isinstance(raw, list) or len(raw) != len(self.fields):
+                return None
+            return [self._field(name).to_python(value) for name, value in zip(self.fields, raw)]
+        except (ValueError, TypeError, ValidationError):
+            return None
+
+    # Rows strictly after the cursor in this ordering (before it when walking backwards):
+    # (a > x) OR (a = x AND b > y) OR ..., with < for descending columns
+    def _past(self, values, backwards=False):
+        condition = Q()
+        equal = Q()
+        for name, field, value in zip(self.ordering, self.fields, values):
+            descending = name.startswith('-')
+            lookup = 'lt' if descending != backwards else 'gt'
+            condition |= equal & Q(**{f'{field}__{lookup}': value})
+            equal &= Q(**{field: value})
+        return condition
+
+    def _reversed(self):
+        return [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+
+    def _field(self, name):
+        return self.queryset.model._meta.get_field(name)
@@ -0,0 +1,68 @@
+"""
+Photo and project search (PostgreSQL).
+
+Photo and Project each have a search_vector: a stored generated tsvector of the title
+and caption/description, built with SEARCH_CONFIG. The database computes it on every
+write, so it can't fall behind the text, and it is GIN indexed. Titles also have a
+pg_trgm GIN index.
+
+A search matches rows whose vector contains the query. Queries use websearch syntax:
+"quoted phrases", -excluded, or. It also matches rows whose title resembles the query
+as typed, which catches typos and half-typed words the stemmer can't. Postgres answers
+the OR of the two with a BitmapOr over both indexes. The search page and the admin both
+go through search_photos()/search_projects().
+"""
+
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery
+from django.db.models import Q
+from django.utils import timezone
+
+from .gallery import GALLERY_FIELDS
+
+# Search results are listed newest first, paged with projects.pagination.KeysetPaginator
+SEARCH_ORDERING = ('-uploaded_at', '-id')
+
+# Columns a result card needs (the gallery card's, plus where the photo lives)
+SEARCH_FIELDS = GALLERY_FIELDS + ('uploaded_at', 'project__id', 'project__title')
+
+
+def search_query(text):
+    return SearchQuery(text, search_type='websearch', config=settings.SEARCH_CONFIG)
+
+
+# Photos whose title/caption contain the words in `text`, or whose title resembles it
+def search_photos(photos, text):
+    text = text.strip()
+    if not text:
+        return photos
+    return photos.filter(Q(search_vector=search_query(text)) | Q(title__trigram_word_similar=text))
+
+
+# Projects whose title/description contain the words in `text`, or whose title resembles it
+def search_projects(projects, text):
+    text = text.strip()
+    if not text:
+        return projects
+    return projects.filter(Q(search_vector=search_query(text)) | Q(title__trigram_word_similar=text))
+
+
+# Apply a valid PhotoFilterForm's cleaned_data to a photo queryset
+# Dates are whole days in the current time zone, turned into bounds on the uploaded_at index
+def filter_photos(photos, data):
+    photos = search_photos(photos, data.get('search') or '')
+    if data.get('needs_attention'):
+        photos = photos.filter(needs_attention=True)
+    if data.get('is_featured'):
+        photos = photos.filter(is_featured=True)
+    if data.get('uploaded_after'):
+        photos = photos.filter(uploaded_at__gte=_start_of_day(data['uploaded_after']))
+    if data.get('uploaded_before'):
+        photos = photos.filter(uploaded_at__lt=_start_of_day(data['uploaded_before'] + timedelta(days=1)))
+    return photos
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
@@ -6,14 +6,26 @@ Django signals are hooks that get triggered when certain database operations occ
 This file ensures that when records are deleted or updated in the database, 
 the corresponding files in Cloudinary cloud storage are also cleaned up.
 
+Assets aren't destroyed inline: each one is written to the deletion outbox
+(media.outbox) in the same transaction, and a background job sends them to
+Cloudinary in batches after the commit.
+
 Without these signals, deleted photos would remain in Cloudinary forever,
 consuming storage space and potentially costing money.
 """
 
-from django.db.models.signals import post_delete, pre_save
+from django.core.files.uploadedfile import UploadedFile
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
+from media.outbox import queue_asset_deletion, queue_unused_asset_deletions
+from .counters import (
+    COUNTED_FIELDS, add_delta, adjust_counters, contribution, loaded_contribution, photo_contribution,
+)
+from .facets import (
+    FACET_FIELDS, add_facets, adjust_facets, loaded_facets, move_project_facets, photo_facets, saved_facets,
+)
 from .models import Project, Photo
-import cloudinary.uploader
+from .utils import compute_placeholder
 import logging
 
 # Set up logging to track what files are being deleted from Cloudinary
@@ -30,21 +42,13 @@ def delete_photo_from_cloudinary(sender, instance, **kwargs):
     """
     # Check if the photo instance actually has an image file
     if instance.image:
-        try:
-            # Get the unique identifier that Cloudinary uses for this file
-            # public_id is like a filename in Cloudinary (e.g., "photos/abc123")
-            public_id = instance.image.public_id
-            
-            if public_id:
-                # Tell Cloudinary to permanently delete this file
-                result = cloudinary.uploader.destroy(public_id)
-                # Log success for debugging/monitoring
-                logger.info(f"Deleted photo from Cloudinary: {public_id}, result: {result}")
-                
-        except Exception as e:
-            # If something goes wrong, log the error but don't crash the app
-            # The database deletion still succeeds even if Cloudinary cleanup fails
-            logger.error(f"Failed to delete photo from Cloudinary: {e}")
+        # Get the unique identifier that Cloudinary uses for this file
+        # public_id is like a filename in Cloudinary (e.g., "photos/abc123")
+        # Queued in this transaction; a rolled-back delete never removes the file.
+        # Deduplicated uploads share one asset, kept while any row still references it;
+        # in a bulk delete that is checked once for the whole batch (media.outbox)
+        public_id = instance.image.public_id
+        queue_unused_asset_deletions([(instance.content_hash, public_id)], source='projects.Photo')
 
 
 @receiver(post_delete, sender=Project)
@@ -55,80 +59,170 @@ def delete_project_cover_from_cloudinary(sender, instance, **kwargs):
     """
     # Check if the project has a cover photo
     if instance.cover_photo:
-        try:
-            # Same process as above - get the public_id and delete from Cloudinary
-            public_id = instance.cover_photo.public_id
-            
-            if public_id:
-                result = cloudinary.uploader.destroy(public_id)
-                logger.info(f"Deleted project cover from Cloudinary: {public_id}, result: {result}")
-                
-        except Exception as e:
-            logger.error(f"Failed to delete project cover from Cloudinary: {e}")
+        # Same process as above - queue the public_id for deletion from Cloudinary
+        queue_asset_deletion(instance.cover_photo.public_id, source='projects.Project')
 
 
 @receiver(pre_save, sender=Photo)
-def delete_old_photo_on_update(sender, instance, **kwargs):
+def remember_old_photo(sender, instance, update_fields=None, **kwargs):
+    """
+    Make sure the photo knows its stored image before the save overwrites it.
+
+    Photos loaded from the database already remember it (media.tracking), so this
+    is free for normal edits; only a Photo built by hand with a pk costs a query.
+    """
+    if update_fields is None or 'image' in update_fields:
+        instance.load_missing_values('image', 'content_hash')
+
+
+@receiver(post_save, sender=Photo)
+def delete_old_photo_on_update(sender, instance, created, update_fields=None, **kwargs):
     """
-    If the image field is changing, delete the old image from Cloudinary
+    If the image field changed, delete the old image from Cloudinary
     
     This prevents orphaned files when users replace a photo with a new one.
-    Uses pre_save (before saving) so you can still access the old data.
-    """
-    # Check if this is a new photo being created (no primary key yet)
-    if not instance.pk:
-        return  # New instance, nothing to delete
-        
-    try:
-        # Get the current version of this photo from the database
-        old_instance = Photo.objects.get(pk=instance.pk)
-        
-        # Check if the image field is actually changing
-        # (old_instance.image != instance.image means user uploaded a new file)
-        if old_instance.image and old_instance.image != instance.image:
-            public_id = old_instance.image.public_id
-            
-            if public_id:
-                # Delete the old image since it's being replaced
-                cloudinary.uploader.destroy(public_id)
-                logger.info(f"Deleted old photo from Cloudinary: {public_id}")
-                
-    except Photo.DoesNotExist:
-        # This shouldn't happen, but if it does, just continue
-        pass
-    except Exception as e:
-        logger.error(f"Failed to delete old photo from Cloudinary: {e}")
+    The old value is the one remembered when the photo was loaded, so there is no
+    extra SELECT, and the old asset is queued only after the new one is written.
+    """
+    # New photos and saves that didn't write the image have nothing to delete
+    if created or (update_fields is not None and 'image' not in update_fields):
+        return
+
+    old_image = instance.loaded_value('image')
+    if old_image and instance.field_changed('image'):
+        # Delete the old image since it's being replaced, unless other photos still use it
+        queue_unused_asset_deletions(
+            [(instance.loaded_value('content_hash'), old_image.public_id)], source='projects.Photo'
+        )
+
+
+@receiver(pre_save, sender=Photo)
+def remember_counted_fields(sender, instance, update_fields=None, **kwargs):
+    """Same for the fields the project counters depend on (projects.counters)."""
+    if update_fields is None or set(update_fields) & set(COUNTED_FIELDS):
+        instance.load_missing_values(*COUNTED_FIELDS)
+
+
+@receiver(post_save, sender=Photo)
+def update_project_counters(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Move the photo's share of the counters from what it was to what it is now,
+    on the project it was in and the one it is in (the same one unless it moved).
+    """
+    if update_fields is not None and not set(update_fields) & set(COUNTED_FIELDS):
+        return
+    if created or not instance.has_loaded_value('project'):
+        adjust_counters({instance.project_id: photo_contribution(instance)})
+        return
+
+    # Fields left out of update_fields kept their stored (loaded) values
+    saved = {
+        name: getattr(instance, Photo._meta.get_field(name).attname)
+        if update_fields is None or name in update_fields else instance.loaded_value(name)
+        for name in COUNTED_FIELDS
+    }
+    deltas = {}
+    add_delta(deltas, instance.loaded_value('project'), loaded_contribution(instance), sign=-1)
+    add_delta(deltas, saved.pop('project'), contribution(**saved))
+    adjust_counters(deltas)
+
+
+@receiver(pre_delete, sender=Photo)
+def load_fields_for_delete(sender, instance, **kwargs):
+    """
+    A photo loaded with only() can't fetch deferred fields once its row is gone, so load
+    what the post_delete receivers read (its asset, counted and faceted fields) while it exists.
+    """
+    needed = {
+        Photo._meta.get_field(name).attname for name in ('image', 'content_hash') + COUNTED_FIELDS + FACET_FIELDS
+    }
+    deferred = instance.get_deferred_fields() & needed
+    if deferred:
+        instance.refresh_from_db(fields=deferred)
+
+
+@receiver(post_delete, sender=Photo)
+def remove_from_project_counters(sender, instance, **kwargs):
+    """Queryset deletes collect these into one UPDATE per project (PhotoQuerySet.delete)."""
+    adjust_counters({instance.project_id: tuple(-value for value in photo_contribution(instance))})
+
+
+@receiver(pre_save, sender=Photo)
+def remember_facet_fields(sender, instance, update_fields=None, **kwargs):
+    """Same for the EXIF fields the owner's facet counts depend on (projects.facets)."""
+    if update_fields is None or set(update_fields) & set(FACET_FIELDS):
+        instance.load_missing_values(*FACET_FIELDS)
+
+
+@receiver(post_save, sender=Photo)
+def update_facet_counts(sender, instance, created, update_fields=None, **kwargs):
+    """
+    Swap the photo's old facet values for its new ones. For an ordinary edit they are
+    the same, the changes cancel out and nothing is written.
+    """
+    if update_fields is not None and not set(update_fields) & set(FACET_FIELDS):
+        return
+    deltas = {}
+    if not created and instance.has_loaded_value('project'):
+        add_facets(deltas, instance.loaded_value('project'), loaded_facets(instance), sign=-1)
+        project_id = instance.project_id if update_fields is None or 'project' in update_fields \
+            else instance.loaded_value('project')
+        add_facets(deltas, project_id, saved_facets(instance, update_fields))
+    else:
+        add_facets(deltas, instance.project_id, photo_facets(instance))
+    adjust_facets(deltas)
+
+
+@receiver(post_delete, sender=Photo)
+def remove_from_facet_counts(sender, instance, **kwargs):
+    """Collected like the counters: one upsert for a queryset delete."""
+    adjust_facets(add_facets({}, instance.project_id, photo_facets(instance), sign=-1))
 
 
 @receiver(pre_save, sender=Project)
-def delete_old_cover_on_update(sender, instance, **kwargs):
+def remember_old_cover(sender, instance, update_fields=None, **kwargs):
+    """Same as remember_old_photo, for project cover photos."""
+    if update_fields is None or 'cover_photo' in update_fields:
+        instance.load_missing_values('cover_photo')
+
+
+@receiver(post_save, sender=Project)
+def move_facets_to_new_owner(sender, instance, created, update_fields=None, **kwargs):
+    """A project given to another user takes its photos' facet counts along."""
+    if created or (update_fields is not None and 'owner' not in update_fields):
+        return
+    if instance.field_changed('owner'):
+        move_project_facets(instance.pk, instance.loaded_value('owner'), instance.owner_id)
+
+
+@receiver(pre_save, sender=Project)
+def set_cover_placeholder(sender, instance, update_fields=None, **kwargs):
     """
-    If the cover_photo field is changing, delete the old cover from Cloudinary
+    Compute the placeholder of a newly uploaded cover before CloudinaryField sends it,
+    and drop it when the cover is removed or swapped for an existing asset.
+    """
+    if update_fields is not None and 'cover_photo' not in update_fields:
+        return
+    if isinstance(instance.cover_photo, UploadedFile):
+        instance.placeholder, instance.dominant_color = compute_placeholder(instance.cover_photo)
+    elif not instance.cover_photo or instance.field_changed('cover_photo'):
+        instance.placeholder = instance.dominant_color = ''
+
+
+@receiver(post_save, sender=Project)
+def delete_old_cover_on_update(sender, instance, created, update_fields=None, **kwargs):
+    """
+    If the cover_photo field changed, delete the old cover from Cloudinary
     
     Same logic as delete_old_photo_on_update but for project cover photos.
     """
-    # Check if this is a new project being created
-    if not instance.pk:
-        return  # New project, no old cover to delete
-        
-    try:
-        # Get the current version of this project from the database
-        old_instance = Project.objects.get(pk=instance.pk)
-        
-        # Check if the cover photo is actually changing
-        if old_instance.cover_photo and old_instance.cover_photo != instance.cover_photo:
-            public_id = old_instance.cover_photo.public_id
-            
-            if public_id:
-                # Delete the old cover photo since it's being replaced
-                cloudinary.uploader.destroy(public_id)
-                logger.info(f"Deleted old project cover from Cloudinary: {public_id}")
-                
-    except Project.DoesNotExist:
-        # This shouldn't happen, but safety first
-        pass
-    except Exception as e:
-        logger.error(f"Failed to delete old project cover from Cloudinary: {e}")
+    if created or (update_fields is not None and 'cover_photo' not in update_fields):
+        return
+
+    old_cover = instance.loaded_value('cover_photo')
+    if old_cover and instance.field_changed('cover_photo'):
+        # Delete the old cover photo since it's being replaced
+        queue_asset_deletion(old_cover.public_id, source='projects.Project')
 
 
 """
@@ -136,10 +230,14 @@ IMPORTANT NOTES:
 
 1. These signals are automatically triggered by Django - you don't call them directly
 2. They run every time the specified database operations occur
-3. If Cloudinary deletion fails, the app continues working (graceful degradation)
+3. Cloudinary is never called from a signal: deletions go through the outbox, so a
+   failed or slow destroy can't break or stall the request (failures are retried,
+   then marked dead in the AssetDeletion admin)
 4. The signals must be registered when Django starts (handled in apps.py)
 5. post_delete runs AFTER the database record is deleted
-6. pre_save runs BEFORE the database record is saved/updated
-7. Always use try/except blocks to prevent signal failures from breaking the app
+6. pre_save runs BEFORE the database record is saved/updated; the replace handlers
+   use post_save with the values remembered at load time (media.tracking)
+7. Don't swallow database errors from the outbox: the write is part of the caller's
+   transaction, and a caught failure would leave that transaction unusable
 
 """
\ No newline at end of file
@@ -0,0 +1,141 @@
+"""
+Near-duplicate lookup over perceptual hashes.
+
+A multi-index hash table indexes 64-bit dHashes by Hamming distance, so finding
+every hash within a few bits of a query only probes a handful of buckets instead
+of comparing against every photo. similar_photos() runs the same probes in the
+database, against the indexed 16-bit pieces of the stored hash (Photo.hash_chunk_*);
+find_near_duplicate_groups() builds a HashIndex over the photos it is given.
+"""
+
+from django.conf import settings
+from django.db.models import Q
+
+from .models import Photo, Project
+
+# Widest per-piece radius probed through the hash_chunk indexes (697 values per piece).
+# Past that the probes match a large share of a library anyway, so the scope is scanned
+MAX_INDEXED_RADIUS = 3
+
+
+def hamming_distance(a, b):
+    # Hashes are stored signed; mask back to 64 unsigned bits before comparing
+    return ((a ^ b) & 0xFFFFFFFFFFFFFFFF).bit_count()
+
+
+# Bit masks with up to `radius` bits set within one chunk, cached per (bits, radius)
+_FLIP_MASKS = {}
+
+
+def _flip_masks(bits, radius):
+    key = (bits, radius)
+    if key not in _FLIP_MASKS:
+        masks = [0]
+        for _ in range(radius):
+            masks = list({m | (1 << b) for m in masks for b in range(bits)} | set(masks))
+        _FLIP_MASKS[key] = masks
+    return _FLIP_MASKS[key]
+
+
+class HashIndex:
+    """Multi-index hashing over 64-bit hashes
+
+    Each hash is split into CHUNKS 16-bit pieces, each with its own dict. If two
+    hashes are within d bits, at least one piece differs by at most d // CHUNKS bits
+    (pigeonhole), so a search only probes those nearby buckets and verifies the
+    few candidates it finds instead of scanning every hash.
+    """
+    CHUNKS = 4
+    CHUNK_BITS = 16
+
+    def __init__(self, items=()):
+        self.tables = [{} for _ in range(self.CHUNKS)]
+        self.size = 0
+        for hash_value, value in items:
+            self.add(hash_value, value)
+
+    # Lowest piece first, as in Photo.hash_chunk_0..3
+    @classmethod
+    def chunks(cls, hash_value):
+        unsigned = hash_value & 0xFFFFFFFFFFFFFFFF
+        mask = (1 << cls.CHUNK_BITS) - 1
+        return [(unsigned >> (i * cls.CHUNK_BITS)) & mask for i in range(cls.CHUNKS)]
+
+    def add(self, hash_value, value):
+        self.size += 1
+        entry = (hash_value, value)
+        for table, chunk in zip(self.tables, self.chunks(hash_value)):
+            table.setdefault(chunk, []).append(entry)
+
+    def search(self, hash_value, max_distance):
+        # Returns [(distance, value), ...] nearest first
+        masks = _flip_masks(self.CHUNK_BITS, max_distance // self.CHUNKS)
+        seen = set()
+        matches = []
+        for table, chunk in zip(self.tables, self.chunks(hash_value)):
+            for mask in masks:
+                for entry in table.get(chunk ^ mask, ()):
+                    if id(entry) in seen:
+                        continue
+                    seen.add(id(entry))
+                    distance = hamming_distance(hash_value, entry[0])
+                    if distance <= max_distance:
+                        matches.append((distance, entry[1]))
+
+        matches.sort(key=lambda match: match[0])
+        return matches
+
+
+# Photos in the project (or across the owner's library) that look like this one
+# Returns [(distance, photo), ...] nearest first, excluding the photo itself
+def similar_photos(photo, scope='project', max_distance=None):
+    if photo.perceptual_hash is None:
+        return []
+    max_distance = settings.SIMILAR_PHOTO_MAX_DISTANCE if max_distance is None else max_distance
+
+    # project_id = ANY(...) rather than a join, so each probe is a (project, hash_chunk) index lookup
+    if scope == 'library':
+        project_ids = list(Project.objects.filter(owner_id=photo.project.owner_id).values_list('id', flat=True))
+    else:
+        project_ids = [photo.project_id]
+    candidates = Photo.objects.order_by().filter(project_id__in=project_ids).exclude(perceptual_hash=None)
+
+    radius = max_distance // HashIndex.CHUNKS
+    if radius <= MAX_INDEXED_RADIUS:
+        masks = _flip_masks(HashIndex.CHUNK_BITS, radius)
+        probes = Q()
+        for position, chunk in enumerate(HashIndex.chunks(photo.perceptual_hash)):
+            probes |= Q(**{f'hash_chunk_{position}__in': [chunk ^ mask for mask in masks]})
+        candidates = candidates.filter(probes)
+
+    matches = []
+    for hash_value, pk in candidates.exclude(pk=photo.pk).values_list('perceptual_hash', 'id'):
+        distance = hamming_distance(photo.perceptual_hash, hash_value)
+        if distance <= max_distance:
+            matches.append((distance, pk))
+    matches.sort()
+
+    photos = Photo.objects.select_related('project').in_bulk([pk for _, pk in matches])
+    return [(d, photos[pk]) for d, pk in matches if pk in photos]
+
+
+# Group photos into clusters of near-duplicates (only clusters of 2+ are returned)
+# Each cluster keeps the input order, so the first photo is the one to keep
+def find_near_duplicate_groups(photos, max_distance=None):
+    max_distance = settings.SIMILAR_PHOTO_MAX_DISTANCE if max_distance is None else max_distance
+    hashed = [p for p in photos if p.perceptual_hash is not None]
+    position = {p.pk: i for i, p in enumerate(hashed)}
+    index = HashIndex((p.perceptual_hash, p) for p in hashed)
+
+    groups = []
+    seen = set()
+    for photo in hashed:
+        if photo.pk in seen:
+            continue
+        group = [match for _, match in index.search(photo.perceptual_hash, max_distance)
+                 if match.pk not in seen]
+        if len(group) > 1:
+            group.sort(key=lambda p: position[p.pk])
+            groups.append(group)
+            seen.update(p.pk for p in group)
+    return groups
@@ -0,0 +1,80 @@
+"""
+Background jobs for the projects app (run by manage.py run_workers).
+"""
+
+import logging
+import os
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+
+from jobs.queue import enqueue, job_handler
+from media.backends import get_backend
+from .models import Photo
+from .ordering import REBALANCE_JOB, rebalance
+from .tombstones import REAP_JOB, reap_chunk, remaining
+from .utils import ingest_photo
+
+logger = logging.getLogger(__name__)
+
+
+# Read EXIF (typed columns + whitelisted raw tags), dimensions, MIME type, perceptual hash and placeholder for a freshly uploaded photo
+# From the uploaded bytes the request kept (payload['path']), or the stored asset if this worker can't see them
+@job_handler('projects.process_photo_metadata')
+def process_photo_metadata(payload):
+    path = payload.get('path')
+    photo = Photo.objects.filter(pk=payload['photo_id']).only('id', 'image', 'mime_type', 'width', 'height').first()
+    if photo is None or not photo.image:
+        _discard(path)
+        return {'skipped': 'photo no longer exists'}
+
+    # Network errors raise and the job is retried with backoff
+    image_file = open(path, 'rb') if path and os.path.exists(path) else get_backend().open(photo.image)
+    try:
+        result = ingest_photo(image_file)
+    except ValidationError as e:
+        # A broken file won't get better on retry; flag it for the photographer instead
+        Photo.objects.filter(pk=photo.pk).update(needs_attention=True)
+        logger.warning(f"Photo {photo.pk} could not be read: {e}")
+        _discard(path)
+        return {'error': ' '.join(e.messages)}
+    finally:
+        image_file.close()
+
+    # An optimized copy's size, type and dimensions were set at upload; the bytes read here are the original's
+    width, height = (photo.width, photo.height) if photo.width and photo.height else (result.width, result.height)
+    Photo.objects.filter(pk=photo.pk).update(
+        width=width,
+        height=height,
+        mime_type=photo.mime_type or result.mime_type,
+        exif_data=result.exif_data,
+        perceptual_hash=result.perceptual_hash,
+        placeholder=result.placeholder,
+        dominant_color=result.dominant_color,
+        **(result.exif_fields or {}),
+    )
+    _discard(path)
+    return {'width': width, 'height': height}
+
+
+def _discard(path):
+    if path:
+        Path(path).unlink(missing_ok=True)
+
+
+# Delete the next chunk of a deleted project or account, then queue the chunk after it
+# Each chunk commits on its own, so a crashed worker's job just picks up what is left
+@job_handler(REAP_JOB)
+def reap_tombstone(payload):
+    target = {key: payload[key] for key in ('project_id', 'user_id') if key in payload}
+    deleted, finished = reap_chunk(**target)
+    progress = {**payload, 'deleted': payload.get('deleted', 0) + deleted}
+    if not finished:
+        enqueue(REAP_JOB, progress, batch_id=payload.get('batch_id'))
+    return {'deleted': progress['deleted'], 'remaining': remaining(**target), 'finished': finished}
+
+
+# Re-space a project's photo order after moves have narrowed its gaps
+@job_handler(REBALANCE_JOB)
+def rebalance_order(payload):
+    return {'photos': len(rebalance(payload['project_id']))}
@@ -1,4 +1,284 @@
-from django.test import TestCase
+import hashlib
+import io
+import json
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from cloudinary import CloudinaryResource
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
 
+from media.backends import LocalBackend
+from media.models import AssetDeletion
+from . import uploads
+from .models import Photo, Project, UploadSession
+
+
+def _resource(public_id):
+    return CloudinaryResource(public_id, format='jpg', type='upload', resource_type='image')
+
+
+# The replace handlers read the values remembered at load time (media.tracking), not the row
+class TrackedFieldQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('tracking')
+        cls.project = Project.objects.create(owner=cls.user, title='Tracking', cover_photo=_resource('tests/cover'))
+        cls.photo = Photo.objects.create(project=cls.project, image=_resource('tests/photo'), content_hash='a' * 64)
+
+    def queued(self):
+        return set(AssetDeletion.objects.values_list('public_id', flat=True))
+
+    def test_photo_edit_is_one_update(self):
+        photo = Photo.objects.get(pk=self.photo.pk)
+        photo.title = 'Renamed'
+        with self.assertNumQueries(1):
+            photo.save()
+        self.assertEqual(self.queued(), set())
+
+    def test_photo_edit_with_update_fields_is_one_update(self):
+        photo = Photo.objects.get(pk=self.photo.pk)
+        photo.caption = 'At the beach'
+        with self.assertNumQueries(1):
+            photo.save(update_fields=['caption'])
+
+    def test_photo_image_replace_queues_old_asset(self):
+        photo = Photo.objects.get(pk=self.photo.pk)
+        photo.image = _resource('tests/photo_v2')
+        # UPDATE, the shared-asset check, the outbox INSERT and the drain job (lookup + INSERT)
+        with self.assertNumQueries(5):
+            photo.save()
+        self.assertEqual(self.queued(), {'tests/photo'})
+
+    def test_photo_image_kept_by_another_photo_is_not_queued(self):
+        Photo.objects.create(project=self.project, image=_resource('tests/photo'), content_hash='a' * 64)
+        photo = Photo.objects.get(pk=self.photo.pk)
+        photo.image = _resource('tests/photo_v2')
+        with self.assertNumQueries(2):
+            photo.save()
+        self.assertEqual(self.queued(), set())
+
+    def test_photo_built_with_pk_loads_image_once(self):
+        photo = Photo(pk=self.photo.pk, project=self.project, image=_resource('tests/photo_v2'))
+        # The one SELECT the snapshot lacks, then the same writes as a replace
+        with self.assertNumQueries(6):
+            photo.save(update_fields=['image'])
+        self.assertEqual(self.queued(), {'tests/photo'})
+
+    def test_project_edit_is_one_update(self):
+        project = Project.objects.get(pk=self.project.pk)
+        project.title = 'Renamed'
+        with self.assertNumQueries(1):
+            project.save()
+        self.assertEqual(self.queued(), set())
+
+    def test_project_cover_change_queues_old_cover(self):
+        project = Project.objects.get(pk=self.project.pk)
+        project.cover_photo = _resource('tests/cover_v2')
+        # UPDATE, the outbox INSERT and the drain job
+        with self.assertNumQueries(4):
+            project.save()
+        self.assertEqual(self.queued(), {'tests/cover'})
+
+    def test_project_cover_removed_queues_old_cover(self):
+        project = Project.objects.get(pk=self.project.pk)
+        project.cover_photo = None
+        with self.assertNumQueries(4):
+            project.save(update_fields=['cover_photo', 'placeholder', 'dominant_color'])
+        self.assertEqual(self.queued(), {'tests/cover'})
+
+
+# The chunked upload protocol end to end, storing into LocalBackend under a temp directory
+class ChunkedUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('chunked')
+        cls.project = Project.objects.create(owner=cls.user, title='Chunked')
+        buffer = io.BytesIO()
+        Image.effect_noise((320, 240), 64).convert('RGB').save(buffer, 'JPEG', quality=90)
+        cls.image_bytes = buffer.getvalue()
+
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        self.root = Path(workdir.name)
+        settings = override_settings(
+            CHUNKED_UPLOAD_DIR=str(self.root / 'uploads'),
+            PHOTO_METADATA_STAGING_DIR=str(self.root / 'metadata'),
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        backend = mock.patch('media.backends._backend', LocalBackend(root=self.root / 'media'))
+        backend.start()
+        self.addCleanup(backend.stop)
+        self.client.force_login(self.user)
+
+    def start(self, size=None):
+        response = self.client.post(
+            reverse('projects:upload_session_create', args=[self.project.id]),
+            json.dumps({'filename': 'large.jpg', 'size': size or len(self.image_bytes), 'content_type': 'image/jpeg'}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.json()['upload_id']
+
+    def put(self, upload_id, offset, data):
+        return self.client.put(
+            reverse('projects:upload_session_detail', args=[upload_id]), data,
+            content_type='application/octet-stream', headers={'Upload-Offset': str(offset)},
+        )
+
+    def status(self, upload_id):
+        return self.client.get(reverse('projects:upload_session_detail', args=[upload_id])).json()
+
+    def finalize(self, upload_id):
+        return self.client.post(reverse('projects:upload_session_finalize', args=[upload_id]))
+
+    def send_all(self, upload_id, chunk_size):
+        for offset in range(0, len(self.image_bytes), chunk_size):
+            response = self.put(upload_id, offset, self.image_bytes[offset:offset + chunk_size])
+            self.assertEqual(response.status_code, 200)
+
+    def test_init_chunks_status_finalize(self):
+        upload_id = self.start()
+        self.assertEqual(self.status(upload_id)['offset'], 0)
+
+        half = len(self.image_bytes) // 2
+        self.assertEqual(self.put(upload_id, 0, self.image_bytes[:half]).json()['offset'], half)
+        self.assertEqual(self.status(upload_id)['offset'], half)
+        self.assertEqual(self.put(upload_id, half, self.image_bytes[half:]).status_code, 200)
+
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_success'], 1)
+        session = UploadSession.objects.get(id=upload_id)
+        self.assertEqual(session.status, UploadSession.STATUS_COMPLETE)
+        self.assertEqual(session.photo.project, self.project)
+        self.assertFalse(session.chunk_path.exists())
+
+    def test_multi_chunk_file_matches_original(self):
+        upload_id = self.start()
+        self.send_all(upload_id, 4096)
+        self.assertEqual(self.finalize(upload_id).status_code, 200)
+
+        photo = UploadSession.objects.get(id=upload_id).photo
+        stored = LocalBackend(root=self.root / 'media').original_path(photo.image.public_id)
+        self.assertEqual(Path(stored).read_bytes(), self.image_bytes)
+        # Each chunk's file was merged into the part file and removed
+        self.assertEqual(list((self.root / 'uploads').glob('*.chunk')), [])
+
+    def test_chunk_at_wrong_offset_is_rejected(self):
+        upload_id = self.start()
+        self.put(upload_id, 0, self.image_bytes[:1000])
+
+        # A retry of the first chunk, and one that skips ahead, both get where to resume
+        for offset in (0, 2000):
+            response = self.put(upload_id, offset, self.image_bytes[offset:offset + 1000])
+            self.assertEqual(response.status_code, 409)
+            self.assertEqual(response.json()['offset'], 1000)
+        self.assertEqual(UploadSession.objects.get(id=upload_id).chunk_path.stat().st_size, 1000)
+
+    def test_resume_after_short_chunk(self):
+        upload_id = self.start()
+        # The connection dropped after 700 of the 1000 bytes the client meant to send
+        self.put(upload_id, 0, self.image_bytes[:700])
+        offset = self.status(upload_id)['offset']
+        self.assertEqual(offset, 700)
+        self.put(upload_id, offset, self.image_bytes[offset:])
+        self.assertEqual(self.finalize(upload_id).status_code, 200)
+
+    def test_finalize_before_all_chunks_is_rejected(self):
+        upload_id = self.start()
+        self.put(upload_id, 0, self.image_bytes[:1000])
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(UploadSession.objects.get(id=upload_id).status, UploadSession.STATUS_ACTIVE)
+
+    def test_second_finalize_returns_the_same_photo(self):
+        upload_id = self.start()
+        self.send_all(upload_id, 8192)
+        first = self.finalize(upload_id).json()
+        second = self.finalize(upload_id)
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.json()['successful_uploads'][0]['id'], first['successful_uploads'][0]['id'])
+        self.assertEqual(Photo.objects.filter(project=self.project).count(), 1)
+        # And the finished session takes no more chunks
+        self.assertEqual(self.put(upload_id, len(self.image_bytes), b'x').status_code, 409)
+
+    def test_finalize_while_another_request_finalizes_is_rejected(self):
+        upload_id = self.start()
+        self.send_all(upload_id, 8192)
+        UploadSession.objects.filter(id=upload_id).update(status=UploadSession.STATUS_FINALIZING)
+        response = self.finalize(upload_id)
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Photo.objects.filter(project=self.project).exists())
+
+    def test_failed_finalize_reopens_the_session(self):
+        upload_id = self.start()
+        self.send_all(upload_id, 8192)
+        with mock.patch('projects.uploads.upload_to_storage', side_effect=ConnectionError('storage down')):
+            self.assertEqual(self.finalize(upload_id).status_code, 400)
+
+        session = UploadSession.objects.get(id=upload_id)
+        self.assertEqual(session.status, UploadSession.STATUS_ACTIVE)
+        self.assertTrue(session.chunk_path.exists())
+        self.assertEqual(self.finalize(upload_id).status_code, 200)
+
+
+# An upload reusing an existing asset, raced by a delete of the photo it was found on
+class DeduplicatedUploadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('dedup')
+        cls.project = Project.objects.create(owner=cls.user, title='Dedup')
+        buffer = io.BytesIO()
+        Image.effect_noise((64, 48), 64).convert('RGB').save(buffer, 'JPEG')
+        cls.image_bytes = buffer.getvalue()
+        cls.content_hash = hashlib.sha256(cls.image_bytes).hexdigest()
+
+    def setUp(self):
+        workdir = tempfile.TemporaryDirectory()
+        self.addCleanup(workdir.cleanup)
+        settings = override_settings(PHOTO_METADATA_STAGING_DIR=workdir.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.original = Photo.objects.create(
+            project=self.project, image=_resource('tests/shared'), content_hash=self.content_hash,
+        )
+
+    def stage(self):
+        staged = uploads.stage_photos([SimpleUploadedFile('again.jpg', self.image_bytes, 'image/jpeg')], self.project)
+        self.assertTrue(staged[0].reused)
+        return staged
+
+    def test_reuse_takes_back_a_queued_deletion(self):
+        staged = self.stage()
+        # The only photo with the asset is deleted before the upload commits
+        self.original.delete()
+        self.assertTrue(AssetDeletion.objects.filter(public_id='tests/shared').exists())
+
+        uploads.commit_staged(staged, self.project)
+        self.assertEqual(staged[0].photo.image.public_id, 'tests/shared')
+        self.assertFalse(AssetDeletion.objects.filter(public_id='tests/shared').exists())
+
+    def test_reuse_of_a_destroyed_asset_fails_the_file(self):
+        staged = self.stage()
+        self.original.delete()
+        # ... and the drainer already sent it
+        AssetDeletion.objects.filter(public_id='tests/shared').delete()
+
+        uploads.commit_staged(staged, self.project)
+        self.assertIsNone(staged[0].photo)
+        self.assertIn('again.jpg', staged[0].error)
+        self.assertFalse(Photo.objects.filter(content_hash=self.content_hash).exists())
+
+    def test_reuse_with_the_asset_still_held_writes_the_photo(self):
+        staged = self.stage()
+        uploads.commit_staged(staged, self.project)
+        self.assertEqual(Photo.objects.filter(content_hash=self.content_hash).count(), 2)
+        self.assertFalse(AssetDeletion.objects.exists())
@@ -0,0 +1,97 @@
+"""
+Soft deletion for projects and accounts.
+
+Deleting a project or an account only sets deleted_at (a tombstone) on it and on
+everything under it, which hides it from every default manager at once, and queues
+a projects.reap_tombstone job. The reaper deletes photos in chunks of
+TOMBSTONE_REAP_CHUNK_SIZE, one transaction per chunk with assets going to the
+deletion outbox, then the projects and finally the user. Each chunk queues the next
+as a new job in the same batch, so progress can be polled like an upload batch and a
+crash simply resumes with what is left.
+"""
+
+import logging
+import uuid
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.utils import timezone
+
+from jobs.queue import enqueue
+from media.outbox import collect_asset_deletions
+from .facets import adjust_facets, facet_totals
+from .models import FacetCount, Project, Photo
+
+logger = logging.getLogger(__name__)
+
+REAP_JOB = 'projects.reap_tombstone'
+
+
+# Hide a project and its photos now; the rows and assets are removed in the background
+def tombstone_project(project):
+    now = timezone.now()
+    with transaction.atomic():
+        # Its photos leave the owner's facet counts now, not when they are reaped
+        totals = facet_totals(Photo.all_objects.filter(project=project))
+        adjust_facets({key: -photos for key, photos in totals.items()})
+        Project.all_objects.filter(pk=project.pk).update(deleted_at=now)
+        Photo.all_objects.filter(project=project).update(deleted_at=now)
+        job = enqueue_reaper({'project_id': project.pk})
+    project.deleted_at = now
+    return job
+
+
+# Deactivate an account and hide everything it owns; reaped like a project
+def tombstone_user(user):
+    now = timezone.now()
+    with transaction.atomic():
+        get_user_model().objects.filter(pk=user.pk).update(deleted_at=now, is_active=False)
+        Project.all_objects.filter(owner=user).update(deleted_at=now)
+        Photo.all_objects.filter(project__owner=user).update(deleted_at=now)
+        FacetCount.objects.filter(user=user).delete()
+        # No job owner: the account's own jobs go when the user row is deleted
+        job = enqueue_reaper({'user_id': user.pk})
+    user.deleted_at = now
+    user.is_active = False
+    return job
+
+
+# First reaper job for a tombstone; every chunk after it joins the same batch
+def enqueue_reaper(payload):
+    batch_id = uuid.uuid4()
+    return enqueue(REAP_JOB, {**payload, 'batch_id': str(batch_id), 'deleted': 0}, batch_id=batch_id)
+
+
+# Delete one chunk of a tombstone; returns (deleted, finished)
+# Photos first (each queues its asset), then projects (covers), then the user (avatar)
+def reap_chunk(project_id=None, user_id=None, chunk_size=None):
+    chunk_size = chunk_size or settings.TOMBSTONE_REAP_CHUNK_SIZE
+    if project_id is not None:
+        photos = Photo.all_objects.filter(project_id=project_id)
+        projects = Project.all_objects.filter(pk=project_id, deleted_at__isnull=False)
+        users = None
+    else:
+        photos = Photo.all_objects.filter(project__owner_id=user_id)
+        projects = Project.all_objects.filter(owner_id=user_id)
+        users = get_user_model().objects.filter(pk=user_id, deleted_at__isnull=False)
+
+    for queryset in (photos, projects, users):
+        if queryset is None:
+            continue
+        ids = list(queryset.values_list('pk', flat=True)[:chunk_size])
+        if ids:
+            with transaction.atomic(), collect_asset_deletions():
+                queryset.model._base_manager.filter(pk__in=ids).delete()
+            return len(ids), False
+    return 0, True
+
+
+# How much of a tombstone is left, for progress reporting
+def remaining(project_id=None, user_id=None):
+    if project_id is not None:
+        return {'photos': Photo.all_objects.filter(project_id=project_id).count()}
+    return {
+        'photos': Photo.all_objects.filter(project__owner_id=user_id).count(),
+        'projects': Project.all_objects.filter(owner_id=user_id).count(),
+    }
@@ -0,0 +1,98 @@
+"""
+Optional pre-upload downscale and transcode stage.
+
+For projects in "optimized" mode, originals (including TIFF and, with pillow-heif
+installed, HEIC) are decoded, capped at PHOTO_OPTIMIZE_MAX_EDGE on the longest
+edge and re-encoded as high-quality JPEG or WebP with their EXIF kept, before
+they are sent to Cloudinary. Encoding runs in a process pool so a bulk upload
+uses every core. This module only imports Pillow at the top level, so pool
+workers start quickly with the spawn start method.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+import os
+import tempfile
+import threading
+
+from PIL import Image
+
+OUTPUT_FORMATS = {
+    'JPEG': ('.jpg', 'image/jpeg'),
+    'WEBP': ('.webp', 'image/webp'),
+}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Teach Pillow to open HEIC (pillow-heif, in requirements.txt); guarded so a Pillow-only
+# install still starts. Called once per process: by ProjectsConfig.ready() for the web and
+# worker processes, and as the initializer of the spawned pool workers, which skip Django setup
+def register_image_openers():
+    try:
+        from pillow_heif import register_heif_opener
+    except ImportError:
+        return
+    register_heif_opener()
+
+
+# Runs in a pool worker: decode, downscale, re-encode; returns None if nothing to gain
+def optimize_image(source_path, max_edge, output_format, quality):
+    with Image.open(source_path) as img:
+        source_format = img.format
+        # Let the JPEG decoder scale down while decoding when it can
+        img.draft('RGB', (max_edge, max_edge))
+        exif = img.info.get('exif') or _exif_bytes(img)
+        icc_profile = img.info.get('icc_profile')
+
+        if max(img.size) <= max_edge and source_format == output_format:
+            return None
+
+        img.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+
+        suffix, content_type = OUTPUT_FORMATS[output_format]
+        fd, output_path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'wb') as output:
+            options = {'quality': quality, 'exif': exif}
+            if icc_profile:
+                options['icc_profile'] = icc_profile
+            if output_format == 'JPEG':
+                options.update(optimize=True, progressive=True, subsampling=0)
+            else:
+                options.update(method=4)
+            img.save(output, output_format, **options)
+
+        return {
+            'path': output_path,
+            'size': os.path.getsize(output_path),
+            'width': img.width,
+            'height': img.height,
+            'content_type': content_type,
+            'extension': suffix,
+        }
+
+
+# TIFF (and HEIC) keep EXIF as tags rather than a raw block; sub-IFDs must be loaded to be written out
+def _exif_bytes(img):
+    exif = img.getexif()
+    for ifd in (0x8769, 0x8825):
+        exif.get_ifd(ifd)
+    return exif.tobytes()
+
+
+# Created under a lock: request and upload threads calling this first at the same time
+# would otherwise each start a pool, and one would be left running
+def get_pool(max_workers=None):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the web process has threads (and DB connections) open
+            _pool = ProcessPoolExecutor(
+                max_workers=max_workers or os.cpu_count(),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=register_image_openers,
+            )
+    return _pool
@@ -0,0 +1,76 @@
+"""
+Upload handlers for the photo endpoints.
+
+SpooledPhotoUploadHandler streams each file to a temp file on disk in fixed-size
+chunks, so a 20 x 50MB bulk upload never sits in a worker's RAM. While the bytes
+arrive it computes a SHA-256, counts the size and sniffs the MIME type from the
+magic bytes, and it stops reading a file as soon as it passes MAX_UPLOAD_SIZE.
+"""
+
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+
+from .utils import sniff_image_type, MAGIC_BYTES_LENGTH
+
+
+# A seekable temp file that also carries what was learned while receiving it
+class SpooledPhotoFile(TemporaryUploadedFile):
+    sha256 = None
+    sniffed_type = None
+
+
+class SpooledPhotoUploadHandler(FileUploadHandler):
+    chunk_size = settings.PHOTO_UPLOAD_CHUNK_SIZE
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        # Files dropped mid-stream are reported here so the view can list them as failures
+        if request is not None and not hasattr(request, 'rejected_uploads'):
+            request.rejected_uploads = []
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = SpooledPhotoFile(
+            self.file_name, self.content_type, 0, self.charset, self.content_type_extra
+        )
+        self.hasher = hashlib.sha256()
+        self.received = 0
+        self.head = b''
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.MAX_UPLOAD_SIZE:
+            self._reject(
+                f"File too large. Maximum size is {settings.MAX_UPLOAD_SIZE // (1024*1024)}MB."
+            )
+
+        if len(self.head) < MAGIC_BYTES_LENGTH:
+            self.head += raw_data[:MAGIC_BYTES_LENGTH - len(self.head)]
+        self.hasher.update(raw_data)
+        self.file.write(raw_data)
+        # Returning None keeps later handlers from buffering the same bytes
+        return None
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.sha256 = self.hasher.hexdigest()
+        self.file.sniffed_type = sniff_image_type(self.head)
+        return self.file
+
+    def _reject(self, error):
+        if self.request is not None:
+            self.request.rejected_uploads.append({
+                'filename': self.file_name,
+                'error': error,
+            })
+        # Django closes (and so deletes) the temp file and skips the rest of the stream
+        raise SkipFile()
+
+
+# Swap in the spooling handler; must run before anything reads request.POST or FILES
+def use_spooled_upload_handler(request):
+    request.upload_handlers = [SpooledPhotoUploadHandler(request)]
@@ -0,0 +1,469 @@
+"""
+Photo upload pipeline.
+
+Two phases: storage uploads for a batch run concurrently in a bounded thread pool
+with no database transaction open, then the Photo rows are written with a single
+bulk_create inside one short transaction. If that commit fails, the staged assets
+are destroyed again so nothing is left orphaned in Cloudinary.
+Projects in "optimized" mode downscale and re-encode each file in a process pool
+(projects.transcode) before it is uploaded.
+When PHOTO_METADATA_IN_BACKGROUND is on, the request only does cheap checks and
+queues a projects.process_photo_metadata job per photo in the same transaction; the
+uploaded bytes are kept in PHOTO_METADATA_STAGING_DIR for it (keep_for_metadata()).
+Files whose SHA-256 matches an asset the owner already has, stored under the same
+upload mode, reuse that asset instead of being sent again; the commit makes sure it
+wasn't deleted meanwhile (claim_reused_assets()).
+Key functions: stage_photos(), create_photos(), discard_staged(), upload_photos().
+aupload_photos() is the same pipeline for async views: uploads are awaited with a
+semaphore bounding how many are in flight.
+
+Also holds the disk side of resumable chunked uploads: receive_chunk() and
+append_chunk(), and finalize_upload_session(), which feeds the assembled file into
+upload_photos().
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from jobs.queue import enqueue_many
+from media.backends import get_backend
+from media.outbox import cancel_asset_deletions
+from .models import Photo, UploadSession
+from .ordering import append_ranks
+from .transcode import optimize_image, get_pool
+from .utils import (
+    process_uploaded_photo, handle_upload_error, compute_content_hash,
+    sniff_image_type, MAGIC_BYTES_LENGTH,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# One file's trip through the pipeline: either photo_data + resource, or an error
+class StagedUpload:
+    def __init__(self, uploaded_file):
+        self.uploaded_file = uploaded_file
+        self.filename = getattr(uploaded_file, 'name', None) or 'Unknown'
+        self.photo_data = None
+        self.resource = None
+        self.photo = None
+        self.error = None
+        # True when an identical asset already existed and no bytes were sent
+        self.reused = False
+        # Background metadata job, when PHOTO_METADATA_IN_BACKGROUND is on, and the local copy it reads
+        self.job_id = None
+        self.batch_id = None
+        self.metadata_path = None
+
+    @property
+    def ok(self):
+        return self.error is None and self.resource is not None
+
+
+# Upload a file to storage with the same options MediaField.pre_save would use
+def upload_to_storage(uploaded_file, field):
+    options = {'type': field.type, 'resource_type': field.resource_type}
+    options.update(field.options)
+    if hasattr(uploaded_file, 'seekable') and uploaded_file.seekable():
+        uploaded_file.seek(0)
+    return get_backend().upload(uploaded_file, **options)
+
+
+# Fields describing the stored asset rather than the uploaded file (they differ for optimized copies)
+STORED_ASSET_FIELDS = ('file_size', 'mime_type', 'width', 'height')
+
+
+# Map content hash -> (existing image, its STORED_ASSET_FIELDS) for the owner's photos
+# stored under upload_mode, in one query
+def find_existing_assets(uploaded_files, owner, upload_mode):
+    hashes = {compute_content_hash(f) for f in uploaded_files} - {''}
+    if not hashes:
+        return {}
+    existing = Photo.objects.filter(
+        project__owner=owner,
+        content_hash__in=hashes,
+        upload_mode=upload_mode,
+    ).values('content_hash', 'image', *STORED_ASSET_FIELDS)
+    return {
+        row['content_hash']: (row['image'], {name: row[name] for name in STORED_ASSET_FIELDS})
+        for row in existing if row['image']
+    }
+
+
+# Downscale/re-encode in the process pool for "optimized" projects
+# Returns (file to upload, photo_data updates); the original is returned when there's nothing to gain
+def optimize_for_upload(uploaded_file):
+    source_path, cleanup = _local_path(uploaded_file)
+    try:
+        optimized = get_pool(settings.PHOTO_OPTIMIZE_WORKERS).submit(
+            optimize_image,
+            source_path,
+            settings.PHOTO_OPTIMIZE_MAX_EDGE,
+            settings.PHOTO_OPTIMIZE_FORMAT,
+            settings.PHOTO_OPTIMIZE_QUALITY,
+        ).result()
+    finally:
+        if cleanup:
+            os.unlink(source_path)
+
+    if optimized is None:
+        return uploaded_file, {}
+
+    name = os.path.splitext(getattr(uploaded_file, 'name', None) or 'photo')[0] + optimized['extension']
+    optimized_file = UploadedFile(
+        file=open(optimized['path'], 'rb'),
+        name=name,
+        content_type=optimized['content_type'],
+        size=optimized['size'],
+    )
+    # The temp file goes away with the upload; its directory entry isn't needed after open()
+    os.unlink(optimized['path'])
+
+    return optimized_file, {
+        'file_size': optimized['size'],
+        'mime_type': optimized['content_type'],
+        'width': optimized['width'],
+        'height': optimized['height'],
+    }
+
+
+# Keep the uploaded bytes on local disk for the metadata job; returns the path
+# A spooled upload's temp file is hard-linked, anything else is copied
+def keep_for_metadata(uploaded_file):
+    directory = settings.PHOTO_METADATA_STAGING_DIR
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{uuid.uuid4().hex}.upload')
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        try:
+            os.link(uploaded_file.temporary_file_path(), path)
+            return path
+        except OSError:
+            pass
+    with open(path, 'wb') as kept:
+        uploaded_file.seek(0)
+        for chunk in uploaded_file.chunks():
+            kept.write(chunk)
+    uploaded_file.seek(0)
+    return path
+
+
+# Pool workers need a path; spooled uploads already have one, in-memory ones get a temp file
+def _local_path(uploaded_file):
+    if hasattr(uploaded_file, 'temporary_file_path'):
+        return uploaded_file.temporary_file_path(), False
+    fd, path = tempfile.mkstemp()
+    with os.fdopen(fd, 'wb') as temp_file:
+        uploaded_file.seek(0)
+        for chunk in uploaded_file.chunks():
+            temp_file.write(chunk)
+    uploaded_file.seek(0)
+    return path, True
+
+
+# Validate, read metadata and upload a single file (runs in a worker thread)
+# Files matching one of existing_assets reuse that asset instead of being uploaded again
+def stage_photo(uploaded_file, project, existing_assets=None):
+    staged = StagedUpload(uploaded_file)
+    try:
+        staged.photo_data = process_uploaded_photo(
+            uploaded_file, project, defer_metadata=settings.PHOTO_METADATA_IN_BACKGROUND
+        )
+        staged.photo_data['upload_mode'] = project.upload_mode
+        if settings.PHOTO_METADATA_IN_BACKGROUND:
+            staged.metadata_path = keep_for_metadata(uploaded_file)
+        existing = (existing_assets or {}).get(staged.photo_data['content_hash'])
+        if existing:
+            staged.resource, stored = existing
+            staged.photo_data.update({k: v for k, v in stored.items() if v is not None})
+            staged.reused = True
+        elif project.upload_mode == project.UPLOAD_OPTIMIZED:
+            # Metadata above came from the original; dimensions and size follow the optimized copy
+            upload_file, updates = optimize_for_upload(uploaded_file)
+            try:
+                staged.resource = upload_to_storage(upload_file, Photo._meta.get_field('image'))
+            finally:
+                if upload_file is not uploaded_file:
+                    upload_file.close()
+            # Size, type and dimensions are the stored copy's; the metadata job keeps them
+            staged.photo_data.update({k: v for k, v in updates.items() if v is not None})
+        else:
+            staged.resource = upload_to_storage(uploaded_file, Photo._meta.get_field('image'))
+    except Exception as e:
+        logger.warning(f"Failed to stage upload '{staged.filename}': {e}")
+        staged.error = handle_upload_error(e, staged.filename)
+        if staged.metadata_path:
+            os.unlink(staged.metadata_path)
+            staged.metadata_path = None
+    return staged
+
+
+# Stage a batch of files with at most PHOTO_UPLOAD_CONCURRENCY uploads in flight
+# Results come back in the same order as the files
+def stage_photos(uploaded_files, project, max_workers=None, existing_assets=None):
+    max_workers = max_workers or settings.PHOTO_UPLOAD_CONCURRENCY
+    # Looked up here so worker threads never touch the database
+    if existing_assets is None:
+        existing_assets = find_existing_assets(uploaded_files, project.owner_id, project.upload_mode)
+
+    if len(uploaded_files) <= 1 or max_workers <= 1:
+        return [stage_photo(f, project, existing_assets) for f in uploaded_files]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(uploaded_files))) as pool:
+        return list(pool.map(lambda f: stage_photo(f, project, existing_assets), uploaded_files))
+
+
+# Write Photo rows for every successfully staged file in one query
+# Files whose reused asset was deleted since staging are reported as failed instead
+def create_photos(staged_uploads, project, caption=''):
+    ready = [s for s in staged_uploads if s.ok]
+    lost = claim_reused_assets(ready)
+    if lost:
+        discard_staged(lost)
+        for staged in lost:
+            staged.error = f"The stored copy of '{staged.filename}' was just deleted. Please upload it again."
+        ready = [s for s in ready if s.ok]
+    # After the project's last photo, in upload order
+    ranks = append_ranks(project.id, len(ready))
+    photos = [
+        Photo(
+            project=project,
+            image=s.resource,  # already uploaded, pre_save passes it through
+            caption=caption,
+            order_index=rank,
+            # title, size, type, dimensions, hashes and EXIF columns from ingest
+            **s.photo_data,
+        )
+        for s, rank in zip(ready, ranks)
+    ]
+    for staged, photo in zip(ready, Photo.objects.bulk_create(photos)):
+        staged.photo = photo
+    return staged_uploads
+
+
+# A reused asset must still exist when its new row commits (call inside that transaction).
+# The rows that reference it are locked, so a concurrent delete of the last one waits for
+# this commit and then sees the new row; deletions already queued for it are taken back.
+# Returns the reused uploads whose asset has neither, i.e. may already be destroyed
+def claim_reused_assets(staged_uploads):
+    keys = {s: (s.photo_data['content_hash'], s.resource.public_id) for s in staged_uploads if s.reused}
+    if not keys:
+        return []
+    held = Photo.assets_in_use(set(keys.values()), for_update=True)
+    cancelled = cancel_asset_deletions({public_id for _, public_id in keys.values()})
+    return [s for s, key in keys.items() if key not in held and key[1] not in cancelled]
+
+
+# Queue one metadata job per new photo, all under one batch id for progress polling
+def enqueue_metadata_jobs(staged_uploads, project):
+    batch_id = uuid.uuid4()
+    jobs = enqueue_many(
+        'projects.process_photo_metadata',
+        [{'photo_id': staged.photo.id, 'path': staged.metadata_path} for staged in staged_uploads],
+        batch_id=batch_id,
+        owner=project.owner,
+    )
+    for staged, job in zip(staged_uploads, jobs):
+        staged.job_id = job.id
+        staged.batch_id = batch_id
+    return batch_id
+
+
+# Compensating cleanup: remove staged assets whose rows never got committed
+def discard_staged(staged_uploads):
+    for staged in staged_uploads:
+        if staged.metadata_path:
+            os.unlink(staged.metadata_path)
+            staged.metadata_path = None
+        public_id = getattr(staged.resource, 'public_id', None)
+        # Reused assets belong to rows that already exist
+        if not public_id or staged.reused:
+            continue
+        try:
+            get_backend().destroy(public_id)
+            logger.info(f"Discarded staged upload from storage: {public_id}")
+        except Exception as e:
+            logger.error(f"Failed to discard staged upload {public_id}: {e}")
+
+
+# Phase two: commit every staged row in one short transaction
+# If the commit fails the staged assets are discarded and each file reports the error
+def commit_staged(staged_uploads, project, caption=''):
+    ready = [s for s in staged_uploads if s.ok]
+    if not ready:
+        return staged_uploads
+
+    try:
+        with transaction.atomic():
+            create_photos(ready, project, caption=caption)
+            if settings.PHOTO_METADATA_IN_BACKGROUND:
+                # Same transaction, so workers never see a job for an uncommitted photo
+                enqueue_metadata_jobs([s for s in ready if s.photo], project)
+    except Exception as e:
+        logger.error(f"Failed to save uploaded photos for project {project.pk}: {e}")
+        discard_staged(ready)
+        for staged in ready:
+            staged.photo = None
+            staged.job_id = staged.batch_id = None
+            staged.error = handle_upload_error(e, staged.filename)
+
+    return staged_uploads
+
+
+# Full pipeline: phase one uploads with no transaction open,
+# phase two commits every row in one short transaction
+def upload_photos(uploaded_files, project, caption=''):
+    return commit_staged(stage_photos(uploaded_files, project), project, caption=caption)
+
+
+_async_upload_executor = None
+_async_upload_executor_lock = threading.Lock()
+
+
+# One pool for every async request in the process; asyncio's default executor
+# only has a handful of threads and would cap uploads across all requests
+# Created under a lock: concurrent first requests would otherwise each start one
+def _get_async_upload_executor():
+    global _async_upload_executor
+    with _async_upload_executor_lock:
+        if _async_upload_executor is None:
+            _async_upload_executor = ThreadPoolExecutor(
+                max_workers=settings.PHOTO_UPLOAD_ASYNC_THREADS, thread_name_prefix='photo-upload'
+            )
+    return _async_upload_executor
+
+
+# Async counterpart of stage_photos for ASGI views
+# The storage SDK is blocking, so each file runs in a thread; the semaphore bounds uploads in flight
+async def astage_photos(uploaded_files, project, max_concurrency=None, existing_assets=None):
+    semaphore = asyncio.Semaphore(max_concurrency or settings.PHOTO_UPLOAD_CONCURRENCY)
+    if existing_assets is None:
+        existing_assets = await sync_to_async(find_existing_assets)(
+            uploaded_files, project.owner_id, project.upload_mode
+        )
+    loop = asyncio.get_running_loop()
+    executor = _get_async_upload_executor()
+
+    async def stage(uploaded_file):
+        async with semaphore:
+            return await loop.run_in_executor(executor, stage_photo, uploaded_file, project, existing_assets)
+
+    return list(await asyncio.gather(*(stage(f) for f in uploaded_files)))
+
+
+# Async counterpart of upload_photos; the commit keeps its transaction in a sync thread
+async def aupload_photos(uploaded_files, project, caption=''):
+    staged_uploads = await astage_photos(uploaded_files, project)
+    return await sync_to_async(commit_staged)(staged_uploads, project, caption=caption)
+
+
+# Resumable chunked uploads
+
+# Read up to `length` bytes from `stream` into a file of their own; returns (path, bytes received)
+# Runs with no transaction open; a short body keeps what arrived so the client can resume
+# If the read fails (e.g. UnreadablePostError on a disconnect) the file is removed, since
+# nothing else knows its name
+def receive_chunk(session, stream, length):
+    path = session.chunk_path.with_name(f'{session.id}.{uuid.uuid4().hex}.chunk')
+    path.parent.mkdir(parents=True, exist_ok=True)
+    received = 0
+    try:
+        with open(path, 'wb') as chunk_file:
+            while received < length:
+                data = stream.read(min(length - received, settings.PHOTO_UPLOAD_CHUNK_SIZE))
+                if not data:
+                    break
+                chunk_file.write(data)
+                received += len(data)
+    except BaseException:
+        path.unlink(missing_ok=True)
+        raise
+    return path, received
+
+
+# Add a received chunk to the session at `offset`, if that is still where it expects one
+# The conditional UPDATE is the claim: of two retries of the same chunk only one moves the
+# offset, and the row stays locked just for the local copy. Anything past `offset` in the
+# part file (from an interrupted append) is discarded first. Returns False if the claim failed
+def append_chunk(session, chunk_path, offset, received):
+    try:
+        with transaction.atomic():
+            claimed = UploadSession.objects.filter(
+                pk=session.pk, status=UploadSession.STATUS_ACTIVE, received_bytes=offset,
+            ).update(received_bytes=offset + received, updated=timezone.now())
+            if not claimed:
+                return False
+            path = session.chunk_path
+            with open(path, 'r+b' if path.exists() else 'w+b') as part_file, open(chunk_path, 'rb') as chunk_file:
+                part_file.seek(offset)
+                part_file.truncate()
+                shutil.copyfileobj(chunk_file, part_file, settings.PHOTO_UPLOAD_CHUNK_SIZE)
+    finally:
+        chunk_path.unlink(missing_ok=True)
+    session.received_bytes = offset + received
+    return True
+
+
+# Wrap the assembled chunk file like a spooled upload (sha256, sniffed_type, size)
+def open_assembled_upload(session):
+    chunk_file = open(session.chunk_path, 'rb')
+    hasher = hashlib.sha256()
+    head = chunk_file.read(MAGIC_BYTES_LENGTH)
+    hasher.update(head)
+    for data in iter(lambda: chunk_file.read(settings.PHOTO_UPLOAD_CHUNK_SIZE), b''):
+        hasher.update(data)
+    chunk_file.seek(0)
+
+    uploaded_file = UploadedFile(
+        file=chunk_file,
+        name=session.filename,
+        content_type=session.content_type,
+        size=session.total_size,
+    )
+    uploaded_file.sha256 = hasher.hexdigest()
+    uploaded_file.sniffed_type = sniff_image_type(head)
+    return uploaded_file
+
+
+# Claim a fully received session for finalizing; False if it isn't complete or another request has it
+def claim_upload_session(session):
+    claimed = UploadSession.objects.filter(
+        pk=session.pk, status=UploadSession.STATUS_ACTIVE, received_bytes__gte=F('total_size'),
+    ).update(status=UploadSession.STATUS_FINALIZING, updated=timezone.now())
+    if claimed:
+        session.status = UploadSession.STATUS_FINALIZING
+    return bool(claimed)
+
+
+# Run a claimed session through the normal upload pipeline
+# On failure the chunks are kept and the session reopened so finalize can be retried
+def finalize_upload_session(session):
+    staged = None
+    try:
+        uploaded_file = open_assembled_upload(session)
+        try:
+            staged = upload_photos([uploaded_file], session.project)[0]
+        finally:
+            uploaded_file.close()
+    finally:
+        if staged is not None and staged.photo:
+            session.status = UploadSession.STATUS_COMPLETE
+            session.photo = staged.photo
+            session.chunk_path.unlink(missing_ok=True)
+        else:
+            session.status = UploadSession.STATUS_ACTIVE
+        session.save(update_fields=['status', 'photo', 'updated'])
+    return staged
@@ -2,13 +2,14 @@
 URLs for the projects app
 """
 from django.urls import path
-from . import views
+from . import views, async_views
 
 app_name = 'projects'
 
 urlpatterns = [
     path('', views.ProjectListView.as_view(), name='list'),
     path('new/', views.ProjectCreateView.as_view(), name='create'),
+    path('search/', views.photo_search, name='search'),
     path('<int:pk>/', views.ProjectDetailView.as_view(), name='detail'),
     path('<int:pk>/edit/', views.ProjectUpdateView.as_view(), name='edit'),
     path('<int:pk>/delete/', views.ProjectDeleteView.as_view(), name='delete'),
@@ -16,8 +17,22 @@ urlpatterns = [
     # Photo management URLs
     path('<int:project_id>/photos/upload/', views.photo_upload, name='photo_upload'),
     path('<int:project_id>/photos/reorder/', views.photo_reorder, name='photo_reorder'),
+    path('<int:project_id>/photos/<int:photo_id>/move/', views.photo_move, name='photo_move'),
+    path('<int:project_id>/photos/', views.gallery_photos, name='gallery_photos'),
     path('photos/<int:photo_id>/', views.photo_detail, name='photo_detail'),
+    path('photos/<int:photo_id>/similar/', views.photo_similar, name='photo_similar'),
     path('photos/<int:photo_id>/edit/', views.photo_edit, name='photo_edit'),
     path('photos/<int:photo_id>/delete/', views.photo_delete, name='photo_delete'),
     path('<int:project_id>/photos/bulk/', views.photos_bulk_action, name='photos_bulk_action'),
+
+    # Async versions of the upload, reorder, move and bulk endpoints (for ASGI deployments)
+    path('<int:project_id>/photos/upload/async/', async_views.photo_upload, name='photo_upload_async'),
+    path('<int:project_id>/photos/reorder/async/', async_views.photo_reorder, name='photo_reorder_async'),
+    path('<int:project_id>/photos/<int:photo_id>/move/async/', async_views.photo_move, name='photo_move_async'),
+    path('<int:project_id>/photos/bulk/async/', async_views.photos_bulk_action, name='photos_bulk_action_async'),
+
+    # Resumable chunked uploads
+    path('<int:project_id>/photos/uploads/', views.upload_session_create, name='upload_session_create'),
+    path('photos/uploads/<uuid:upload_id>/', views.upload_session_detail, name='upload_session_detail'),
+    path('photos/uploads/<uuid:upload_id>/finalize/', views.upload_session_finalize, name='upload_session_finalize'),
 ]
\ No newline at end of file
@@ -3,12 +3,18 @@ Image processing utilities for photo uploads.
 
 Provides secure image validation, EXIF metadata extraction, and photo processing.
 Key functions: validate_image_file(), extract_exif_data(), get_image_dimensions(),
-process_uploaded_photo(). Includes security validation and error handling.
+ingest_photo(), process_uploaded_photo(). Includes security validation and error handling.
 """
 
-from PIL import Image
-from PIL.ExifTags import TAGS
+from dataclasses import dataclass
+from datetime import datetime, timezone as dt_timezone
+from fractions import Fraction
+import base64
+import hashlib
+import math
+from PIL import ExifTags, Image, ImageOps
 import exifread
+from exifread.tags import IGNORE_TAGS, exif as exif_tags
 from django.core.exceptions import ValidationError
 from django.conf import settings
 from cloudinary.models import CloudinaryResource
@@ -19,31 +25,15 @@ import logging
 # Creates a logger named 'projects.utils'
 logger = logging.getLogger(__name__)
 
-# Validate uploaded image file for type, size, and basic integrity
-
 
-def validate_image_file(uploaded_file):
-     # If it's an existing Cloudinary resource, skip validation
-    if isinstance(uploaded_file, CloudinaryResource):
-        return True
-    
-    # If it's a string (URL), also skip validation (existing image)
-    if isinstance(uploaded_file, str):
-        return True
-    
-    # Only validate actual file uploads
-    if not hasattr(uploaded_file, 'size') or not hasattr(uploaded_file, 'content_type'):
-        # If it doesn't have these attributes, it might be an existing resource
-        return True
-    
+# Reject files that are too large or of a type we don't accept
+def _check_size_and_type(uploaded_file):
     # Check file size
     if uploaded_file.size > settings.MAX_UPLOAD_SIZE:
         raise ValidationError(
             f"File too large. Maximum size is {settings.MAX_UPLOAD_SIZE // (1024*1024)}MB. "
             f"Your file is {uploaded_file.size // (1024*1024)}MB."
         )
-    
-    
 
     # Check MIME type
     # Instead of generic error, shows specific message:
@@ -56,6 +46,26 @@ def validate_image_file(uploaded_file):
             f"Allowed types: {allowed_types}"
         )
 
+
+# Validate uploaded image file for type, size, and basic integrity
+
+
+def validate_image_file(uploaded_file):
+     # If it's an existing Cloudinary resource, skip validation
+    if isinstance(uploaded_file, CloudinaryResource):
+        return True
+    
+    # If it's a string (URL), also skip validation (existing image)
+    if isinstance(uploaded_file, str):
+        return True
+    
+    # Only validate actual file uploads
+    if not hasattr(uploaded_file, 'size') or not hasattr(uploaded_file, 'content_type'):
+        # If it doesn't have these attributes, it might be an existing resource
+        return True
+    
+    _check_size_and_type(uploaded_file)
+
     # Try to open the image to validate it's actually an image
     try:
         uploaded_file.seek(0)  # Reset file pointer
@@ -141,28 +151,385 @@ def generate_photo_title(uploaded_file):
         return title
     return "Untitled Photo"
 
+# Magic-byte signatures for the image types we accept
+MAGIC_BYTES_LENGTH = 16
+
+
+# Sniff the image MIME type from the first bytes of a file, or None if unknown
+def sniff_image_type(head):
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head[:4] in (b'II*\x00', b'MM\x00*'):
+        return 'image/tiff'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head[4:8] == b'ftyp' and head[8:12] in (b'heic', b'heix', b'mif1', b'msf1'):
+        return 'image/heic'
+    return None
+
+
+# Result of reading an upload once: validation, dimensions, MIME sniff and EXIF together
+@dataclass
+class PhotoIngestResult:
+    width: int = None
+    height: int = None
+    file_size: int = None
+    mime_type: str = None
+    exif_data: dict = None
+    content_hash: str = ''
+    perceptual_hash: int = None
+    # Base64 WebP a few pixels across and the dominant colour, painted while the thumbnail loads
+    placeholder: str = ''
+    dominant_color: str = ''
+    # Typed camera fields parsed once from the EXIF (see parse_exif_fields)
+    exif_fields: dict = None
+
+    def as_photo_data(self, title):
+        # Same shape as the dict process_uploaded_photo has always returned
+        return {
+            'title': title,
+            'file_size': self.file_size,
+            'mime_type': self.mime_type,
+            'width': self.width,
+            'height': self.height,
+            'exif_data': self.exif_data,
+            'content_hash': self.content_hash,
+            'perceptual_hash': self.perceptual_hash,
+            'placeholder': self.placeholder,
+            'dominant_color': self.dominant_color,
+            **(self.exif_fields or {}),
+        }
+
+
+# SHA-256 of an upload; the spooled upload handler computes it while receiving
+def compute_content_hash(uploaded_file):
+    if getattr(uploaded_file, 'sha256', None):
+        return uploaded_file.sha256
+    if not hasattr(uploaded_file, 'chunks'):
+        return ''
+    hasher = hashlib.sha256()
+    uploaded_file.seek(0)
+    for chunk in uploaded_file.chunks():
+        hasher.update(chunk)
+    uploaded_file.seek(0)
+    uploaded_file.sha256 = hasher.hexdigest()
+    return uploaded_file.sha256
+
+
+# Directories exifread reads, with their names and tag tables; ids are Pillow's get_ifd() keys
+# (None is the main IFD). exifread's own tables give the same tag names and value labels
+# ("Rotated 90 CW", "Pattern") as exifread.process_file, so stored exif_data doesn't change
+EXIF_SECTIONS = (
+    ('Image', None, exif_tags.EXIF_TAGS),
+    ('Thumbnail', ExifTags.IFD.IFD1, exif_tags.EXIF_TAGS),
+    ('EXIF', ExifTags.IFD.Exif, exif_tags.EXIF_TAGS),
+    ('GPS', ExifTags.IFD.GPSInfo, exif_tags.EXIF_TAGS[ExifTags.IFD.GPSInfo][1][1]),
+    ('Interoperability', ExifTags.IFD.Interop, exif_tags.EXIF_TAGS[ExifTags.IFD.Interop][1][1]),
+)
+
+
+# A number the way exifread prints it: "14/5", "50", "-1/3"
+def _format_exif_number(value):
+    if hasattr(value, 'numerator') and hasattr(value, 'denominator') and not isinstance(value, int):
+        if not value.denominator:
+            return str(value.numerator)
+        return str(Fraction(int(value.numerator), int(value.denominator)))
+    return str(value)
+
+
+# Format a Pillow EXIF value the way exifread prints that tag (IfdTag.printable)
+def _format_exif_value(value, tag_entry):
+    if isinstance(value, str):
+        values = value.strip('\x00 ')
+        printable = values
+    else:
+        # BYTE/UNDEFINED tags come from Pillow as bytes; exifread reads them as lists of ints
+        values = list(value) if isinstance(value, (bytes, tuple, list)) else [value]
+        if len(values) == 1:
+            printable = _format_exif_number(values[0])
+        elif len(values) > 50:
+            printable = '[' + ', '.join(_format_exif_number(v) for v in values[:20]) + ', ... ]'
+        else:
+            printable = '[' + ', '.join(_format_exif_number(v) for v in values) + ']'
+
+    # Enumerations map to labels, some tags have a formatting function (sub-IFD pointers keep the offset)
+    mapping = tag_entry[1] if tag_entry else None
+    if callable(mapping):
+        printable = mapping(values)
+    elif isinstance(mapping, dict):
+        printable = ''.join(mapping.get(v, repr(v)) for v in values)
+    return printable
+
+
+# Read EXIF from an already-opened image, keyed like exifread ("Image Make", "EXIF FNumber")
+def _exif_from_image(img):
+    try:
+        # Base-class getexif only reads what the header parse already found;
+        # PngImageFile.getexif would decode the whole image looking for a late eXIf chunk
+        exif = Image.Image.getexif(img)
+    except Exception as e:
+        logger.warning(f"EXIF extraction failed: {e}")
+        return None
+
+    exif_dict = {}
+    for prefix, ifd_id, tag_table in EXIF_SECTIONS:
+        try:
+            tags = dict(exif) if ifd_id is None else dict(exif.get_ifd(ifd_id))
+        except KeyError:
+            # No pointer to this directory (Pillow raises for a missing Interop IFD)
+            continue
+        except Exception as e:
+            logger.warning(f"Failed to read {prefix} IFD: {e}")
+            continue
+        for tag_id, value in tags.items():
+            # Skipped by exifread.process_file(details=False) too (MakerNote, UserComment, ...)
+            if tag_id in IGNORE_TAGS:
+                continue
+            tag_entry = tag_table.get(tag_id)
+            name = tag_entry[0] if tag_entry else f"Tag 0x{tag_id:04X}"
+            try:
+                exif_dict[f"{prefix} {name}"] = _format_exif_value(value, tag_entry)
+            except Exception as e:
+                logger.warning(f"Failed to process EXIF tag {name}: {e}")
+
+    return exif_dict if exif_dict else None
+
+
+# EXIF keys (exifread naming) behind each typed Photo column
+EXIF_FIELD_TAGS = {
+    'camera_make': ['Image Make'],
+    'camera_model': ['Image Model'],
+    'lens_model': ['EXIF LensModel'],
+    'focal_length': ['EXIF FocalLength'],
+    'f_number': ['EXIF FNumber'],
+    'exposure_time': ['EXIF ExposureTime'],
+    'iso': ['EXIF ISOSpeedRatings', 'EXIF PhotographicSensitivity'],
+    'taken_at': ['EXIF DateTimeOriginal', 'Image DateTime'],
+}
+
+
+# "14/5" -> 2.8, "50" -> 50.0, "[400, 400]" -> 400.0; None if it isn't a number
+def _parse_exif_number(value):
+    if value is None:
+        return None
+    text = str(value).strip().strip('[]').split(',')[0].strip()
+    try:
+        number = float(Fraction(text))
+    except (ValueError, ZeroDivisionError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+# "2024:05:01 10:00:00" -> aware datetime (EXIF has no time zone, so it is read as UTC)
+def _parse_exif_datetime(value):
+    try:
+        naive = datetime.strptime(str(value).strip()[:19], '%Y:%m:%d %H:%M:%S')
+    except (ValueError, TypeError):
+        return None
+    return naive.replace(tzinfo=dt_timezone.utc)
+
+
+# Parse the camera fields we query on into typed values, once, at ingest
+# (migrations 0007 and 0015 carry frozen copies for their backfills)
+def parse_exif_fields(exif):
+    exif = exif or {}
+
+    def first(field):
+        for tag in EXIF_FIELD_TAGS[field]:
+            if exif.get(tag):
+                return exif[tag]
+        return None
+
+    iso = _parse_exif_number(first('iso'))
+    return {
+        'camera_make': str(first('camera_make') or '').strip()[:100],
+        'camera_model': str(first('camera_model') or '').strip()[:100],
+        'lens_model': str(first('lens_model') or '').strip()[:100],
+        'focal_length': _parse_exif_number(first('focal_length')),
+        'f_number': _parse_exif_number(first('f_number')),
+        'exposure_time': _parse_exif_number(first('exposure_time')),
+        'iso': int(iso) if iso and iso > 0 else None,
+        'taken_at': _parse_exif_datetime(first('taken_at')),
+    }
+
+
+# Raw tags are optional (EXIF_STORE_RAW) and limited to EXIF_RAW_TAGS
+def filter_raw_exif(exif):
+    if not exif or not settings.EXIF_STORE_RAW:
+        return None
+    kept = {tag: value for tag, value in exif.items() if tag in settings.EXIF_RAW_TAGS}
+    return kept or None
+
+
+# 64-bit difference hash (dHash): compares neighbouring pixels of a 9x8 grayscale thumbnail
+# Near-identical frames (burst shots, small exposure changes) land a few bits apart
+DHASH_SIZE = 8
+
+# Longest side of the inline placeholder; a 16px lossy WebP is under ~150 bytes
+PLACEHOLDER_SIZE = 16
+PLACEHOLDER_QUALITY = 40
+# Longest base64 placeholder the model columns hold
+PLACEHOLDER_MAX_LENGTH = 400
+
+# Decoded size both of the above are derived from
+PREVIEW_SIZE = 64
+
+
+# One draft-mode decode shared by the perceptual hash and the placeholder
+# draft() lets the JPEG decoder scale down while decoding, which is much cheaper
+def decode_preview(image_file):
+    image_file.seek(0)
+    try:
+        with Image.open(image_file) as img:
+            img.draft('RGB', (PREVIEW_SIZE, PREVIEW_SIZE))
+            # convert() keeps img.info, so the EXIF orientation survives for the placeholder
+            return img.convert('RGB')
+    finally:
+        image_file.seek(0)
+
+
+def perceptual_hash_of(preview):
+    small = preview.convert('L').resize((DHASH_SIZE + 1, DHASH_SIZE), Image.Resampling.LANCZOS)
+    pixels = list(small.getdata())
+
+    value = 0
+    for row in range(DHASH_SIZE):
+        for col in range(DHASH_SIZE):
+            left = pixels[row * (DHASH_SIZE + 1) + col]
+            right = pixels[row * (DHASH_SIZE + 1) + col + 1]
+            value = (value << 1) | (left > right)
+
+    # Store as a signed 64-bit integer so it fits a BigIntegerField
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+# Returns (base64 WebP placeholder, '#rrggbb' dominant colour)
+def placeholder_of(preview):
+    # Cloudinary delivers rotated by EXIF orientation, so the placeholder must be too
+    small = ImageOps.exif_transpose(preview)
+    small.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE))
+
+    # Most common colour of a 5-colour palette reads better than the (muddy) mean
+    quantized = small.quantize(colors=5, method=Image.Quantize.MEDIANCUT)
+    _, index = max(quantized.getcolors())
+    dominant_color = '#{:02x}{:02x}{:02x}'.format(*quantized.getpalette()[index * 3:index * 3 + 3])
+
+    small.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    buffer = io.BytesIO()
+    small.save(buffer, 'WEBP', quality=PLACEHOLDER_QUALITY)
+    placeholder = base64.b64encode(buffer.getvalue()).decode('ascii')
+    return (placeholder if len(placeholder) <= PLACEHOLDER_MAX_LENGTH else ''), dominant_color
+
+
+def compute_perceptual_hash(uploaded_file):
+    try:
+        return perceptual_hash_of(decode_preview(uploaded_file))
+    except Exception as e:
+        logger.warning(f"Failed to compute perceptual hash: {e}")
+        return None
+
+
+# Returns (placeholder, dominant colour), or ('', '') if the image can't be read
+def compute_placeholder(image_file):
+    try:
+        return placeholder_of(decode_preview(image_file))
+    except Exception as e:
+        logger.warning(f"Failed to compute placeholder: {e}")
+        return '', ''
+
+
+# Single-pass ingest: validate, sniff, measure and read EXIF from one Image.open
+# Replaces validate_image_file + extract_exif_data + get_image_dimensions for uploads
+def ingest_photo(uploaded_file):
+    # Existing Cloudinary resources have nothing to read
+    if isinstance(uploaded_file, (CloudinaryResource, str)) or not hasattr(uploaded_file, 'seek'):
+        return PhotoIngestResult()
+
+    # Cheap checks first, before touching the file contents
+    if hasattr(uploaded_file, 'size') and hasattr(uploaded_file, 'content_type'):
+        _check_size_and_type(uploaded_file)
+
+    result = PhotoIngestResult(
+        file_size=getattr(uploaded_file, 'size', None),
+        mime_type=getattr(uploaded_file, 'content_type', None),
+        content_hash=compute_content_hash(uploaded_file),
+    )
+
+    try:
+        uploaded_file.seek(0)
+        # Image.open only parses the header; size, format and EXIF come from it
+        with Image.open(uploaded_file) as img:
+            result.width, result.height = img.size
+            sniffed_type = Image.MIME.get(img.format)
+            exif = _exif_from_image(img)
+            # verify() must be the last thing done with this image object
+            img.verify()
+        uploaded_file.seek(0)
+    except Exception as e:
+        uploaded_file.seek(0)
+        raise ValidationError(f"Invalid or corrupted image file: {str(e)}")
+
+    # Typed columns come from the full tag set; only whitelisted tags are kept raw
+    result.exif_fields = parse_exif_fields(exif)
+    result.exif_data = filter_raw_exif(exif)
+
+    # Perceptual hash and placeholder need pixels, so they share one (draft-mode, downscaled) decode
+    # (a file that fails here is still a valid upload, just without them)
+    try:
+        preview = decode_preview(uploaded_file)
+        perceptual_hash = perceptual_hash_of(preview)
+        placeholder, dominant_color = placeholder_of(preview)
+    except Exception as e:
+        logger.warning(f"Failed to decode preview: {e}")
+    else:
+        result.perceptual_hash = perceptual_hash
+        result.placeholder, result.dominant_color = placeholder, dominant_color
+
+    # Trust the sniffed type over the browser's when it is one we accept
+    # (the spooled upload handler has usually sniffed it already)
+    sniffed_type = getattr(uploaded_file, 'sniffed_type', None) or sniffed_type
+    if sniffed_type in settings.ALLOWED_IMAGE_TYPES:
+        result.mime_type = sniffed_type
+
+    return result
+
+
+# Cheap request-time checks used when metadata is read by a background job:
+# size, declared type, magic bytes and content hash, without decoding the image
+def inspect_photo(uploaded_file):
+    if isinstance(uploaded_file, (CloudinaryResource, str)) or not hasattr(uploaded_file, 'seek'):
+        return PhotoIngestResult()
+
+    if hasattr(uploaded_file, 'size') and hasattr(uploaded_file, 'content_type'):
+        _check_size_and_type(uploaded_file)
+
+    sniffed_type = getattr(uploaded_file, 'sniffed_type', None)
+    if sniffed_type is None:
+        uploaded_file.seek(0)
+        sniffed_type = sniff_image_type(uploaded_file.read(MAGIC_BYTES_LENGTH))
+        uploaded_file.seek(0)
+    if sniffed_type is None:
+        raise ValidationError("Invalid or corrupted image file: unrecognized image format")
+
+    return PhotoIngestResult(
+        file_size=getattr(uploaded_file, 'size', None),
+        mime_type=sniffed_type if sniffed_type in settings.ALLOWED_IMAGE_TYPES
+        else getattr(uploaded_file, 'content_type', None),
+        content_hash=compute_content_hash(uploaded_file),
+    )
+
+
 # Complete processing pipeline for uploaded photo
-# Returns dictionary with processed data
-def process_uploaded_photo(uploaded_file, project):
-    # Validate the file
-    validate_image_file(uploaded_file)
-
-    # Extract metadata
-    exif_data = extract_exif_data(uploaded_file)
-    width, height = get_image_dimensions(uploaded_file)
+# Returns dictionary with processed data; with defer_metadata the EXIF, dimensions
+# and perceptual hash are left empty for the background job to fill in
+def process_uploaded_photo(uploaded_file, project, defer_metadata=False):
+    result = inspect_photo(uploaded_file) if defer_metadata else ingest_photo(uploaded_file)
     title = generate_photo_title(uploaded_file)
 
     # Prepare photo data
-    photo_data = {
-        'title': title,
-        'file_size': getattr(uploaded_file, 'size', None),
-        'mime_type': getattr(uploaded_file, 'content_type', None),
-        'width': width,
-        'height': height,
-        'exif_data': exif_data,
-    }
-
-    return photo_data
+    return result.as_photo_data(title)
 
 # Custom exception for image upload errors
 class ImageUploadError(Exception):
@@ -5,23 +5,37 @@
 import json
 
 # Django core imports
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import ValidationError
 from django.core.paginator import Paginator
 from django.db import transaction
+from django.db.models import Count, Max
 from django.http import Http404, JsonResponse, HttpResponseBadRequest, HttpResponseForbidden
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse_lazy, reverse
-from django.views.decorators.csrf import csrf_protect
-from django.views.decorators.http import require_POST
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.views.decorators.http import require_POST, require_http_methods, require_safe
 from django.views.generic import ListView, CreateView, DetailView, UpdateView, DeleteView, TemplateView
 
+from media.outbox import collect_asset_deletions
+
 # Local app imports
-from .models import Project, Photo
-from .forms import ProjectForm, PhotoUploadForm, BulkPhotoUploadForm, PhotoEditForm, PhotoBulkActionForm
-from .utils import process_uploaded_photo, handle_upload_error
+from .models import FacetCount, Project, Photo, UploadSession
+from .forms import (
+    ProjectForm, PhotoUploadForm, BulkPhotoUploadForm, PhotoEditForm, PhotoBulkActionForm, PhotoFilterForm,
+)
+from .uploads import upload_photos, receive_chunk, append_chunk, claim_upload_session, finalize_upload_session
+from .upload_handlers import use_spooled_upload_handler
+from .similarity import similar_photos, find_near_duplicate_groups
+from .tombstones import tombstone_project
+from .pagination import KeysetPaginator
+from .gallery import gallery_page, serialize_page
+from .ordering import StaleOrder, move_photo, write_photo_order
+from .search import SEARCH_FIELDS, SEARCH_ORDERING, filter_photos, search_projects
+from .facets import FACETS, facet_counts, filter_by_facets, selected_facets
 
 
 # home page view
@@ -32,20 +46,30 @@ class HomeView(TemplateView):
 # list all projects for current user
 class ProjectListView(LoginRequiredMixin, ListView):
     model = Project
-    template_name = 'projects/list.html'
+    template_name = 'projects/project_list.html'
     context_object_name = 'projects'
     paginate_by = 10  # Number of projects per page
+    # keyset order, served by the (owner, -created) index; id breaks ties
+    ordering = ('-created', '-id')
 
     #only show projects owned by the current user
     def get_queryset(self):
-        return Project.objects.filter(owner=self.request.user).select_related('owner')
+        return Project.objects.filter(owner=self.request.user)
+
+    # ?after=/?before= cursors instead of ?page=, so every page is one index range scan
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, self.ordering, page_size)
+        page = paginator.page(after=self.request.GET.get('after'), before=self.request.GET.get('before'))
+        return paginator, page, page.object_list, page.has_other_pages()
     
-    # extends parent's context data to include total projects count
+    # extends parent's context data with the header totals
     def get_context_data(self, **kwargs):
         # get the default context from ListView
         context = super().get_context_data(**kwargs)
-        # counts in database without loading records
-        context['total_projects'] = self.get_queryset().count()
+        # one aggregate query, however deep into the list this page is
+        context.update(self.get_queryset().order_by().aggregate(
+            total_projects=Count('id'), last_updated=Max('updated'),
+        ))
         return context
 
 # create a new project
@@ -75,6 +99,12 @@ class ProjectDetailView(LoginRequiredMixin, DetailView):
         if obj.owner != self.request.user:
             raise Http404("You do not have permission to view this project.")
         return obj
+
+    # only the first window of the grid; the rest comes from gallery_photos as it scrolls
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['gallery'] = gallery_page(self.object)
+        return context
     
 # update an existing project
 class ProjectUpdateView(LoginRequiredMixin, UpdateView):
@@ -110,19 +140,31 @@ class ProjectDeleteView(LoginRequiredMixin, DeleteView):
         if obj.owner != self.request.user:
             raise Http404("You do not have permission to delete this project.")
         return obj
+
+    # Hide the project at once; its photos and files are deleted in the background
+    def form_valid(self, form):
+        project_title = self.object.title
+        tombstone_project(self.object)
+        messages.success(self.request, f'Project "{project_title}" deleted successfully!')
+        return redirect(self.get_success_url())
     
-    # show success message when deleting
+    # HTTP DELETE takes the same path as the confirmation form
     def delete(self, request, *args, **kwargs):
-        project = self.get_object()
-        project_title = project.title
-        response = super().delete(request, *args, **kwargs)
-        messages.success(request, f'Project "{project_title}" deleted successfully!')
-        return response
+        self.object = self.get_object()
+        return self.form_valid(None)
     
 # handle photo uploads for a project (single and bulk)
+# csrf_exempt here only so the upload handler can be swapped before the body is parsed;
+# the CSRF check itself runs on _photo_upload below
 @login_required
-@csrf_protect
+@csrf_exempt
 def photo_upload(request, project_id):
+    use_spooled_upload_handler(request)
+    return _photo_upload(request, project_id)
+
+
+@csrf_protect
+def _photo_upload(request, project_id):
     project = get_object_or_404(Project, id=project_id)
     #check if the user owns the project (will add collaborator support later)
     if project.owner != request.user:
@@ -144,6 +186,18 @@ def photo_upload(request, project_id):
     
 # helper function to handle photo uploads, determines if it's single or bulk upload
 def _process_photo_uploads(request, project):
+    files_to_process, caption, error_response = _collect_upload_files(request, project)
+    if error_response:
+        return error_response
+
+    # Network uploads happen outside any transaction; only the inserts are atomic
+    staged_uploads = upload_photos(files_to_process, project, caption=caption)
+    return _upload_response(request, project, staged_uploads)
+
+
+# Pick the files and caption out of an upload POST (shared with the async view)
+# Returns (files, caption, None), or (None, None, response) when the form is invalid
+def _collect_upload_files(request, project):
     # Get files using correct field names and add bulk validation
     uploaded_files = request.FILES.getlist('photos')  # For bulk upload
     single_file = request.FILES.get('image')  # For single upload (corrected from 'photo')
@@ -165,12 +219,17 @@ def _process_photo_uploads(request, project):
         # ADDED: Manual validation for bulk files since form can't handle multiple files
         if len(files_to_process) > 20:
             messages.error(request, "Too many files selected. Maximum allowed: 20")
-            return redirect('projects:photo_upload', project_id=project.id)
+            return None, None, redirect('projects:photo_upload', project_id=project.id)
             
+    elif getattr(request, 'rejected_uploads', None):
+        # every file was dropped by the upload handler while streaming
+        files_to_process = []
+        upload_type = 'bulk'
+
     else:
         # no files to upload
         messages.error(request, "Select at least one photo to upload.")
-        return redirect('projects:photo_upload', project_id=project.id)
+        return None, None, redirect('projects:photo_upload', project_id=project.id)
         
 
          # form validation
@@ -180,61 +239,35 @@ def _process_photo_uploads(request, project):
             for field, errors in form.errors.items():
                 for error in errors:
                     messages.error(request, f"{field}: {error}")
-            return redirect('projects:photo_upload', project_id=project.id)
+            return None, None, redirect('projects:photo_upload', project_id=project.id)
         
     # Only validate form for single uploads (bulk validation handled above)
     if upload_type == 'single' and not form.is_valid():
         for field, errors in form.errors.items():
             for error in errors:
                 messages.error(request, f"{field}: {error}")
-        return redirect('projects:photo_upload', project_id=project.id)
+        return None, None, redirect('projects:photo_upload', project_id=project.id)
         
-    # Process each uploaded file
+    caption = form.cleaned_data.get('caption', '') if upload_type == 'single' else ''
+    return files_to_process, caption, None
+
+
+# Messages and the redirect or AJAX JSON for a finished upload batch
+def _upload_response(request, project, staged_uploads):
     successful_uploads = []
-    failed_uploads = []
+    # Files the upload handler rejected before they were fully received
+    failed_uploads = list(getattr(request, 'rejected_uploads', []))
 
-    # Use database transaction to ensure data consistency
-    # this will rollback if any upload fails
-    with transaction.atomic():
-        for uploaded_file in files_to_process:
-            try:
-                # Process the uploaded photo and get metadata
-                photo_data = process_uploaded_photo(uploaded_file, project)
-                # Create the Photo object
-                photo = Photo.objects.create(
-                    project=project,
-                    image=uploaded_file,  # Cloudinary handles the actual upload
-                    title=photo_data['title'],
-                    file_size=photo_data['file_size'],
-                    mime_type=photo_data['mime_type'],
-                    width=photo_data['width'],
-                    height=photo_data['height'],
-                    exif_data=photo_data['exif_data'],
-                    # If single upload, get additional fields from form
-                    caption=form.cleaned_data.get('caption', '') if upload_type == 'single' else '',
-                )
-                successful_uploads.append({
-                    'id': photo.id,
-                    'title': photo.title,
-                    'thumbnail_url': photo.thumbnail_url,
-                    'filename': uploaded_file.name
-                })
-                    
-            except ValidationError as e:
-                # Handle validation errors
-                error_message = handle_upload_error(e, uploaded_file.name)
-                failed_uploads.append({
-                    'filename': uploaded_file.name,
-                    'error': error_message
-                })
-
-            except Exception as e:
-                # Handle unexpected errors
-                error_message = handle_upload_error(e, uploaded_file.name)
-                failed_uploads.append({
-                    'filename': uploaded_file.name,
-                    'error': error_message
-                })
+    for staged in staged_uploads:
+        if staged.photo:
+            successful_uploads.append(_successful_upload(staged))
+        else:
+            failed_uploads.append({
+                'filename': staged.filename,
+                'error': staged.error
+            })
+    # metadata jobs for this upload, if processing runs in the background
+    batch_id = next((staged.batch_id for staged in staged_uploads if staged.batch_id), None)
 
     # Prepare response messages
     success_count = len(successful_uploads)
@@ -259,11 +292,32 @@ def _process_photo_uploads(request, project):
             'failed_uploads': failed_uploads,
             'total_success': success_count,
             'total_failed': failure_count,
+            **_batch_info(batch_id),
         })
     
     # Redirect to project detail page after upload
     return redirect('projects:detail', pk=project.id)
 
+# JSON entry for one uploaded photo (shared by the form and chunked upload endpoints)
+def _successful_upload(staged):
+    return {
+        'id': staged.photo.id,
+        'title': staged.photo.title,
+        'thumbnail_url': staged.photo.thumbnail_url,
+        'filename': staged.filename,
+        'job_id': staged.job_id,
+    }
+
+
+# batch_id and a progress URL for background metadata jobs, or nothing
+def _batch_info(batch_id):
+    if not batch_id:
+        return {}
+    return {
+        'batch_id': str(batch_id),
+        'progress_url': reverse('jobs:batch_status', kwargs={'batch_id': batch_id}),
+    }
+
 # Photo management views
 
 # Display detailed view of a single photo with metadata.
@@ -282,6 +336,119 @@ def photo_detail(request, photo_id):
     }
     return render(request, 'projects/photo_detail.html', context)
       
+# Photos that look like this one (burst shots, bracketed exposures)
+# ?scope=project (default) or library, ?distance= max differing hash bits
+@login_required
+def photo_similar(request, photo_id):
+    photo = get_object_or_404(Photo.objects.select_related('project'), id=photo_id)
+    if photo.project.owner != request.user:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'You do not have permission to view this photo.'
+        }, status=403)
+
+    scope = request.GET.get('scope', 'project')
+    if scope not in ('project', 'library'):
+        return JsonResponse({'status': 'error', 'message': 'Invalid scope.'}, status=400)
+    try:
+        max_distance = int(request.GET.get('distance', settings.SIMILAR_PHOTO_MAX_DISTANCE))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid distance.'}, status=400)
+
+    matches = similar_photos(photo, scope=scope, max_distance=max(0, min(max_distance, 32)))
+    return JsonResponse({
+        'status': 'success',
+        'photo_id': photo.id,
+        'similar': [{
+            'id': match.id,
+            'title': match.title,
+            'project_id': match.project_id,
+            'thumbnail_url': match.thumbnail_url,
+            'distance': distance,
+        } for distance, match in matches],
+    })
+
+# One window of a project's photo grid as JSON, after the ?after= cursor (see projects.gallery)
+@login_required
+@require_safe
+def gallery_photos(request, project_id):
+    project = get_object_or_404(Project.objects.only('id', 'owner_id'), id=project_id)
+    if project.owner_id != request.user.id:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'You do not have permission to view this project.'
+        }, status=403)
+
+    try:
+        limit = max(1, int(request.GET.get('limit', settings.GALLERY_PAGE_SIZE)))
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid limit.'}, status=400)
+
+    page = gallery_page(project, after=request.GET.get('after'), limit=limit)
+    return JsonResponse({'status': 'success', **serialize_page(page)})
+
+# Search the user's photos by words in the title/caption or a title close to the query,
+# with the PhotoFilterForm filters (see projects.search). Results are newest first and
+# paged with ?after=/?before= cursors; matching projects are listed above them
+@login_required
+@require_safe
+def photo_search(request):
+    form = PhotoFilterForm(request.GET or None)
+    photos = Photo.objects.filter(project__owner=request.user)
+    projects = Project.objects.none()
+    if form.is_bound and not form.is_valid():
+        photos = photos.none()
+    elif form.is_bound:
+        photos = filter_photos(photos, form.cleaned_data)
+        if form.cleaned_data['search']:
+            projects = search_projects(
+                Project.objects.filter(owner=request.user), form.cleaned_data['search']
+            )[:settings.SEARCH_PROJECT_LIMIT]
+    # EXIF facets: any of the chosen values within a facet, all of the chosen facets
+    selected = selected_facets(request.GET)
+    photos = filter_by_facets(photos, selected)
+
+    paginator = KeysetPaginator(
+        photos.select_related('project').only(*SEARCH_FIELDS), SEARCH_ORDERING, settings.SEARCH_PAGE_SIZE
+    )
+    page = paginator.page(after=request.GET.get('after'), before=request.GET.get('before'))
+
+    # The filters again, for the page links
+    params = request.GET.copy()
+    for cursor in ('after', 'before'):
+        params.pop(cursor, None)
+
+    context = {
+        'form': form,
+        'page': page,
+        'projects': projects,
+        'query': params.urlencode(),
+        'facets': _facet_sidebar(facet_counts(request.user), selected, params),
+        'selected_facets': [(facet, value) for facet, values in selected.items() for value in values],
+    }
+    return render(request, 'projects/search.html', context)
+
+
+# [(facet title, [option, ...]), ...] for the search page, each option linking to the
+# current search with that value toggled (counts are the whole library's, precomputed)
+def _facet_sidebar(groups, selected, params):
+    titles = dict(FacetCount.FACET_CHOICES)
+    sidebar = []
+    for facet in FACETS:
+        options = []
+        for item in groups[facet]:
+            chosen = selected.get(facet, [])
+            active = item.value in chosen
+            toggled = params.copy()
+            if active:
+                toggled.setlist(facet, [value for value in chosen if value != item.value])
+            else:
+                toggled.setlist(facet, chosen + [item.value])
+            options.append({'label': item.label, 'count': item.count, 'active': active, 'query': toggled.urlencode()})
+        if options:
+            sidebar.append((titles[facet], options))
+    return sidebar
+
 # Edit photo metadata
 @login_required
 @csrf_protect
@@ -373,7 +540,9 @@ def photos_bulk_action(request, project_id):
     with transaction.atomic():
         if action == 'delete':
             count = photos.count()
-            photos.delete()
+            # Assets go to the deletion outbox with one INSERT; Cloudinary is called after commit
+            with collect_asset_deletions():
+                photos.delete()
             messages.success(request, f"Permanently deleted {count} photo{'s' if count != 1 else ''}.")
 
         elif action == 'flag':
@@ -392,6 +561,13 @@ def photos_bulk_action(request, project_id):
             count = photos.update(is_featured=False)
             messages.success(request, f"Removed featured status from {count} photo{'s' if count != 1 else ''}.")
 
+        elif action == 'flag_duplicates':
+            # Keep the first photo of each near-duplicate cluster, flag the rest
+            groups = find_near_duplicate_groups(photos.order_by('order_index', 'id'))
+            duplicate_ids = [photo.id for group in groups for photo in group[1:]]
+            count = Photo.objects.filter(id__in=duplicate_ids).update(needs_attention=True)
+            messages.success(request, f"Flagged {count} near-duplicate photo{'s' if count != 1 else ''} for attention.")
+
     return redirect('projects:detail', pk=project.id)
 
 @login_required
@@ -409,75 +585,17 @@ def photo_reorder(request, project_id):
                 'message': 'You do not have permission to reorder photos in this project.'
             }, status=403)
         
-        # Parse JSON data
-        try:
-            data = json.loads(request.body)
-            photo_ids = data.get('photo_ids', [])
-        except (json.JSONDecodeError, KeyError) as e:
-            return JsonResponse({
-                'status': 'error',
-                'message': 'Invalid JSON data provided.'
-            }, status=400)
-        
-        if not photo_ids or not isinstance(photo_ids, list):
-            return JsonResponse({
-                'status': 'error',
-                'message': 'No photo IDs provided or invalid format.'
-            }, status=400)
-        
-        # Convert to integers and validate
-        try:
-            photo_ids = [int(pid) for pid in photo_ids]
-        except (ValueError, TypeError):
-            return JsonResponse({
-                'status': 'error',
-                'message': 'Invalid photo ID format.'
-            }, status=400)
-        
+        photo_ids, error_response = _parse_photo_order(request)
+        if error_response:
+            return error_response
+
         # Get photos that belong to this project and validate all IDs exist
-        project_photos = Photo.objects.filter(project=project)
-        project_photo_ids = set(project_photos.values_list('id', flat=True))
-        
-        # Verify all provided IDs belong to this project
-        provided_ids = set(photo_ids)
-        if not provided_ids.issubset(project_photo_ids):
-            invalid_ids = provided_ids - project_photo_ids
-            return JsonResponse({
-                'status': 'error',
-                'message': f'Some photo IDs do not belong to this project: {list(invalid_ids)}'
-            }, status=400)
-        
-        # Update order in a database transaction
-        with transaction.atomic():
-            # Create a mapping of photo ID to new order index
-            order_updates = []
-            
-            for new_index, photo_id in enumerate(photo_ids):
-                try:
-                    photo = Photo.objects.get(id=photo_id, project=project)
-                    photo.order_index = new_index
-                    order_updates.append(photo)
-                except Photo.DoesNotExist:
-                    continue
-            
-            # Bulk update for better performance
-            Photo.objects.bulk_update(order_updates, ['order_index'])
-            
-            # Set order_index for any photos not in the provided list
-            # (in case some photos were missed)
-            remaining_photos = Photo.objects.filter(
-                project=project
-            ).exclude(
-                id__in=photo_ids
-            ).order_by('uploaded_at')
-            
-            next_index = len(photo_ids)
-            for photo in remaining_photos:
-                photo.order_index = next_index
-                next_index += 1
-            
-            if remaining_photos.exists():
-                Photo.objects.bulk_update(list(remaining_photos), ['order_index'])
+        project_photo_ids = set(Photo.objects.filter(project=project).values_list('id', flat=True))
+        error_response = _check_photo_order(photo_ids, project_photo_ids)
+        if error_response:
+            return error_response
+
+        _apply_photo_order(project, photo_ids)
         
         return JsonResponse({
             'status': 'success',
@@ -494,4 +612,280 @@ def photo_reorder(request, project_id):
         return JsonResponse({
             'status': 'error',
             'message': 'An unexpected error occurred. Please try again.'
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+
+
+# Validated list of photo ids from a reorder request body
+# Returns (photo_ids, None), or (None, error response)
+def _parse_photo_order(request):
+    try:
+        data = json.loads(request.body)
+        photo_ids = data.get('photo_ids', [])
+    except (json.JSONDecodeError, KeyError, AttributeError):
+        return None, JsonResponse({
+            'status': 'error',
+            'message': 'Invalid JSON data provided.'
+        }, status=400)
+
+    if not photo_ids or not isinstance(photo_ids, list):
+        return None, JsonResponse({
+            'status': 'error',
+            'message': 'No photo IDs provided or invalid format.'
+        }, status=400)
+
+    # Convert to integers and validate
+    try:
+        return [int(pid) for pid in photo_ids], None
+    except (ValueError, TypeError):
+        return None, JsonResponse({
+            'status': 'error',
+            'message': 'Invalid photo ID format.'
+        }, status=400)
+
+
+# Error response if any of the provided ids belong to another project
+def _check_photo_order(photo_ids, project_photo_ids):
+    provided_ids = set(photo_ids)
+    if not provided_ids.issubset(project_photo_ids):
+        invalid_ids = provided_ids - project_photo_ids
+        return JsonResponse({
+            'status': 'error',
+            'message': f'Some photo IDs do not belong to this project: {list(invalid_ids)}'
+        }, status=400)
+    return None
+
+
+# Write the new order in one UPDATE; photos missing from the list go after it
+# in their current order, so a list covering only the loaded part of the grid
+# leaves the rest where it was
+def _apply_photo_order(project, photo_ids):
+    write_photo_order(project.id, photo_ids)
+
+
+@login_required
+@csrf_protect
+@require_POST
+def photo_move(request, project_id, photo_id):
+    """Move one photo between two others (drag & drop); writes only that photo's row"""
+    try:
+        project = get_object_or_404(Project, id=project_id)
+
+        if project.owner != request.user:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'You do not have permission to reorder photos in this project.'
+            }, status=403)
+
+        neighbours, error_response = _parse_photo_move(request)
+        if error_response:
+            return error_response
+
+        return _move_response(project, photo_id, *neighbours)
+
+    except Exception as e:
+        import logging
+        logger = logging.getLogger(__name__)
+        logger.error(f"Error in photo_move view: {str(e)}", exc_info=True)
+
+        return JsonResponse({
+            'status': 'error',
+            'message': 'An unexpected error occurred. Please try again.'
+        }, status=500)
+
+
+# (after_id, before_id) from a move request body, either may be None
+# Returns (neighbours, None), or (None, error response)
+def _parse_photo_move(request):
+    try:
+        data = json.loads(request.body)
+        neighbours = [data.get('after'), data.get('before')]
+    except (json.JSONDecodeError, AttributeError):
+        return None, JsonResponse({
+            'status': 'error',
+            'message': 'Invalid JSON data provided.'
+        }, status=400)
+
+    if neighbours == [None, None]:
+        return None, JsonResponse({
+            'status': 'error',
+            'message': 'Give the photo to move after, before, or both.'
+        }, status=400)
+
+    try:
+        return [int(pid) if pid is not None else None for pid in neighbours], None
+    except (ValueError, TypeError):
+        return None, JsonResponse({
+            'status': 'error',
+            'message': 'Invalid photo ID format.'
+        }, status=400)
+
+
+# Apply a move and describe the outcome (sync; the async view runs it in a thread)
+def _move_response(project, photo_id, after_id, before_id):
+    try:
+        order_index = move_photo(project.id, photo_id, after_id, before_id)
+    except StaleOrder as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=409)
+    except (Photo.DoesNotExist, ValueError) as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse({
+        'status': 'success',
+        'message': 'Photo moved.',
+        'order_index': order_index
+    })
+
+
+# Resumable chunked uploads
+# Protocol: POST init -> PUT chunks at an offset -> GET status to resume -> POST finalize
+
+def _upload_session_status(session):
+    return {
+        'upload_id': str(session.id),
+        'filename': session.filename,
+        'offset': session.received_bytes,
+        'size': session.total_size,
+        'status': session.status,
+        'chunk_size': settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE,
+    }
+
+
+# Start a chunked upload for one file
+@login_required
+@require_POST
+def upload_session_create(request, project_id):
+    project = get_object_or_404(Project, id=project_id)
+
+    if project.owner != request.user:
+        return JsonResponse({
+            'status': 'error',
+            'message': 'You do not have permission to upload photos for this project.'
+        }, status=403)
+
+    try:
+        data = json.loads(request.body)
+        filename = str(data['filename'])[:255]
+        total_size = int(data['size'])
+        content_type = str(data.get('content_type', ''))
+    except (json.JSONDecodeError, KeyError, TypeError, ValueError):
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Expected JSON with filename, size and content_type.'
+        }, status=400)
+
+    # Reject up front rather than after 50MB of chunks
+    if total_size <= 0 or total_size > settings.MAX_UPLOAD_SIZE:
+        return JsonResponse({
+            'status': 'error',
+            'message': f"File too large. Maximum size is {settings.MAX_UPLOAD_SIZE // (1024*1024)}MB."
+        }, status=400)
+    if content_type not in settings.ALLOWED_IMAGE_TYPES:
+        return JsonResponse({
+            'status': 'error',
+            'message': f"Unsupported file type: {content_type}."
+        }, status=400)
+
+    session = UploadSession.objects.create(
+        owner=request.user,
+        project=project,
+        filename=filename,
+        content_type=content_type,
+        total_size=total_size,
+    )
+    return JsonResponse(_upload_session_status(session), status=201)
+
+
+# GET reports how far a session got; PUT appends the next chunk at ?offset= (or Upload-Offset)
+@login_required
+@require_http_methods(['GET', 'PUT'])
+def upload_session_detail(request, upload_id):
+    session = get_object_or_404(UploadSession, id=upload_id, owner=request.user)
+
+    if request.method == 'GET':
+        return JsonResponse(_upload_session_status(session))
+
+    try:
+        offset = int(request.headers.get('Upload-Offset', request.GET.get('offset', '')))
+        length = int(request.headers.get('Content-Length') or 0)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': 'Invalid chunk offset.'}, status=400)
+
+    if length <= 0 or length > settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE:
+        return JsonResponse({
+            'status': 'error',
+            'message': f"Chunks must be 1 to {settings.CHUNKED_UPLOAD_MAX_CHUNK_SIZE} bytes."
+        }, status=400)
+
+    if session.status != UploadSession.STATUS_ACTIVE:
+        return JsonResponse(_upload_session_status(session), status=409)
+    if offset != session.received_bytes:
+        # Client is out of sync; tell it where to resume
+        return JsonResponse(_upload_session_status(session), status=409)
+    if offset + length > session.total_size:
+        return JsonResponse({'status': 'error', 'message': 'Chunk runs past the declared size.'}, status=400)
+
+    # The body is read with no transaction open; the offset only moves if nothing else moved it meanwhile
+    chunk_path, received = receive_chunk(session, request, length)
+    if not append_chunk(session, chunk_path, offset, received):
+        session.refresh_from_db()
+        return JsonResponse(_upload_session_status(session), status=409)
+
+    return JsonResponse(_upload_session_status(session))
+
+
+# Assemble the chunks and run them through the normal upload pipeline
+@login_required
+@require_POST
+def upload_session_finalize(request, upload_id):
+    session = get_object_or_404(
+        UploadSession.objects.select_related('project'), id=upload_id, owner=request.user
+    )
+
+    # Only one request runs the pipeline; a repeat gets the photo the first one made
+    if not claim_upload_session(session):
+        session.refresh_from_db()
+        if session.status == UploadSession.STATUS_COMPLETE and session.photo:
+            return JsonResponse({
+                'success': True,
+                'successful_uploads': [{
+                    'id': session.photo.id,
+                    'title': session.photo.title,
+                    'thumbnail_url': session.photo.thumbnail_url,
+                    'filename': session.filename,
+                    'job_id': None,
+                }],
+                'failed_uploads': [],
+                'total_success': 1,
+                'total_failed': 0,
+            })
+        if session.status == UploadSession.STATUS_FINALIZING:
+            return JsonResponse({
+                'status': 'error',
+                'message': 'Upload is already being finalized.',
+                **_upload_session_status(session)
+            }, status=409)
+        return JsonResponse({
+            'status': 'error',
+            'message': 'Upload is not complete yet.',
+            **_upload_session_status(session)
+        }, status=409)
+
+    staged = finalize_upload_session(session)
+
+    successful_uploads = []
+    failed_uploads = []
+    if staged.photo:
+        successful_uploads.append(_successful_upload(staged))
+    else:
+        failed_uploads.append({
+            'filename': staged.filename,
+            'error': staged.error
+        })
+
+    return JsonResponse({
+        'success': bool(successful_uploads),
+        'successful_uploads': successful_uploads,
+        'failed_uploads': failed_uploads,
+        'total_success': len(successful_uploads),
+        'total_failed': len(failed_uploads),
+        **_batch_info(staged.batch_id),
+    }, status=200 if successful_uploads else 400)
@@ -14,7 +14,7 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 import os
 import dj_database_url
 from pathlib import Path
-from decouple import Config, RepositoryEnv
+from decouple import Config, RepositoryEnv, undefined
 import cloudinary
 import cloudinary.uploader
 import cloudinary.api
@@ -54,10 +54,13 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',  # search vectors, GIN and trigram indexes (projects.search)
     'cloudinary_storage',
     'cloudinary',
     'users',
     'projects',
+    'jobs',
+    'media',
     'widget_tweaks',  # For better form rendering
 ]
 
@@ -172,16 +175,23 @@ MEDIA_URL = '/media/'
 # Use Cloudinary for media files (user uploads)
 # DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
 
-# Cloudinary configuration
+# Where uploads go and delivery URLs point (media.backends). LocalBackend keeps everything
+# on disk under MEDIA_LOCAL_ROOT and needs no network or Cloudinary account
+MEDIA_BACKEND = config('MEDIA_BACKEND', default='media.backends.CloudinaryBackend')
+MEDIA_LOCAL_ROOT = config('MEDIA_LOCAL_ROOT', default=str(BASE_DIR / 'tmp' / 'media'))
+MEDIA_LOCAL_URL = '/media-local/'
+
+# Cloudinary configuration (credentials are only required when Cloudinary is the backend)
+CLOUDINARY_REQUIRED = MEDIA_BACKEND == 'media.backends.CloudinaryBackend'
 CLOUDINARY_STORAGE = {
-    'CLOUD_NAME': config('CLOUDINARY_CLOUD_NAME'),
-    'API_KEY': config('CLOUDINARY_API_KEY'),
-    'API_SECRET': config('CLOUDINARY_API_SECRET'),
+    'CLOUD_NAME': config('CLOUDINARY_CLOUD_NAME', default=undefined if CLOUDINARY_REQUIRED else 'local'),
+    'API_KEY': config('CLOUDINARY_API_KEY', default=undefined if CLOUDINARY_REQUIRED else 'local'),
+    'API_SECRET': config('CLOUDINARY_API_SECRET', default=undefined if CLOUDINARY_REQUIRED else 'local'),
 }
 cloudinary.config(
-    cloud_name=config('CLOUDINARY_CLOUD_NAME'),
-    api_key=config('CLOUDINARY_API_KEY'),
-    api_secret=config('CLOUDINARY_API_SECRET'),
+    cloud_name=CLOUDINARY_STORAGE['CLOUD_NAME'],
+    api_key=CLOUDINARY_STORAGE['API_KEY'],
+    api_secret=CLOUDINARY_STORAGE['API_SECRET'],
     secure=True
 )
 
@@ -197,11 +207,117 @@ STORAGES = {
     },
 }
 
+# Variant delivery URLs kept in memory per process (media.variants)
+IMAGE_URL_CACHE_SIZE = 10000
+
+# Serve variants from /img/ through a local disk cache instead of linking the backend's URLs
+# (media.views.image_proxy); least recently used files go once the cache passes its budget
+IMAGE_PROXY = config('IMAGE_PROXY', default=False, cast=bool)
+IMAGE_PROXY_CACHE_DIR = config('IMAGE_PROXY_CACHE_DIR', default=str(BASE_DIR / 'tmp' / 'thumbs'))
+IMAGE_PROXY_CACHE_MAX_BYTES = config('IMAGE_PROXY_CACHE_MAX_BYTES', default=512 * 1024 * 1024, cast=int)
+
+# Orphaned assets are queued in an outbox table and deleted by a background job
+ASSET_DELETE_BATCH_SIZE = 100      # public_ids per storage call (Cloudinary's maximum)
+ASSET_DELETE_MAX_ATTEMPTS = 8      # after this the row is marked dead for manual review
+# Progress file for manage.py reconcile_media --resume
+MEDIA_RECONCILE_CHECKPOINT = str(BASE_DIR / 'tmp' / 'reconcile_media.json')
+
 # File upload settings
-FILE_UPLOAD_MAX_MEMORY_SIZE = 104857600  # 100MB (was 10MB)
+# Under ASGI Django reads the whole request body before the view runs, held in memory up
+# to this size and spilled to a temp file beyond it. Kept small so an upload (or a chunk
+# PUT) costs disk, not RAM, before SpooledPhotoUploadHandler or receive_chunk sees it
+FILE_UPLOAD_MAX_MEMORY_SIZE = 2621440  # 2.5MB (was 100MB)
 DATA_UPLOAD_MAX_MEMORY_SIZE = 104857600  # 100MB (was 20MB) 
 MAX_UPLOAD_SIZE = 50 * 1024 * 1024       # 50MB 
 
+# Photo endpoints spool uploads to disk in chunks of this size instead of buffering them
+PHOTO_UPLOAD_CHUNK_SIZE = 256 * 1024      # 256KB
+
+# Resumable chunked uploads: where partial files live and the largest chunk accepted per PUT
+# (local disk, so on Heroku a session resumes only on the dyno that started it)
+CHUNKED_UPLOAD_DIR = config('CHUNKED_UPLOAD_DIR', default=str(BASE_DIR / 'tmp' / 'uploads'))
+CHUNKED_UPLOAD_MAX_CHUNK_SIZE = 8 * 1024 * 1024   # 8MB
+
+# How many storage uploads a bulk upload runs at the same time
+PHOTO_UPLOAD_CONCURRENCY = config('PHOTO_UPLOAD_CONCURRENCY', default=4, cast=int)
+# Threads shared by all async upload requests in a process (the storage SDK is blocking)
+PHOTO_UPLOAD_ASYNC_THREADS = config('PHOTO_UPLOAD_ASYNC_THREADS', default=64, cast=int)
+
+# EXIF, dimensions and perceptual hash are read by a background job (manage.py run_workers)
+# instead of inside the upload request; uploads only do cheap size/type/magic-byte checks
+PHOTO_METADATA_IN_BACKGROUND = config('PHOTO_METADATA_IN_BACKGROUND', default=True, cast=bool)
+# The uploaded bytes are kept here for that job, which reads them instead of downloading the
+# stored asset (a worker on another machine falls back to the download)
+PHOTO_METADATA_STAGING_DIR = config('PHOTO_METADATA_STAGING_DIR', default=str(BASE_DIR / 'tmp' / 'metadata'))
+
+# Background jobs: attempts before a job is marked failed, first retry delay in seconds
+# (doubled on each retry), and how long a claimed job may run before another worker reclaims it
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_DELAY = 10
+JOB_LOCK_TIMEOUT = 600
+
+# Deleted projects and accounts are hidden at once and reaped by a background job,
+# this many rows per transaction
+TOMBSTONE_REAP_CHUNK_SIZE = 200
+
+# EXIF: camera make/model, lens, focal length, f-number, exposure, ISO and capture time are
+# stored as typed, indexed Photo columns. Other tags are kept in Photo.exif_data only
+# if EXIF_STORE_RAW is on, and only the ones listed here.
+EXIF_STORE_RAW = config('EXIF_STORE_RAW', default=True, cast=bool)
+EXIF_RAW_TAGS = [
+    'Image Make',
+    'Image Model',
+    'Image Orientation',
+    'Image Software',
+    'Image Artist',
+    'Image Copyright',
+    'EXIF DateTimeOriginal',
+    'EXIF ExposureTime',
+    'EXIF FNumber',
+    'EXIF ExposureProgram',
+    'EXIF ISOSpeedRatings',
+    'EXIF ExposureBiasValue',
+    'EXIF MeteringMode',
+    'EXIF Flash',
+    'EXIF FocalLength',
+    'EXIF FocalLengthIn35mmFilm',
+    'EXIF WhiteBalance',
+    'EXIF LensMake',
+    'EXIF LensModel',
+    'EXIF ColorSpace',
+]
+
+# "Optimized" projects downscale uploads to this longest edge and re-encode them
+# (JPEG or WEBP) before storing; 0 workers means one per CPU core
+PHOTO_OPTIMIZE_MAX_EDGE = config('PHOTO_OPTIMIZE_MAX_EDGE', default=3000, cast=int)
+PHOTO_OPTIMIZE_FORMAT = 'JPEG'
+PHOTO_OPTIMIZE_QUALITY = 90
+PHOTO_OPTIMIZE_WORKERS = config('PHOTO_OPTIMIZE_WORKERS', default=0, cast=int)
+
+# Perceptual hashes at most this many bits apart count as near-duplicates
+SIMILAR_PHOTO_MAX_DISTANCE = 10
+
+# Project pages render this many photos and load the rest in windows of the same size as
+# the grid is scrolled (projects.gallery); the JSON endpoint caps ?limit= at the maximum
+GALLERY_PAGE_SIZE = 60
+GALLERY_MAX_PAGE_SIZE = 200
+
+# Photos are ranked this far apart so a drag & drop move writes one row (projects.ordering);
+# a move leaving a gap under the minimum queues a background re-spacing of the project
+PHOTO_ORDER_GAP = 1024
+PHOTO_ORDER_MIN_GAP = 8
+
+# Text search configuration for the photo/project search vectors (projects.search);
+# changing it needs a migration, as the vectors are generated columns
+SEARCH_CONFIG = 'english'
+# Search results per page, and how many matching projects are listed above the photos
+SEARCH_PAGE_SIZE = 48
+SEARCH_PROJECT_LIMIT = 6
+
+# Lower bounds of the ISO bands offered as a search facet (projects.facets); changing
+# them needs `manage.py recount_facets`, as the per-user counts are stored by band
+FACET_ISO_BANDS = [100, 200, 400, 800, 1600, 3200, 6400, 12800]
+
 CONN_MAX_AGE = 600  # Keep database connections open longer for large uploads
 SECURE_CONTENT_TYPE_NOSNIFF = True
 
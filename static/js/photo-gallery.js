@@ -0,0 +1,207 @@
+/**
+ * Photo Gallery Module
+ * Loads the project photo grid in windows as it is scrolled, from the gallery JSON endpoint
+ */
+
+class PhotoGallery {
+    constructor() {
+        this.photoGrid = null;
+        this.sentinel = null;
+        this.cardTemplate = null;
+        this.galleryUrl = null;
+        this.nextCursor = null;
+        this.isLoading = false;
+        this.observer = null;
+    }
+
+    /**
+     * Initialize windowed loading (only when the page has more photos than it rendered)
+     */
+    init() {
+        this.photoGrid = document.getElementById('photo-grid');
+        this.sentinel = document.getElementById('gallery-sentinel');
+        this.cardTemplate = document.getElementById('photo-card-template');
+        if (!this.photoGrid || !this.sentinel || !this.cardTemplate) {
+            return; // No gallery on this page
+        }
+
+        this.galleryUrl = this.photoGrid.dataset.galleryUrl;
+        this.nextCursor = this.photoGrid.dataset.nextCursor || null;
+        if (!this.nextCursor) {
+            return; // Everything is already on the page
+        }
+
+        if ('IntersectionObserver' in window) {
+            // Start fetching well before the end of the grid comes into view
+            this.observer = new IntersectionObserver(entries => {
+                if (entries.some(entry => entry.isIntersecting)) {
+                    this.loadNextWindow();
+                }
+            }, { rootMargin: '1200px 0px' });
+            this.observer.observe(this.sentinel);
+        } else {
+            this.showLoadMoreButton();
+        }
+        console.log('Photo gallery windowing initialized');
+    }
+
+    /**
+     * Fetch the next window of photos and append their cards
+     */
+    async loadNextWindow() {
+        if (this.isLoading || !this.nextCursor) return;
+        this.isLoading = true;
+
+        try {
+            const url = `${this.galleryUrl}?after=${encodeURIComponent(this.nextCursor)}`;
+            const response = await fetch(url, {
+                headers: { 'X-Requested-With': 'XMLHttpRequest' },
+                credentials: 'same-origin'
+            });
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}: ${response.statusText}`);
+            }
+
+            const data = await response.json();
+            const fragment = document.createDocumentFragment();
+            data.photos.forEach(photo => {
+                // A photo dragged below the loaded cards is already on the page
+                if (!this.photoGrid.querySelector(`[data-photo-id="${photo.id}"]`)) {
+                    fragment.appendChild(this.buildCard(photo, data.sizes));
+                }
+            });
+            this.photoGrid.appendChild(fragment);
+
+            this.nextCursor = data.next_cursor;
+            this.photoGrid.dataset.nextCursor = this.nextCursor || '';
+            this.refreshModules();
+
+            if (!this.nextCursor) {
+                this.finish();
+            } else if (this.isSentinelNearViewport()) {
+                // A short window on a tall screen: keep going until the grid passes the fold
+                setTimeout(() => this.loadNextWindow(), 0);
+            }
+        } catch (error) {
+            console.error('Error loading photos:', error);
+            this.showNotification('Could not load more photos. Scroll again to retry.', 'error');
+        } finally {
+            this.isLoading = false;
+        }
+    }
+
+    /**
+     * Build one card from the template and a serialized photo
+     */
+    buildCard(photo, sizes) {
+        const card = this.cardTemplate.content.firstElementChild.cloneNode(true);
+        card.dataset.photoId = photo.id;
+        card.querySelector('.photo-select').value = photo.id;
+
+        const imageBox = card.querySelector('.photo-image');
+        const backgrounds = [];
+        if (photo.color) backgrounds.push(photo.color);
+        if (photo.placeholder) backgrounds.push(`url('${photo.placeholder}') center / cover no-repeat`);
+        if (backgrounds.length) imageBox.style.background = backgrounds.join(' ');
+
+        const img = imageBox.querySelector('img');
+        img.src = photo.src || '';
+        if (photo.srcset) {
+            img.srcset = photo.srcset;
+            img.sizes = sizes;
+        }
+        if (photo.width && photo.height) {
+            img.width = photo.width;
+            img.height = photo.height;
+        }
+        img.alt = photo.title || 'Untitled';
+
+        if (!photo.featured) card.querySelector('[data-badge="featured"]').remove();
+        if (!photo.attention) card.querySelector('[data-badge="attention"]').remove();
+
+        const title = card.querySelector('.photo-title');
+        title.textContent = this.truncate(photo.title || 'Untitled', 30);
+        title.addEventListener('click', () => openPhotoDetail(photo.id));
+
+        const caption = card.querySelector('.photo-caption');
+        if (photo.caption) {
+            caption.textContent = this.truncate(photo.caption, 50);
+        } else {
+            caption.remove();
+        }
+
+        // Template links point at photo 0
+        card.querySelectorAll('[data-link]').forEach(link => {
+            link.href = link.getAttribute('href').replace('/0/', `/${photo.id}/`);
+        });
+        return card;
+    }
+
+    /**
+     * Same output as Django's truncatechars
+     */
+    truncate(text, length) {
+        return text.length > length ? `${text.slice(0, length - 1)}…` : text;
+    }
+
+    /**
+     * Let selection and drag & drop pick up the new cards
+     */
+    refreshModules() {
+        if (window.photoSelectionInstance) window.photoSelectionInstance.refresh();
+        if (window.photoReorderingInstance) window.photoReorderingInstance.refresh();
+    }
+
+    isSentinelNearViewport() {
+        return this.sentinel.getBoundingClientRect().top < window.innerHeight + 1200;
+    }
+
+    /**
+     * Stop watching once the last window is in
+     */
+    finish() {
+        if (this.observer) this.observer.disconnect();
+        const button = document.getElementById('gallery-load-more');
+        if (button) button.remove();
+    }
+
+    /**
+     * Fallback for browsers without IntersectionObserver
+     */
+    showLoadMoreButton() {
+        const button = document.createElement('button');
+        button.type = 'button';
+        button.id = 'gallery-load-more';
+        button.className = 'btn btn-outline-primary';
+        button.textContent = 'Load more photos';
+        button.addEventListener('click', () => this.loadNextWindow());
+        this.sentinel.after(button);
+    }
+
+    /**
+     * Show notification (uses global function if available)
+     */
+    showNotification(message, type = 'info') {
+        if (typeof window.showNotification === 'function') {
+            window.showNotification(message, type);
+        } else {
+            console.log(`[${type.toUpperCase()}] ${message}`);
+        }
+    }
+}
+
+// Create global instance
+window.PhotoGallery = PhotoGallery;
+
+// Auto-initialize when DOM is ready
+document.addEventListener('DOMContentLoaded', function() {
+    if (!window.photoGalleryInstance) {
+        window.photoGalleryInstance = new PhotoGallery();
+        window.photoGalleryInstance.init();
+    }
+});
+
+// Export for module systems (if needed)
+if (typeof module !== 'undefined' && module.exports) {
+    module.exports = PhotoGallery;
+}
@@ -117,9 +117,9 @@ class PhotoReordering {
         // Re-enable photo links
         this.togglePhotoLinks(true);
         
-        // Save order if changed
+        // Save the move if the photo changed place
         if (evt.oldIndex !== evt.newIndex) {
-            this.savePhotoOrder();
+            this.savePhotoMove(evt.item);
         } else {
             this.updateInstructions('Drag photos to reorder them');
         }
@@ -134,7 +134,23 @@ class PhotoReordering {
     }
 
     /**
-     * Save the new photo order to the server
+     * Save a single move to the server: the photo now sits between its neighbouring cards
+     * (only that photo's position is written, however many photos the project has)
+     */
+    async savePhotoMove(card) {
+        const neighbourId = sibling => (
+            sibling && sibling.classList.contains('photo-card') ? sibling.getAttribute('data-photo-id') : null
+        );
+        const photoId = card.getAttribute('data-photo-id');
+        const payload = {
+            after: neighbourId(card.previousElementSibling),
+            before: neighbourId(card.nextElementSibling)
+        };
+        await this.sendOrderChange(`/projects/${this.projectId}/photos/${photoId}/move/`, payload);
+    }
+
+    /**
+     * Save the new photo order to the server (the whole list of loaded cards)
      */
     async savePhotoOrder() {
         // Get current order of photo IDs
@@ -148,21 +164,26 @@ class PhotoReordering {
             this.updateInstructions(' No photos to reorder', 'error');
             return;
         }
-        
+
+        await this.sendOrderChange(`/projects/${this.projectId}/photos/reorder/`, { photo_ids: photoIds });
+    }
+
+    /**
+     * POST an order change and report the outcome
+     */
+    async sendOrderChange(url, payload) {
         // Show loading state
         this.showLoadingIndicator(true);
         this.updateInstructions('Saving order...');
         
         try {
-            const response = await fetch(`/projects/${this.projectId}/photos/reorder/`, {
+            const response = await fetch(url, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json',
                     'X-CSRFToken': this.getCSRFToken()
                 },
-                body: JSON.stringify({
-                    photo_ids: photoIds
-                })
+                body: JSON.stringify(payload)
             });
             
             if (!response.ok) {
@@ -51,6 +51,9 @@ class PhotoSelection {
         this.photoCards.forEach(card => {
             const checkbox = card.querySelector('.photo-select');
             if (!checkbox) return;
+            // refresh() runs this again for cards loaded later; bind each card once
+            if (card.dataset.selectionBound) return;
+            card.dataset.selectionBound = 'true';
 
             // Click on card selects/deselects (but not during drag)
             card.addEventListener('click', (e) => {
@@ -24,6 +24,9 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('users/', include('users.urls')),
     path('projects/', include('projects.urls')),
+    path('jobs/', include('jobs.urls')),
+    # LocalBackend assets and the image proxy
+    path('', include('media.urls')),
     path('', HomeView.as_view(), name='home'),
 ]
 
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 12:36
+
+import media.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='user',
+            name='avatar',
+            field=media.fields.MediaField(blank=True, help_text='Profile picture', max_length=255, null=True, verbose_name='image'),
+        ),
+    ]
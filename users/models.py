@@ -2,14 +2,22 @@
 
 from django.contrib.auth.models import AbstractUser
 from django.db import models
-from cloudinary.models import CloudinaryField
 
+from media.fields import MediaField
+from media.tracking import FieldTrackingMixin
+from media.variants import VariantURLMixin
 
-class User(AbstractUser):
+
+class User(FieldTrackingMixin, VariantURLMixin, AbstractUser):
     # AbstractUser includes username, password, email, first_name, last_name 
 
+    # loaded avatar kept so the cleanup signals can see a replaced one without a query
+    tracked_fields = ('avatar',)
+    # image sizes the avatar is shown in (see media.variants)
+    variant_fields = {'avatar': ('avatar_sm', 'avatar')}
+
     # stores the user's profile picture (requires Pillow library)
-    avatar = CloudinaryField(
+    avatar = MediaField(
         'image',
         blank=True,
         null=True,
@@ -30,6 +38,9 @@ class User(AbstractUser):
 
     updated_at = models.DateTimeField(auto_now=True)
 
+    # set when the account is deleted (and is_active cleared); the reaper removes it later
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
 
 # defines the metadata for the User model, defining how it should be stored in the database
 class Meta:
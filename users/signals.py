@@ -1,12 +1,14 @@
 # users/signals.py
 """
 Django Signals for User Avatar Cleanup in Cloudinary
+
+Old avatars are queued in the deletion outbox (media.outbox) and removed after commit.
 """
 
-from django.db.models.signals import post_delete, pre_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
+from media.outbox import queue_asset_deletion
 from .models import User
-import cloudinary.uploader
 import logging
 
 logger = logging.getLogger(__name__)
@@ -19,42 +21,32 @@ def delete_user_avatar_from_cloudinary(sender, instance, **kwargs):
      Delete the user's avatar from Cloudinary
     """
     if instance.avatar:
-        try:
-            public_id = instance.avatar.public_id
-            if public_id:
-                result = cloudinary.uploader.destroy(public_id)
-                logger.info(f"Deleted user avatar from Cloudinary: {public_id}, result: {result}")
-        except Exception as e:
-            logger.error(f"Failed to delete user avatar from Cloudinary: {e}")
+        queue_asset_deletion(instance.avatar.public_id, source='users.User')
 
 
 @receiver(pre_save, sender=User)
-def delete_old_avatar_on_update(sender, instance, **kwargs):
+def remember_old_avatar(sender, instance, update_fields=None, **kwargs):
+    """
+    Make sure the user knows their stored avatar before the save overwrites it.
+    Users loaded from the database already remember it (media.tracking).
+    """
+    if update_fields is None or 'avatar' in update_fields:
+        instance.load_missing_values('avatar')
+
+
+@receiver(post_save, sender=User)
+def delete_old_avatar_on_update(sender, instance, created, update_fields=None, **kwargs):
     """
-    When a User record is about to be saved/updated - 
-    If the avatar field is changing, delete the old avatar from Cloudinary
+    When a User record has been saved/updated - 
+    If the avatar field changed, delete the old avatar from Cloudinary
     
     This prevents orphaned files when users change their profile picture.
     """
-    # Check if this is a new user being created
-    if not instance.pk:
-        return  # New user, no old avatar to delete
-        
-    try:
-        # Get the current version of this user from the database
-        old_instance = User.objects.get(pk=instance.pk)
-        
-        # Check if the avatar is actually changing
-        if old_instance.avatar and old_instance.avatar != instance.avatar:
-            public_id = old_instance.avatar.public_id
-            
-            if public_id:
-                # Delete the old avatar since it's being replaced
-                cloudinary.uploader.destroy(public_id)
-                logger.info(f"Deleted old user avatar from Cloudinary: {public_id}")
-                
-    except User.DoesNotExist:
-        # This shouldn't happen, but safety first
-        pass
-    except Exception as e:
-        logger.error(f"Failed to delete old user avatar from Cloudinary: {e}")
\ No newline at end of file
+    # New users and saves that didn't write the avatar (e.g. last_login) have nothing to delete
+    if created or (update_fields is not None and 'avatar' not in update_fields):
+        return
+
+    old_avatar = instance.loaded_value('avatar')
+    if old_avatar and instance.field_changed('avatar'):
+        # Delete the old avatar since it's being replaced
+        queue_asset_deletion(old_avatar.public_id, source='users.User')
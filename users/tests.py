@@ -1,3 +1,56 @@
+from cloudinary import CloudinaryResource
 from django.test import TestCase
+from django.utils import timezone
 
-# Create your tests here.
+from media.models import AssetDeletion
+from .models import User
+
+
+def _resource(public_id):
+    return CloudinaryResource(public_id, format='jpg', type='upload', resource_type='image')
+
+
+# delete_old_avatar_on_update reads the avatar remembered at load time (media.tracking)
+class AvatarTrackingQueryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('tracking', avatar=_resource('tests/avatar'))
+
+    def queued(self):
+        return set(AssetDeletion.objects.values_list('public_id', flat=True))
+
+    def test_profile_edit_is_one_update(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.bio = 'Landscapes, mostly'
+        with self.assertNumQueries(1):
+            user.save()
+        self.assertEqual(self.queued(), set())
+
+    def test_last_login_is_one_update(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.last_login = timezone.now()
+        with self.assertNumQueries(1):
+            user.save(update_fields=['last_login'])
+
+    def test_avatar_change_queues_old_avatar(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.avatar = _resource('tests/avatar_v2')
+        # UPDATE, the outbox INSERT and the drain job (lookup + INSERT)
+        with self.assertNumQueries(4):
+            user.save()
+        self.assertEqual(self.queued(), {'tests/avatar'})
+
+    def test_avatar_unchanged_on_full_save_queues_nothing(self):
+        user = User.objects.get(pk=self.user.pk)
+        user.avatar = _resource('tests/avatar')
+        with self.assertNumQueries(1):
+            user.save()
+        self.assertEqual(self.queued(), set())
+
+    def test_user_built_with_pk_loads_avatar_once(self):
+        user = User.objects.get(pk=self.user.pk)
+        built = User(pk=user.pk, username=user.username, password=user.password, avatar=_resource('tests/avatar_v2'))
+        # The one SELECT the snapshot lacks, then the same writes as a change
+        with self.assertNumQueries(5):
+            built.save(update_fields=['avatar'])
+        self.assertEqual(self.queued(), {'tests/avatar'})
@@ -1,12 +1,13 @@
 
 # Views for the users app
 
-from django.contrib.auth import views as auth_views
+from django.contrib.auth import logout, views as auth_views
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy
 from django.views.generic import CreateView, TemplateView, UpdateView, DeleteView
 from django.shortcuts import redirect
 from django.contrib import messages
+from projects.tombstones import tombstone_user
 from .forms import ProfileEditForm, UserCreationForm
 from .models import User
 
@@ -78,14 +79,19 @@ class AccountDeleteView(LoginRequiredMixin, DeleteView):
     def get_object(self):
         # Always return the current user
         return self.request.user
+
+    # Deactivate and hide the account at once; projects, photos and files are
+    # deleted in the background (projects.tombstones)
+    def form_valid(self, form):
+        username = self.object.username
+        tombstone_user(self.object)
+        logout(self.request)
+
+        # Add success message for home page
+        messages.success(self.request, f'Account "{username}" has been permanently deleted.')
+        return redirect(self.get_success_url())
     
+    # HTTP DELETE takes the same path as the confirmation form
     def delete(self, request, *args, **kwargs):
-        user = self.get_object()
-        username = user.username
-        
-        # Delete the user (cascades to projects/photos, signals handle Cloudinary)
-        response = super().delete(request, *args, **kwargs)
-        
-        # Add success message for home page
-        messages.success(request, f'Account "{username}" has been permanently deleted.')
-        return response
\ No newline at end of file
+        self.object = self.get_object()
+        return self.form_valid(None)